@@ -1,7 +1,49 @@
 """Puzzle Platformer Game"""
+import time
+
+# Records when the game started, before the slow imports, so the time
+# it takes to show the menu can be measured.
+START_TIME = time.perf_counter()
+
+import argparse
+import base64
+import contextlib
+import hashlib
+import importlib
+import json
+import math
 import os
+import struct
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
 import arcade
 import arcade.gui
+import pyglet
+from PIL import Image
+
+
+class LazyImport:
+    """Stands in for a module that is only imported the first time it
+    is used, then puts the real module in its place"""
+
+    def __init__(self, name, alias):
+        """Remembers the module and the name it is imported as"""
+        self.name = name
+        self.alias = alias
+
+    def __getattr__(self, attribute):
+        """Imports the module and swaps it in for this stand in"""
+        module = importlib.import_module(self.name)
+        globals()[self.alias] = module
+        return getattr(module, attribute)
+
+
+# NumPy is only needed once a level loads, which happens in the
+# background while the menu is shown, so it isn't imported until then.
+np = LazyImport("numpy", "np")
 
 # Set the title and constants for screen dimensions and the line
 # length disparity for body text for the instructions screen.
@@ -10,6 +52,24 @@ SCREEN_HEIGHT = 900
 SCREEN_TITLE = "Puzzle Platformer"
 DEFAULT_LINE_HEIGHT = 45
 
+# The lines of body text for the instructions screen.
+INSTRUCTION_LINES = (
+    " - Use WASD or arrow keys to move and jump",
+    "- There are two timelines, press Q or Z to swap between them",
+    "- Press R to restart the level",
+    "- Press E to teleport a short distance forward, \
+if you collect a potion",
+    "- Press F5 to quicksave, F9 to quickload and hold Backspace \
+to rewind",
+    "- Grass and snow blocks indicate that the specific \
+tile exists in both timelines",
+    "- Purple blocks are only available in the current timeline",
+    "- Keys will freeze if travelling from the \
+grass timeline to snow timeline",
+    "- Get to the exit sign at each level! \
+It doesn't matter which timeline you exit in",
+)
+
 # Sets the constants to scale our character in proportion to the map.
 CHARACTER_SCALING = 0.5
 TILE_SCALING = 0.4
@@ -23,6 +83,22 @@ PLAYER_JUMP_SPEED = 20
 PLAYER_START_X = 128
 PLAYER_START_Y = 286
 
+# How fast a trampoline sends the player up, and how far a potion
+# teleports them.
+BOUNCE_SPEED = 30
+TELEPORT_DISTANCE = 200
+
+# How close a floor has to be under the player's feet for them to be
+# standing on it, and to be able to jump off it.
+GROUND_DISTANCE = 5
+JUMP_DISTANCE = 10
+
+# The gap left between the player and a wall they stop against, so they
+# aren't counted as touching it, and the furthest the player is pushed
+# to get them out of a wall they ended up inside.
+PHYSICS_SKIN = 0.01
+PHYSICS_PUSH_LIMIT = 1024
+
 # Sets the amount of pixels to keep as a minimum margin between the
 # character and the edge of the screen.
 LEFT_VIEWPORT_MARGIN = 200
@@ -30,10 +106,61 @@ RIGHT_VIEWPORT_MARGIN = 200
 BOTTOM_VIEWPORT_MARGIN = 150
 TOP_VIEWPORT_MARGIN = 100
 
+# The loops the game can run with. The default loop steps the game once
+# every update, and the fixed loop steps it a fixed number of ticks a
+# second whatever the frame rate, drawing at its own rate with the
+# player shown between their last two ticks.
+LOOP_DEFAULT = "default"
+LOOP_FIXED = "fixed"
+LOOP_MODES = (LOOP_DEFAULT, LOOP_FIXED)
+
+# How many ticks and frames a second the fixed loop runs at, the most
+# ticks it runs to catch up after a slow frame, how much longer than
+# usual a frame can take before it counts as late, and how far the
+# player can move in a tick before they are shown where they are
+# instead of sliding there.
+TICK_RATE = 60
+RENDER_RATE = 60
+MAX_CATCH_UP_TICKS = 5
+LATE_FRAME_FACTOR = 1.5
+INTERPOLATION_SNAP_DISTANCE = TELEPORT_DISTANCE / 2
+
 # Integers used to track if the player is facing left or right.
 RIGHT_FACING = 0
 LEFT_FACING = 1
 
+# The player's animations, each as the frames it cycles through and how
+# many seconds each frame shows for, which keeps the speeds they had
+# when they moved on a frame every update at 60 updates a second.
+# Hanging on a ladder shows the climbing frames without moving on, so
+# the player stops on the frame they were on.
+ANIMATION_IDLE = "idle"
+ANIMATION_WALK = "walk"
+ANIMATION_JUMP = "jump"
+ANIMATION_FALL = "fall"
+ANIMATION_CLIMB = "climb"
+ANIMATION_HANG = "hang"
+ANIMATIONS = {
+    ANIMATION_IDLE: ("idle", 0),
+    ANIMATION_WALK: ("walk", 1 / 60),
+    ANIMATION_JUMP: ("jump", 0),
+    ANIMATION_FALL: ("fall", 0),
+    ANIMATION_CLIMB: ("climb", 4 / 60),
+    ANIMATION_HANG: ("climb", 0),
+}
+
+# The animation for how the player moves, by whether they are on a
+# ladder, then whether they move down, not at all or up, then whether
+# they move across.
+ANIMATION_TABLE = (
+    ((ANIMATION_FALL, ANIMATION_FALL),
+     (ANIMATION_IDLE, ANIMATION_WALK),
+     (ANIMATION_JUMP, ANIMATION_JUMP)),
+    ((ANIMATION_CLIMB, ANIMATION_CLIMB),
+     (ANIMATION_HANG, ANIMATION_HANG),
+     (ANIMATION_CLIMB, ANIMATION_CLIMB)),
+)
+
 # Layer names from our tilemap so they can be refered to later on.
 LAYER_NAME_PLATFORMS = "Platforms"
 LAYER_NAME_BOUNCE = "Bounce"
@@ -48,13 +175,350 @@ LAYER_NAME_PLAYER = "Player"
 LAYER_NAME_POTION_1 = "Potion1"
 LAYER_NAME_POTION_2 = "Potion2"
 
+# The number of levels in the game.
+LEVEL_COUNT = 3
+
+# The two timelines every level has and the time a timeline swap has
+# to finish in so the player doesn't see a hitch (one frame at 60fps).
+TIMELINES = (1, 2)
+SWAP_FRAME_BUDGET = 1 / 60
+
+# Layers that get collected or removed while playing, so they need to
+# be put back whenever the player enters that timeline again.
+COLLECTABLE_LAYERS = (
+    LAYER_NAME_KEY_1,
+    LAYER_NAME_KEY_2,
+    LAYER_NAME_POTION_1,
+    LAYER_NAME_POTION_2,
+    LAYER_NAME_LOCKS,
+)
+
+# The flags each key, potion and lock has in its level's sprite pool,
+# which collecting it clears instead of taking it out of the scene.
+POOL_VISIBLE = 1
+POOL_COLLIDABLE = 2
+POOL_PRESENT = POOL_VISIBLE | POOL_COLLIDABLE
+
+# Every other layer never changes while playing, so it is drawn in
+# square chunks of this many tiles and only the chunks on screen are
+# drawn. The player and the collectable layers are drawn as they are.
+STATIC_CHUNK_TILES = 16
+DYNAMIC_LAYERS = COLLECTABLE_LAYERS + (LAYER_NAME_PLAYER,)
+
+# A streaming level only loads the chunks of its static tile layers
+# that are within this many chunks of the screen, and drops the chunks
+# used longest ago once a timeline has more than this many of their
+# sprites loaded. The placeholders are always loaded, as they are made
+# solid all at once, and so are the object layers, which are small.
+STREAM_RADIUS = 1
+STREAM_SPRITE_BUDGET = 8000
+RESIDENT_LAYERS = DYNAMIC_LAYERS + (LAYER_NAME_PLACEHOLDER,)
+
+# Layer specific options make the SpriteList for the platforms
+# layer, with spatial hashing used for detection. Every layer arcade's
+# physics engine collides with needs it, as arcade otherwise checks
+# those layers on the GPU, which needs a window. The game has its own
+# physics engine, but the physics benchmark still runs arcade's.
+LAYER_OPTIONS = {
+    LAYER_NAME_PLATFORMS: {"use_spatial_hash": True},
+    LAYER_NAME_DONT_TOUCH: {"use_spatial_hash": True},
+    LAYER_NAME_LOCKS: {"use_spatial_hash": True},
+    LAYER_NAME_PLACEHOLDER: {"use_spatial_hash": True},
+    LAYER_NAME_LADDERS: {"use_spatial_hash": True},
+    LAYER_NAME_KEY_1: {"use_spatial_hash": False},
+    LAYER_NAME_KEY_2: {"use_spatial_hash": False},
+}
+
+# The events that happen when the player touches a sprite in one of
+# these layers. The layers are checked in this order every frame.
+TRIGGER_BOUNCE = "bounce"
+TRIGGER_HAZARD = "hazard"
+TRIGGER_EXIT = "exit"
+TRIGGER_KEY = "key"
+TRIGGER_LOCK = "lock"
+TRIGGER_POTION = "potion"
+TRIGGER_LAYERS = {
+    LAYER_NAME_BOUNCE: TRIGGER_BOUNCE,
+    LAYER_NAME_DONT_TOUCH: TRIGGER_HAZARD,
+    LAYER_NAME_EXIT_SIGN: TRIGGER_EXIT,
+    LAYER_NAME_KEY_1: TRIGGER_KEY,
+    LAYER_NAME_KEY_2: TRIGGER_KEY,
+    LAYER_NAME_LOCKS: TRIGGER_LOCK,
+    LAYER_NAME_POTION_1: TRIGGER_POTION,
+    LAYER_NAME_POTION_2: TRIGGER_POTION,
+}
+
+# Each button in an input state is stored as one bit of a byte.
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_SWAP = 16
+INPUT_RESET = 32
+INPUT_TELEPORT = 64
+
+# Settings for input recordings, which store the buttons of every step
+# of a game along with how the game ended, so it can be played back.
+RECORDING_MAGIC = b"PPIR"
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct("<4sIIIIIIIdd")
+
+# Settings for saved game states, which hold everything a game needs to
+# carry on from a step, followed by the flags of each timeline's keys,
+# potions and locks. The keys that quicksave and quickload the game to
+# the quicksave file, the key held to rewind through the rewind
+# buffer, which keeps a minute of the latest steps, and how many
+# seconds the message saying what they did stays on the screen.
+GAME_STATE_MAGIC = b"PPGS"
+GAME_STATE_VERSION = 1
+GAME_STATE_RECORD = struct.Struct("<4sHBBIHHBBBIddddBBBdHH")
+QUICKSAVE_NAME = "quicksave.sav"
+QUICKSAVE_KEY = arcade.key.F5
+QUICKLOAD_KEY = arcade.key.F9
+REWIND_KEY = arcade.key.BACKSPACE
+REWIND_FRAMES = 3600
+MESSAGE_TIME = 3
+
+# Settings for the frame profiler: how many of the latest times of each
+# phase it keeps, how many spans it keeps for a trace file, the key that
+# shows its overlay and how many frames the overlay waits between
+# updates.
+PROFILER_SAMPLES = 300
+PROFILER_TRACE_LIMIT = 100000
+PROFILER_KEY = arcade.key.F3
+PROFILER_OVERLAY_REFRESH = 15
+
+# Settings for the compiled level cache, which stores the decoded maps
+# so they don't need to be parsed from the TMX files every time.
+LEVEL_CACHE_DIRECTORY = "level_cache"
+LEVEL_CACHE_MAGIC = b"PPLC"
+LEVEL_CACHE_VERSION = 1
+LEVEL_CACHE_PREAMBLE = struct.Struct("<4sIIQQ")
+
+# How long the game took to get to the menu from starting and to the
+# first frame of the game from pressing start, in seconds.
+STARTUP_TIMES = {}
+
+# Settings for the tile atlas, which holds every tile image the levels
+# use shrunk to the size it is drawn at and packed onto a few pages.
+TILE_ATLAS_DIRECTORY = "tile_atlas"
+TILE_ATLAS_MANIFEST = os.path.join(TILE_ATLAS_DIRECTORY, "manifest.json")
+TILE_ATLAS_VERSION = 1
+
+# The kinds of layer a level map can have.
+LAYER_KIND_TILES = "tiles"
+LAYER_KIND_OBJECTS = "objects"
+
+# Tiled stores whether a tile is flipped in the top bits of its gid.
+TILE_FLIPPED_HORIZONTALLY = 0x80000000
+TILE_FLIPPED_VERTICALLY = 0x40000000
+TILE_FLIPPED_DIAGONALLY = 0x20000000
+TILE_GID_MASK = 0x1FFFFFFF
+
+# Each tile object is stored with its gid and pre-scaled rectangle.
+OBJECT_DTYPE = [
+    ("gid", "<u4"),
+    ("center_x", "<f8"),
+    ("center_y", "<f8"),
+    ("width", "<f8"),
+    ("height", "<f8"),
+]
+
+
+class TextureRegistry:
+    """Loads textures once for the whole game, so every sprite that
+    uses a texture shares the same texture object and hit box"""
 
-def load_texture_pair(filename):
-    """Load a texture pair for the player character's left and right"""
-    return [
-        arcade.load_texture(filename),
-        arcade.load_texture(filename, flipped_horizontally=True),
-    ]
+    def __init__(self):
+        """Creates the empty registry"""
+        self.textures = {}
+        self.characters = {}
+
+        # Counts how many textures have been decoded from their image
+        # files this session.
+        self.decode_count = 0
+
+    def load(self, filename, flipped_horizontally=False):
+        """Returns a texture, loading it the first time it is asked for"""
+        key = (filename, flipped_horizontally)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = arcade.load_texture(
+                filename, flipped_horizontally=flipped_horizontally)
+
+            # Works out the hit box now so it is shared as well.
+            texture.hit_box_points
+            self.textures[key] = texture
+            self.decode_count += 1
+        return texture
+
+    def load_pair(self, filename):
+        """Returns the right and left facing textures of an image"""
+        return [self.load(filename), self.load(filename, True)]
+
+    def character(self, main_path):
+        """Returns the animation textures of a character, loading them
+        the first time they are asked for"""
+        if main_path not in self.characters:
+            self.characters[main_path] = CharacterTextures(self, main_path)
+        return self.characters[main_path]
+
+
+class CharacterTextures:
+    """The animation frames of a character, shared by every sprite
+    of that character"""
+
+    def __init__(self, registry, main_path):
+        """Loads the textures for each animation"""
+
+        # Loads the textures for idle standing.
+        self.idle_texture_pair = registry.load_pair(f"{main_path}_idle.png")
+        self.jump_texture_pair = registry.load_pair(f"{main_path}_jump.png")
+        self.fall_texture_pair = registry.load_pair(f"{main_path}_fall.png")
+
+        # Loads the textures for walking.
+        self.walk_textures = []
+        for i in range(8):
+            texture = registry.load_pair(f"{main_path}_walk{i}.png")
+            self.walk_textures.append(texture)
+
+        # Loads the textures for climbing.
+        self.climbing_textures = []
+        for i in range(2):
+            texture = registry.load(f"{main_path}_climb{i}.png")
+            self.climbing_textures.append(texture)
+
+        # The frames of each animation as their right and left facing
+        # textures. Climbing looks the same both ways.
+        self.frames = {
+            "idle": (self.idle_texture_pair,),
+            "jump": (self.jump_texture_pair,),
+            "fall": (self.fall_texture_pair,),
+            "walk": tuple(self.walk_textures),
+            "climb": tuple((texture, texture)
+                           for texture in self.climbing_textures),
+        }
+
+
+# The texture registry used by the whole game.
+TEXTURES = TextureRegistry()
+
+
+class TimingSpan:
+    """Times one phase of a frame for the frame profiler"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        """Creates a span for the named phase"""
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        """Starts timing the phase"""
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        """Records how long the phase took"""
+        self.profiler.add(self.name, self.start,
+                          time.perf_counter() - self.start)
+
+
+class FrameProfiler:
+    """Times the named phases of each frame while it is enabled. It
+    keeps the latest times of each phase for their percentiles, and
+    every span for a Chrome trace file. While it is disabled a span
+    does nothing, so the spans can be left in the game."""
+
+    def __init__(self, samples=PROFILER_SAMPLES,
+                 trace_limit=PROFILER_TRACE_LIMIT):
+        """Creates a disabled profiler"""
+        self.enabled = False
+
+        # Set when a trace file is being written, so the profiler
+        # stays enabled when the overlay is hidden.
+        self.tracing = False
+
+        self.sample_count = samples
+        self.samples = {}
+        self.trace = deque(maxlen=trace_limit)
+        self.start_time = time.perf_counter()
+
+        # Every disabled span is the same object that does nothing.
+        self.null_span = contextlib.nullcontext()
+
+    def span(self, name):
+        """Returns a context manager that times the named phase"""
+        if not self.enabled:
+            return self.null_span
+        return TimingSpan(self, name)
+
+    def add(self, name, start, duration):
+        """Records how long a phase took"""
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.sample_count)
+        samples.append(duration)
+        self.trace.append((name, start, duration))
+
+    def percentiles(self):
+        """Returns the 50th, 95th and 99th percentile time of each phase
+        in milliseconds"""
+        return {name: tuple(np.percentile(samples, [50, 95, 99]) * 1000)
+                for name, samples in self.samples.items()}
+
+    def table(self):
+        """Returns the percentiles as lines of a table"""
+        lines = [f"{'Phase':<12}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name, (p50, p95, p99) in self.percentiles().items():
+            lines.append(f"{name:<12}{p50:>8.3f}{p95:>8.3f}{p99:>8.3f}")
+        return lines
+
+    def save_trace(self, file_name):
+        """Writes the recorded spans as a Chrome trace, which can be
+        opened in chrome://tracing or Perfetto"""
+        events = [{
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.start_time) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": 1,
+        } for name, start, duration in self.trace]
+        with open(file_name, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      file)
+
+
+# The frame profiler used by the whole game.
+PROFILER = FrameProfiler()
+
+# Counts the collision queries of each kind made since the game started,
+# which the profiler overlay and physics benchmark show for each step.
+COLLISION_QUERIES = Counter()
+
+# Refers to player sprite from Kenney.nl's Asset Pack 3.
+PLAYER_TEXTURE_PATH = (":resources:images/\
+animated_characters/male_adventurer/maleAdventurer")
+
+
+class AnimationState:
+    """Which animation a character shows, which way they face, which
+    frame is showing and how long it has shown for"""
+
+    __slots__ = ("animation", "frames", "frame_time", "facing", "frame",
+                 "elapsed")
+
+    def __init__(self, animation, frames, frame_time, facing=RIGHT_FACING):
+        """Starts an animation from its first frame"""
+        self.animation = animation
+        self.frames = frames
+        self.frame_time = frame_time
+        self.facing = facing
+        self.frame = 0
+        self.elapsed = 0.0
 
 
 class PlayerCharacter(arcade.Sprite):
@@ -65,597 +529,2988 @@ class PlayerCharacter(arcade.Sprite):
 
         # Returns an object that represents a parent class.
         super().__init__()
-
-        # Sets the player sprites default position to face-right.
-        self.character_face_direction = RIGHT_FACING
-
-        # Used for flipping between image sequences
-        self.cur_texture = 0
         self.scale = CHARACTER_SCALING
 
         # Create variables to track the state of the player sprite.
-        self.jumping = False
-        self.climbing = False
         self.is_on_ladder = False
+        self.can_jump = False
 
-        # Refers to player sprite from Kenney.nl's Asset Pack 3.
-        main_path = (":resources:images/\
-animated_characters/male_adventurer/maleAdventurer")
+        # Uses the shared player textures, which are only loaded the
+        # first time a player is created, and looks up the frames of
+        # each animation once.
+        textures = TEXTURES.character(PLAYER_TEXTURE_PATH)
+        self.animations = {
+            animation: (textures.frames[frames], frame_time)
+            for animation, (frames, frame_time) in ANIMATIONS.items()}
 
-        # Loads the textures for idle standing.
-        self.idle_texture_pair = load_texture_pair(f"{main_path}_idle.png")
-        self.jump_texture_pair = load_texture_pair(f"{main_path}_jump.png")
-        self.fall_texture_pair = load_texture_pair(f"{main_path}_fall.png")
-
-        # Loads the textures for walking.
-        self.walk_textures = []
-        for i in range(8):
-            texture = load_texture_pair(f"{main_path}_walk{i}.png")
-            self.walk_textures.append(texture)
-
-        # Loads the textures for climbing.
-        self.climbing_textures = []
-        texture = arcade.load_texture(f"{main_path}_climb0.png")
-        self.climbing_textures.append(texture)
-        texture = arcade.load_texture(f"{main_path}_climb1.png")
-        self.climbing_textures.append(texture)
-
-        # Set the initial textures.
-        self.texture = self.idle_texture_pair[0]
+        # Set the initial textures, standing still and facing right.
+        self.animation = AnimationState(
+            ANIMATION_IDLE, *self.animations[ANIMATION_IDLE])
+        self.texture = self.animation.frames[0][RIGHT_FACING]
 
         # Sets the player sprites hitbox based on the stationary
         # position of the player sprite.
         self.hit_box = self.texture.hit_box_points
 
+    def respawn(self, position):
+        """Moves the player to a spawn point, standing still and
+        facing right like a newly created player"""
+        self.position = position
+        self.change_x = 0
+        self.change_y = 0
+        self.is_on_ladder = False
+        self.animation = AnimationState(
+            ANIMATION_IDLE, *self.animations[ANIMATION_IDLE])
+        self.texture = self.animation.frames[0][RIGHT_FACING]
+
     def update_animation(self, delta_time: float = 1 / 60):
-        """Updates animations depending on what the player
-        does at a given time"""
-
-        # Determines whether the player sprite is facing left or right.
-        if self.change_x < 0 and \
-        self.character_face_direction == RIGHT_FACING:
-            self.character_face_direction = LEFT_FACING
-        elif self.change_x > 0 and \
-        self.character_face_direction == LEFT_FACING:
-            self.character_face_direction = RIGHT_FACING
-
-        # Sets the climbing animations for ladders.
-        if self.is_on_ladder:
-            self.climbing = True
-        if not self.is_on_ladder and self.climbing:
-            self.climbing = False
-        if self.climbing and abs(self.change_y) > 1:
-            self.cur_texture += 1
-            if self.cur_texture > 7:
-                self.cur_texture = 0
-        if self.climbing:
-            self.texture = self.climbing_textures[self.cur_texture // 4]
+        """Shows the animation for how the player moves, moving on
+        through its frames by the time that has passed, so it plays at
+        the same speed at any update rate. The texture is only set when
+        the animation, the facing or the frame changes."""
+        state = self.animation
+        change_x = self.change_x
+        change_y = self.change_y
+
+        # Faces the way the player moves, and looks up the animation for
+        # how they move.
+        facing = state.facing
+        if change_x < 0:
+            facing = LEFT_FACING
+        elif change_x > 0:
+            facing = RIGHT_FACING
+        animation = ANIMATION_TABLE[self.is_on_ladder][
+            (change_y > 0) - (change_y < 0) + 1][change_x != 0]
+
+        # Switches to a new animation, starting from its first frame
+        # unless it shows the same frames as the last one.
+        changed = facing != state.facing
+        if animation != state.animation:
+            frames, state.frame_time = self.animations[animation]
+            if frames is not state.frames:
+                state.frames = frames
+                state.frame = 0
+                state.elapsed = 0.0
+            state.animation = animation
+            changed = True
+
+        # Moves on by as many frames as there has been time for since
+        # the last update, keeping the time left over towards the next.
+        frame_time = state.frame_time
+        if frame_time:
+            elapsed = state.elapsed + delta_time
+            if elapsed < frame_time:
+                state.elapsed = elapsed
+            else:
+                frames = int(elapsed // frame_time)
+                state.elapsed = elapsed - frames * frame_time
+                state.frame = (state.frame + frames) % len(state.frames)
+                changed = True
+        if not changed:
             return
 
-        # Sets the jumping animations for when the character jumps.
-        if self.change_y > 0 and not self.is_on_ladder:
-            self.texture = \
-            self.jump_texture_pair[self.character_face_direction]
+        state.facing = facing
+        self.texture = state.frames[state.frame][facing]
+
+
+def level_map_name(level, timeline):
+    """Returns the file name of the map for a level and timeline"""
+    return f"game_level_{level}_{timeline}.tmx"
+
+
+def level_cache_name(map_name):
+    """Returns the file name of the compiled version of a map"""
+    name = os.path.splitext(os.path.basename(map_name))[0]
+    return os.path.join(LEVEL_CACHE_DIRECTORY, f"{name}.bin")
+
+
+def file_signature(file_name):
+    """Returns the name, modified time and hash of a file so we can
+    tell when it has changed"""
+    with open(file_name, "rb") as file:
+        file_hash = hashlib.sha1(file.read()).hexdigest()
+    return [file_name, os.stat(file_name).st_mtime_ns, file_hash]
+
+
+def file_has_changed(signature):
+    """Checks a file against the signature it had when it was compiled"""
+    file_name, modified_time, file_hash = signature
+    if not os.path.exists(file_name):
+        return True
+    if os.stat(file_name).st_mtime_ns == modified_time:
+        return False
+    return file_signature(file_name)[2] != file_hash
+
+
+def decode_tile_data(data, width, height):
+    """Decodes the tile gids of a TMX tile layer into a NumPy array"""
+    encoding = data.get("encoding")
+    compression = data.get("compression")
+
+    # CSV layers list the gids as text.
+    if encoding == "csv":
+        gids = np.array(data.text.replace("\n", "").split(","),
+                        dtype=np.uint32)
+        return gids.reshape(height, width)
+
+    # Base64 layers are little endian 32 bit gids, which can
+    # also be compressed with zlib or gzip.
+    raw = base64.b64decode(data.text.strip())
+    if compression == "zlib":
+        raw = zlib.decompress(raw)
+    elif compression == "gzip":
+        raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    return np.frombuffer(raw, dtype="<u4").reshape(height, width).copy()
+
+
+def read_tileset(tileset, first_gid, directory, tiles):
+    """Adds the image and position of every tile in a tileset to the
+    tiles dictionary, keyed by gid"""
+
+    # Tilesets made from a single sprite sheet have the tiles laid out
+    # in a grid on the one image.
+    sheet = tileset.find("image")
+    if sheet is not None:
+        source = os.path.normpath(os.path.join(directory, sheet.get("source")))
+        tile_width = int(tileset.get("tilewidth"))
+        tile_height = int(tileset.get("tileheight"))
+        columns = int(tileset.get("columns"))
+        margin = int(tileset.get("margin", 0))
+        spacing = int(tileset.get("spacing", 0))
+        for tile_id in range(int(tileset.get("tilecount"))):
+            row, column = divmod(tile_id, columns)
+            tiles.setdefault(first_gid + tile_id, [
+                source,
+                margin + column * (tile_width + spacing),
+                margin + row * (tile_height + spacing),
+                tile_width,
+                tile_height,
+            ])
+        return
+
+    # Otherwise every tile has its own image.
+    for tile in tileset.findall("tile"):
+        image = tile.find("image")
+        if image is None:
+            continue
+        source = os.path.normpath(os.path.join(directory, image.get("source")))
+        tiles.setdefault(first_gid + int(tile.get("id")), [
+            source,
+            int(tile.get("x", 0)),
+            int(tile.get("y", 0)),
+            int(tile.get("width", image.get("width"))),
+            int(tile.get("height", image.get("height"))),
+        ])
+
+
+class LevelData:
+    """The decoded contents of a level map, with the tile layers as
+    NumPy gid arrays and the tile objects as pre-scaled rectangles"""
+
+    def __init__(self, header, tile_gids, objects):
+        """Stores the map details and its arrays"""
+
+        # The header holds everything that isn't an array: the map size,
+        # the layers in drawing order, the image of each gid and the
+        # files the level was made from.
+        self.header = header
+        self.width = header["width"]
+        self.height = header["height"]
+        self.tile_width = header["tile_width"]
+        self.tile_height = header["tile_height"]
+        self.layers = header["layers"]
+        self.tiles = {int(gid): tile for gid, tile in header["tiles"].items()}
+
+        # Array of tile gids for each tile layer, and a record for
+        # each tile object.
+        self.tile_gids = tile_gids
+        self.objects = objects
+
+    @classmethod
+    def from_tmx(cls, map_name, scaling=TILE_SCALING):
+        """Parses and decodes a TMX map"""
+        root = ElementTree.parse(map_name).getroot()
+        directory = os.path.dirname(map_name)
+        width = int(root.get("width"))
+        height = int(root.get("height"))
+        tile_width = int(root.get("tilewidth"))
+        tile_height = int(root.get("tileheight"))
+        sources = [file_signature(map_name)]
+
+        # Reads the tilesets in gid order, loading any that are stored
+        # in their own file.
+        tiles = {}
+        tilesets = sorted(root.findall("tileset"),
+                          key=lambda tileset: int(tileset.get("firstgid")))
+        for tileset in tilesets:
+            first_gid = int(tileset.get("firstgid"))
+            tileset_directory = directory
+            if tileset.get("source"):
+                tileset_name = os.path.join(directory, tileset.get("source"))
+                sources.append(file_signature(tileset_name))
+                tileset_directory = os.path.dirname(tileset_name)
+                tileset = ElementTree.parse(tileset_name).getroot()
+            read_tileset(tileset, first_gid, tileset_directory, tiles)
+
+        # Decodes the layers in the order they are drawn. Object layers
+        # without any tile objects don't make a sprite list, so they
+        # are left out like arcade.load_tilemap does.
+        layers = []
+        tile_gids = []
+        objects = []
+        for layer in root:
+            if layer.tag == "layer":
+                layers.append({
+                    "name": layer.get("name"),
+                    "kind": LAYER_KIND_TILES,
+                    "index": len(tile_gids),
+                })
+                tile_gids.append(
+                    decode_tile_data(layer.find("data"), width, height))
+            elif layer.tag == "objectgroup":
+                start = len(objects)
+                for tile_object in layer.findall("object"):
+                    if tile_object.get("gid") is None:
+                        continue
+
+                    # Tile objects are placed by their bottom left corner,
+                    # measured down from the top of the map.
+                    object_width = float(tile_object.get("width")) * scaling
+                    object_height = float(tile_object.get("height")) * scaling
+                    left = float(tile_object.get("x")) * scaling
+                    bottom = (height * tile_height
+                              - float(tile_object.get("y"))) * scaling
+                    objects.append((
+                        int(tile_object.get("gid")),
+                        left + object_width / 2,
+                        bottom + object_height / 2,
+                        object_width,
+                        object_height,
+                    ))
+                if len(objects) > start:
+                    layers.append({
+                        "name": layer.get("name"),
+                        "kind": LAYER_KIND_OBJECTS,
+                        "start": start,
+                        "count": len(objects) - start,
+                    })
+
+        tile_gids = np.array(tile_gids, dtype=np.uint32).reshape(
+            len(tile_gids), height, width)
+        objects = np.array(objects, dtype=OBJECT_DTYPE)
+
+        # Only the tiles the map actually uses are kept.
+        used_gids = set(np.unique(tile_gids).tolist())
+        used_gids.update(objects["gid"].tolist())
+        used_gids = {gid & TILE_GID_MASK for gid in used_gids} - {0}
+
+        header = {
+            "width": width,
+            "height": height,
+            "tile_width": tile_width,
+            "tile_height": tile_height,
+            "scaling": scaling,
+            "layers": layers,
+            "tiles": {str(gid): tiles[gid] for gid in sorted(used_gids)},
+            "sources": sources,
+        }
+        return cls(header, tile_gids, objects)
+
+    @classmethod
+    def from_cache(cls, cache_name):
+        """Memory maps a compiled level from the level cache"""
+        with open(cache_name, "rb") as file:
+            magic, version, header_size, tile_offset, object_offset = \
+                LEVEL_CACHE_PREAMBLE.unpack(
+                    file.read(LEVEL_CACHE_PREAMBLE.size))
+            if magic != LEVEL_CACHE_MAGIC or version != LEVEL_CACHE_VERSION:
+                raise ValueError(f"{cache_name} is not a level cache file "
+                                 f"of version {LEVEL_CACHE_VERSION}")
+            header = json.loads(file.read(header_size))
+
+        # The arrays are mapped straight from the file rather than read,
+        # so only the parts that are used get loaded.
+        tile_shape = (header["tile_layers"], header["height"], header["width"])
+        if header["tile_layers"]:
+            tile_gids = np.memmap(cache_name, dtype="<u4", mode="r",
+                                  offset=tile_offset, shape=tile_shape)
+        else:
+            tile_gids = np.zeros(tile_shape, dtype=np.uint32)
+        if header["object_count"]:
+            objects = np.memmap(cache_name, dtype=OBJECT_DTYPE, mode="r",
+                                offset=object_offset,
+                                shape=(header["object_count"],))
+        else:
+            objects = np.zeros(0, dtype=OBJECT_DTYPE)
+        return cls(header, tile_gids, objects)
+
+    def is_stale(self, scaling=TILE_SCALING):
+        """Checks whether the files the level was made from have changed
+        since it was compiled"""
+        if self.header["scaling"] != scaling:
+            return True
+        return any(file_has_changed(source)
+                   for source in self.header["sources"])
+
+    def save(self, cache_name):
+        """Writes the level to the level cache"""
+        header = dict(self.header)
+        header["tile_layers"] = len(self.tile_gids)
+        header["object_count"] = len(self.objects)
+        header_bytes = json.dumps(header).encode()
+
+        # The arrays start on 16 byte boundaries after the header.
+        tile_offset = -(-(LEVEL_CACHE_PREAMBLE.size + len(header_bytes))
+                        // 16) * 16
+        object_offset = -(-(tile_offset + self.tile_gids.nbytes) // 16) * 16
+
+        os.makedirs(os.path.dirname(cache_name) or ".", exist_ok=True)
+        with open(cache_name, "wb") as file:
+            file.write(LEVEL_CACHE_PREAMBLE.pack(
+                LEVEL_CACHE_MAGIC, LEVEL_CACHE_VERSION, len(header_bytes),
+                tile_offset, object_offset))
+            file.write(header_bytes)
+            file.seek(tile_offset)
+            file.write(np.ascontiguousarray(self.tile_gids,
+                                            dtype="<u4").tobytes())
+            file.seek(object_offset)
+            file.write(np.ascontiguousarray(self.objects).tobytes())
+
+
+def load_level_data(map_name):
+    """Loads a level from the level cache, or from its TMX file if it
+    hasn't been compiled or has changed since"""
+    cache_name = level_cache_name(map_name)
+    if os.path.exists(cache_name):
+        try:
+            level_data = LevelData.from_cache(cache_name)
+        except (OSError, ValueError):
+            level_data = None
+        if level_data is not None and not level_data.is_stale():
+            return level_data
+    return LevelData.from_tmx(map_name)
+
+
+def tile_atlas_key(source, image_x, image_y, width, height):
+    """Returns the name a tile image has in the tile atlas"""
+    return f"{source}|{image_x}|{image_y}|{width}|{height}"
+
+
+class TileAtlas:
+    """The shrunk tile images made by the atlas command, which levels
+    load their tiles from when it is there"""
+
+    def __init__(self, manifest_name=TILE_ATLAS_MANIFEST):
+        """Creates the atlas, which reads its manifest the first time
+        a tile is asked for"""
+        self.manifest_name = manifest_name
+        self.manifest = None
+        self.checked = False
+
+        # Whether the manifest was there but out of date, which the
+        # profiler overlay shows.
+        self.stale = False
+
+        # The decoded pages and the texture and hit box of each tile
+        # made from them so far.
+        self.pages = {}
+        self.tiles = {}
+
+    def check(self):
+        """Reads the manifest, leaving the atlas unused if it is
+        missing or any of the images it was made from have changed"""
+        self.checked = True
+        try:
+            with open(self.manifest_name) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
             return
-        elif self.change_y < 0 and not self.is_on_ladder:
-            self.texture = \
-            self.fall_texture_pair[self.character_face_direction]
+        if manifest.get("version") != TILE_ATLAS_VERSION \
+                or manifest.get("scaling") != TILE_SCALING \
+                or any(file_has_changed(source)
+                       for source in manifest["sources"]):
+            self.stale = True
             return
+        self.manifest = manifest
+
+    def page(self, index):
+        """Returns the image of a page, decoding it the first time"""
+        image = self.pages.get(index)
+        if image is None:
+            file_name = os.path.join(os.path.dirname(self.manifest_name),
+                                     self.manifest["pages"][index])
+            image = Image.open(file_name).convert("RGBA")
+            self.pages[index] = image
+        return image
+
+    def find(self, source, image_x, image_y, width, height):
+        """Returns the texture of a tile image from the atlas and the
+        hit box of the full size image, or None if it isn't there"""
+        key = tile_atlas_key(source, image_x, image_y, width, height)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            return tile
+        if not self.checked:
+            self.check()
+        if self.manifest is None or key not in self.manifest["tiles"]:
+            return None
+
+        # The hit box is worked out from the full size image when the
+        # atlas is made, so the texture doesn't need one of its own.
+        entry = self.manifest["tiles"][key]
+        left, top = entry["x"], entry["y"]
+        image = self.page(entry["page"]).crop(
+            (left, top, left + entry["width"], top + entry["height"]))
+        texture = arcade.Texture(f"tile atlas {key}", image,
+                                 hit_box_algorithm="None")
+        hit_box = tuple(tuple(point) for point in entry["hit_box"])
+        tile = self.tiles[key] = (texture, hit_box)
+        return tile
+
+    def summary(self):
+        """Returns whether the tiles are loaded from the atlas, or from
+        their images as it is out of date or wasn't made"""
+        if self.manifest is not None:
+            return "tile atlas used"
+        if self.stale:
+            return "tile atlas out of date, tiles loaded from images"
+        return "no tile atlas, tiles loaded from images"
+
+    def clear(self):
+        """Forgets the decoded pages and tiles, and reads the manifest
+        again next time"""
+        self.manifest = None
+        self.checked = False
+        self.stale = False
+        self.pages.clear()
+        self.tiles.clear()
+
+
+# The tile atlas used by the whole game.
+TILE_ATLAS = TileAtlas()
+
+
+def create_tile_sprite(level_data, gid, scaling, atlas=TILE_ATLAS):
+    """Creates the sprite for a tile gid the same way
+    arcade.load_tilemap does"""
+    source, image_x, image_y, width, height = \
+        level_data.tiles[gid & TILE_GID_MASK]
+
+    # Uses the shrunk image from the atlas if it has the tile, sized
+    # and with the hit box of the full size image so the game plays
+    # the same. Flipped tiles are always loaded from their image.
+    if atlas is not None and not gid & ~TILE_GID_MASK:
+        tile = atlas.find(source, image_x, image_y, width, height)
+        if tile is not None:
+            texture, hit_box = tile
+            sprite = arcade.Sprite(texture=texture, scale=scaling)
+            sprite.width = width * scaling
+            sprite.height = height * scaling
+            sprite.set_hit_box(hit_box)
+            return sprite
+
+    return arcade.Sprite(
+        source,
+        scaling,
+        image_x=image_x,
+        image_y=image_y,
+        image_width=width,
+        image_height=height,
+        flipped_horizontally=bool(gid & TILE_FLIPPED_HORIZONTALLY),
+        flipped_vertically=bool(gid & TILE_FLIPPED_VERTICALLY),
+        flipped_diagonally=bool(gid & TILE_FLIPPED_DIAGONALLY),
+    )
+
+
+def create_placed_tile(level_data, gid, row, column, scaling):
+    """Creates the sprite of a tile in a row and column of the map,
+    placed by its bottom left corner on the map grid"""
+    sprite = create_tile_sprite(level_data, gid, scaling)
+    sprite.center_x = (column * level_data.tile_width * scaling
+                       + sprite.width / 2)
+    sprite.center_y = ((level_data.height - row - 1)
+                       * level_data.tile_height * scaling
+                       + sprite.height / 2)
+    return sprite
+
+
+def streamed_layers(level_data):
+    """Returns the names of the tile layers a streaming level loads in
+    chunks"""
+    return [layer["name"] for layer in level_data.layers
+            if layer["kind"] == LAYER_KIND_TILES
+            and layer["name"] not in RESIDENT_LAYERS]
+
+
+def build_scene(level_data, layer_options=LAYER_OPTIONS, lazy=False,
+                streamed=()):
+    """Creates the scene for a level, with a sprite list for each layer
+    in the order they are drawn. Lazy sprite lists don't create any
+    OpenGL resources until they are first drawn or initialized. The
+    sprite lists of streamed layers are left empty, as their tiles are
+    loaded in chunks."""
+    scaling = level_data.header["scaling"]
+    scene = arcade.Scene()
+    for layer in level_data.layers:
+        options = layer_options.get(layer["name"], {})
+        sprite_list = arcade.SpriteList(
+            use_spatial_hash=options.get("use_spatial_hash"), lazy=lazy)
+
+        # Streamed layers are filled in a chunk at a time as they load.
+        if layer["name"] in streamed:
+            pass
+
+        # Tiles are placed by their bottom left corner on the map grid.
+        elif layer["kind"] == LAYER_KIND_TILES:
+            gids = level_data.tile_gids[layer["index"]]
+            for row, column in zip(*np.nonzero(gids)):
+                sprite_list.append(create_placed_tile(
+                    level_data, int(gids[row, column]), row, column,
+                    scaling))
+
+        # Tile objects are stretched to the size they have on the map.
+        else:
+            start = layer["start"]
+            for tile_object in level_data.objects[start:start
+                                                  + layer["count"]]:
+                sprite = create_tile_sprite(level_data,
+                                            int(tile_object["gid"]), scaling)
+                sprite.width = float(tile_object["width"])
+                sprite.height = float(tile_object["height"])
+                sprite.position = (float(tile_object["center_x"]),
+                                   float(tile_object["center_y"]))
+                sprite_list.append(sprite)
+
+        scene.add_sprite_list(layer["name"], sprite_list=sprite_list,
+                              use_spatial_hash=bool(
+                                  options.get("use_spatial_hash")))
+    return scene
+
+
+def build_scenes(level_data, lazy=False, streaming=False):
+    """Creates the scene of each timeline of a level. A streaming level
+    leaves out the tiles it loads in chunks."""
+    scenes = {}
+    for timeline in TIMELINES:
+        streamed = streamed_layers(level_data[timeline]) if streaming \
+            else ()
+        scenes[timeline] = build_scene(level_data[timeline], lazy=lazy,
+                                       streamed=streamed)
+    return scenes
+
+
+def preload_textures(level_data, atlas=TILE_ATLAS):
+    """Decodes the image and hit box of every tile a level uses into
+    arcade's texture cache, or the tile atlas if it has them, so
+    creating its sprites later doesn't have to"""
+    gids = set(np.unique(level_data.tile_gids).tolist())
+    gids.update(level_data.objects["gid"].tolist())
+    gids.discard(0)
+    for gid in gids:
+        source, image_x, image_y, width, height = \
+            level_data.tiles[gid & TILE_GID_MASK]
+        if atlas is not None and not gid & ~TILE_GID_MASK \
+                and atlas.find(source, image_x, image_y, width,
+                               height) is not None:
+            continue
+        texture = arcade.load_texture(
+            source,
+            image_x,
+            image_y,
+            width,
+            height,
+            flipped_horizontally=bool(gid & TILE_FLIPPED_HORIZONTALLY),
+            flipped_vertically=bool(gid & TILE_FLIPPED_VERTICALLY),
+            flipped_diagonally=bool(gid & TILE_FLIPPED_DIAGONALLY),
+        )
 
-        # Sets the players' idle animation.
-        if self.change_x == 0:
-            self.texture = \
-            self.idle_texture_pair[self.character_face_direction]
+        # The hit box is only worked out the first time it is used.
+        texture.hit_box_points
+
+
+class CollisionGrid:
+    """An index of every sprite the player can set something off by
+    touching, laid out on the map grid, so one look at the few cells
+    the player is in finds everything they touch in every layer"""
+
+    def __init__(self, level_data, scene, layers=TRIGGER_LAYERS, pool=None):
+        """Marks the cells under every sprite in the given layers with
+        the layer's flag and remembers the sprites in each cell. The
+        sprites in the sprite pool are skipped once they are
+        collected."""
+        scaling = level_data.header["scaling"]
+        self.cell_width = level_data.tile_width * scaling
+        self.cell_height = level_data.tile_height * scaling
+        self.rows = level_data.height
+        self.columns = level_data.width
+
+        # Each layer gets its own bit in the grid, which is stored
+        # bottom row first so a row is just a height divided by the
+        # cell height.
+        self.flags = np.zeros((self.rows, self.columns), dtype=np.uint32)
+        self.layers = []
+
+        # The flags of the pooled sprites, which the pool changes.
+        if pool is None:
+            pool = SpritePool(scene, ())
+        self.pool_flags = pool.flags
+
+        for layer in layers:
+            if layer not in scene.name_mapping:
+                continue
+            flag = 1 << len(self.layers)
+            cells = {}
+
+            # A sprite is put in every cell its hit box covers, along
+            # with the edges of its hit box, since these sprites never
+            # move, and where its flags are in the pool if it has any.
+            for sprite in scene[layer]:
+                entry = (sprite, sprite.left, sprite.right,
+                         sprite.bottom, sprite.top,
+                         pool.indices.get(id(sprite), -1))
+                left, right, bottom, top = self.cell_range(*entry[1:5])
+                self.flags[bottom:top + 1, left:right + 1] |= flag
+                for row in range(bottom, top + 1):
+                    for column in range(left, right + 1):
+                        cells.setdefault((row, column), []).append(entry)
+            self.layers.append((layer, flag, cells))
+
+    def cell_range(self, left, right, bottom, top):
+        """Returns the first and last column and row of the cells a
+        rectangle covers, kept inside the map"""
+        return (max(int(left // self.cell_width), 0),
+                min(int(right // self.cell_width), self.columns - 1),
+                max(int(bottom // self.cell_height), 0),
+                min(int(top // self.cell_height), self.rows - 1))
+
+    def query(self, sprite):
+        """Returns each indexed layer the sprite touches along with the
+        sprites it touches in that layer, in the order the layers were
+        given"""
+        COLLISION_QUERIES["triggers"] += 1
+        x_points, y_points = zip(*sprite.get_adjusted_hit_box())
+        sprite_left = min(x_points)
+        sprite_right = max(x_points)
+        sprite_bottom = min(y_points)
+        sprite_top = max(y_points)
+
+        hits = []
+        left, right, bottom, top = self.cell_range(
+            sprite_left, sprite_right, sprite_bottom, sprite_top)
+        if left > right or bottom > top:
+            return hits
+        region = self.flags[bottom:top + 1, left:right + 1]
+        found = int(np.bitwise_or.reduce(region, axis=None))
+        if not found:
+            return hits
+
+        # Checks the sprite against the actual sprites in those cells,
+        # so the result is the same as checking the whole sprite list.
+        # Sprites that have been collected are skipped, and so are
+        # ones whose hit box edges don't reach the sprite, before the
+        # slower polygon check.
+        pool_flags = self.pool_flags
+        for layer, flag, cells in self.layers:
+            if not found & flag:
+                continue
+            touched = []
+            for row, column in zip(*np.nonzero(region & flag)):
+                for other, other_left, other_right, other_bottom, \
+                        other_top, index in cells[(bottom + int(row),
+                                                   left + int(column))]:
+                    if other_left > sprite_right \
+                            or other_right < sprite_left \
+                            or other_bottom > sprite_top \
+                            or other_top < sprite_bottom \
+                            or index >= 0 \
+                            and not pool_flags[index] & POOL_COLLIDABLE \
+                            or other in touched:
+                        continue
+                    if arcade.check_for_collision(sprite, other):
+                        touched.append(other)
+            if touched:
+                hits.append((layer, touched))
+        return hits
+
+
+class TriggerDispatcher:
+    """Sends an event to the handlers registered for it whenever the
+    player touches a sprite in one of the trigger layers"""
+
+    def __init__(self, layers=TRIGGER_LAYERS):
+        """Creates the dispatcher with no handlers"""
+        self.layers = layers
+        self.handlers = {}
+
+    def register(self, event, handler):
+        """Calls the handler with the layer and the sprites touched
+        whenever the event happens"""
+        self.handlers.setdefault(event, []).append(handler)
+
+    def dispatch(self, collision_grid, sprite):
+        """Looks up everything the sprite touches on the collision grid
+        and calls the handlers for it. A handler returns True to stop
+        the rest of the events, like when the level has been reset.
+        Returns whether the events were stopped."""
+        for layer, touched in collision_grid.query(sprite):
+            for handler in self.handlers.get(self.layers[layer], ()):
+                if handler(layer, touched):
+                    return True
+        return False
+
+
+class WallGrid:
+    """The hit boxes of named sets of sprites laid out on the map grid,
+    so a set can be added or removed while the game runs without laying
+    out the others again"""
+
+    def __init__(self, cell_width, cell_height, kind="walls"):
+        """Creates an empty grid with cells of the given size, whose
+        queries are counted under its kind"""
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.kind = kind
+
+        # The hit box edges and sprite of everything in each cell, and
+        # the entries of each set by name.
+        self.cells = {}
+        self.sets = {}
+
+    def cell_range(self, left, right, bottom, top):
+        """Returns the first and last column and row of the cells a
+        rectangle covers"""
+        return (int(left // self.cell_width), int(right // self.cell_width),
+                int(bottom // self.cell_height), int(top // self.cell_height))
+
+    def add(self, name, sprites):
+        """Lays out the hit boxes of a set of sprites, replacing the set
+        that had the same name"""
+        self.remove(name)
+        entries = []
+        for sprite in sprites:
+            x_points, y_points = zip(*sprite.get_adjusted_hit_box())
+            entry = (min(x_points), max(x_points), min(y_points),
+                     max(y_points), sprite)
+            left, right, bottom, top = self.cell_range(*entry[:4])
+            for row in range(bottom, top + 1):
+                for column in range(left, right + 1):
+                    self.cells.setdefault((row, column), []).append(entry)
+            entries.append(entry)
+        self.sets[name] = entries
+
+    def remove(self, name):
+        """Takes a set out of the grid, only going through the cells
+        its sprites were in"""
+        entries = self.sets.pop(name, None)
+        if not entries:
             return
-
-        # Sets the players walking animation.
-        self.cur_texture += 1
-        if self.cur_texture > 7:
-            self.cur_texture = 0
-        self.texture = self.walk_textures[self.cur_texture][
-            self.character_face_direction]
-
-
-class GameView(arcade.View, PlayerCharacter):
-    """Game view class for when the game is playing"""
+        removed = set(map(id, entries))
+        for entry in entries:
+            left, right, bottom, top = self.cell_range(*entry[:4])
+            for row in range(bottom, top + 1):
+                for column in range(left, right + 1):
+                    cell = self.cells.get((row, column))
+                    if cell is None:
+                        continue
+                    cell[:] = [other for other in cell
+                               if id(other) not in removed]
+                    if not cell:
+                        del self.cells[(row, column)]
+
+    def overlapping(self, left, right, bottom, top):
+        """Returns the hit boxes that overlap a rectangle. A hit box in
+        more than one cell can be returned more than once."""
+        COLLISION_QUERIES[self.kind] += 1
+        found = []
+        cells = self.cells
+        first_column, last_column, first_row, last_row = self.cell_range(
+            left, right, bottom, top)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cell = cells.get((row, column))
+                if cell is None:
+                    continue
+                for entry in cell:
+                    if entry[0] < right and entry[1] > left \
+                            and entry[2] < top and entry[3] > bottom:
+                        found.append(entry)
+        return found
+
+
+class ContactState:
+    """What the player is touching after a physics step, worked out once
+    so handling the input and choosing the animation don't each have to
+    ask the physics engine again"""
+
+    def __init__(self, grounded=False, can_jump=False, on_ladder=False,
+                 against_wall=False):
+        """Stores what the player is touching"""
+
+        # Whether there is a floor close under the player's feet, and
+        # whether it is close enough to jump off.
+        self.grounded = grounded
+        self.can_jump = can_jump
+
+        # Whether the player is touching a ladder, and whether their
+        # last move across was stopped by a wall.
+        self.on_ladder = on_ladder
+        self.against_wall = against_wall
+
+
+class PlatformerPhysics:
+    """A platformer physics engine for the player on a tile map. The
+    player's hit box is swept along each move, so they can't pass
+    through a wall however fast they go, and the walls and ladders can
+    be changed without creating the engine again."""
+
+    def __init__(self, player_sprite, cell_width, cell_height,
+                 gravity_constant=GRAVITY, skin=PHYSICS_SKIN):
+        """Creates the engine with no walls or ladders"""
+        self.player_sprite = player_sprite
+        self.gravity_constant = gravity_constant
+        self.skin = skin
+        self.walls = WallGrid(cell_width, cell_height)
+        self.ladders = WallGrid(cell_width, cell_height, "ladders")
+
+        # Whether the last move across was stopped by a wall.
+        self.against_wall = False
+
+        # The edges of the player's hit box from its center, which
+        # stay the same as the player animates.
+        x_points, y_points = zip(*player_sprite.get_adjusted_hit_box())
+        center_x, center_y = player_sprite.position
+        self.left = min(x_points) - center_x
+        self.right = max(x_points) - center_x
+        self.bottom = min(y_points) - center_y
+        self.top = max(y_points) - center_y
+
+    def add_walls(self, name, sprites):
+        """Makes a set of sprites solid, or updates it if it already
+        was"""
+        self.walls.add(name, sprites)
+
+    def remove_walls(self, name):
+        """Lets the player pass through a set of sprites again"""
+        self.walls.remove(name)
+
+    def add_ladders(self, name, sprites):
+        """Makes a set of sprites climbable"""
+        self.ladders.add(name, sprites)
+
+    def remove_ladders(self, name):
+        """Stops a set of sprites being climbable"""
+        self.ladders.remove(name)
+
+    def box(self, x, y):
+        """Returns the edges of the player's hit box with its center at
+        a position"""
+        return x + self.left, x + self.right, y + self.bottom, y + self.top
+
+    def is_on_ladder(self):
+        """Returns whether the player is touching a ladder"""
+        return bool(self.ladders.overlapping(
+            *self.box(*self.player_sprite.position)))
+
+    def can_jump(self, y_distance=GROUND_DISTANCE):
+        """Returns whether there is a wall under the player, within the
+        given distance of their feet"""
+        x, y = self.player_sprite.position
+        return bool(self.walls.overlapping(*self.box(x, y - y_distance)))
+
+    def contacts(self):
+        """Returns what the player is touching, with one look under
+        their feet and one at the ladders"""
+        left, right, bottom, top = self.box(*self.player_sprite.position)
+        floor = min((bottom - entry[3] for entry in self.walls.overlapping(
+            left, right, bottom - JUMP_DISTANCE, top)), default=math.inf)
+        return ContactState(
+            grounded=floor < GROUND_DISTANCE,
+            can_jump=floor < JUMP_DISTANCE,
+            on_ladder=bool(self.ladders.overlapping(left, right, bottom,
+                                                    top)),
+            against_wall=self.against_wall)
+
+    def sweep(self, x, y, change_x, change_y):
+        """Returns how far along one axis the player can move from a
+        position before a wall stops them, and the walls that stop
+        them. Everything the hit box passes over on the way is checked,
+        not just where it ends up."""
+        left, right, bottom, top = self.box(x, y)
+        if change_x > 0:
+            walls = self.walls.overlapping(right, right + change_x,
+                                           bottom, top)
+            gaps = [entry[0] - right for entry in walls]
+        elif change_x < 0:
+            walls = self.walls.overlapping(left + change_x, left,
+                                           bottom, top)
+            gaps = [left - entry[1] for entry in walls]
+        elif change_y > 0:
+            walls = self.walls.overlapping(left, right, top, top + change_y)
+            gaps = [entry[2] - top for entry in walls]
+        else:
+            walls = self.walls.overlapping(left, right, bottom + change_y,
+                                           bottom)
+            gaps = [bottom - entry[3] for entry in walls]
+
+        distance = abs(change_x or change_y)
+        if not gaps:
+            return distance, []
+        gap = min(gaps)
+        return max(gap - self.skin, 0), [
+            entry for entry, other in zip(walls, gaps) if other == gap]
+
+    def push_out(self, x, y):
+        """Returns the nearest position to try that doesn't put the
+        player inside a wall, checking further away each time in the
+        same order arcade's physics engines do"""
+        distance = 1
+        while distance <= PHYSICS_PUSH_LIMIT:
+            for step_x, step_y in ((0, 1), (0, -1), (1, 0), (-1, 0),
+                                   (1, 1), (1, -1), (-1, 1), (-1, -1)):
+                new_x = x + step_x * distance
+                new_y = y + step_y * distance
+                if not self.walls.overlapping(*self.box(new_x, new_y)):
+                    return new_x, new_y
+            distance *= 2
+        return x, y
+
+    def update(self, on_ladder=None):
+        """Moves the player by their speed, with gravity unless they
+        are on a ladder, and stops them against walls. The player can
+        step up onto a ledge no higher than their speed across, like
+        arcade's engine lets them. Whether the player is on a ladder
+        can be passed in if it is already known. Returns the walls that
+        were hit."""
+        player = self.player_sprite
+        if on_ladder is None:
+            on_ladder = self.is_on_ladder()
+        if not on_ladder:
+            player.change_y -= self.gravity_constant
+        x, y = player.position
+        hit_list = []
+        self.against_wall = False
+
+        # Gets the player out of a wall they start inside, like after
+        # swapping to a timeline that has a wall where they stand.
+        if self.walls.overlapping(*self.box(x, y)):
+            x, y = self.push_out(x, y)
+
+        # Moves up or down first, stopping on the floor or ceiling.
+        if player.change_y:
+            distance, hits = self.sweep(x, y, 0, player.change_y)
+            y += math.copysign(distance, player.change_y)
+            if hits:
+                hit_list.extend(entry[4] for entry in hits)
+                player.change_y = 0
+
+        # Then moves across, stepping up onto a low ledge if that is
+        # all that is in the way.
+        if player.change_x:
+            distance, hits = self.sweep(x, y, player.change_x, 0)
+            if hits:
+                hit_list.extend(entry[4] for entry in hits)
+                step = max(entry[3] for entry in hits) \
+                    - (y + self.bottom) + self.skin
+                new_x = x + player.change_x
+                if step <= abs(player.change_x) and not \
+                        self.walls.overlapping(*self.box(new_x, y + step)):
+                    x = new_x
+                    y += step
+                else:
+                    x += math.copysign(distance, player.change_x)
+                    self.against_wall = True
+            else:
+                x += player.change_x
+
+        player.position = x, y
+        return hit_list
+
+    def teleport(self, distance):
+        """Moves the player straight across by a distance, stopping
+        them at the first wall in the way"""
+        x, y = self.player_sprite.position
+        moved, hits = self.sweep(x, y, distance, 0)
+        self.player_sprite.center_x = x + math.copysign(moved, distance)
+
+
+class SceneRenderer:
+    """Draws a scene with its static layers split into chunks, so the
+    chunks off screen are skipped, while the dynamic layers are drawn
+    whole"""
+
+    def __init__(self, scene, level_data, lazy=False):
+        """Puts the sprites of the static layers into a sprite list
+        for each chunk, keeping the order the layers are drawn in"""
+        scaling = level_data.header["scaling"]
+        self.chunk_width = STATIC_CHUNK_TILES * level_data.tile_width \
+            * scaling
+        self.chunk_height = STATIC_CHUNK_TILES * level_data.tile_height \
+            * scaling
+
+        # Each step is drawn in order and holds (left, right, bottom,
+        # top, sprite_list) chunks. Next to each other static layers
+        # share their chunks, unless a sprite of one of them sticks out
+        # of its chunk, as it could then cover the sprites of another
+        # chunk drawn before it.
+        self.steps = []
+        group = None
+        for name, sprite_list in scene.name_mapping.items():
+            if name in DYNAMIC_LAYERS:
+                self.steps.append((False, [(-np.inf, np.inf, -np.inf,
+                                            np.inf, sprite_list)]))
+                group = None
+                continue
+            layer_chunks, fits = self.split(sprite_list)
+            if group is None or not fits:
+                group = {}
+                self.steps.append((True, group))
+            for key, (bounds, sprites) in layer_chunks.items():
+                if key in group:
+                    group_bounds, group_sprites = group[key]
+                    bounds = (min(bounds[0], group_bounds[0]),
+                              max(bounds[1], group_bounds[1]),
+                              min(bounds[2], group_bounds[2]),
+                              max(bounds[3], group_bounds[3]))
+                    sprites = group_sprites + sprites
+                group[key] = (bounds, sprites)
+            if not fits:
+                group = None
+
+        # Makes the sprite lists of the chunks once every layer is in.
+        self.chunk_count = 0
+        for index, (static, chunks) in enumerate(self.steps):
+            if static:
+                chunk_list = []
+                for bounds, sprites in chunks.values():
+                    sprite_list = arcade.SpriteList(lazy=lazy)
+                    sprite_list.extend(sprites)
+                    chunk_list.append((*bounds, sprite_list))
+                self.steps[index] = (True, chunk_list)
+                self.chunk_count += len(chunk_list)
+
+        # Counts what the last frame drew.
+        self.chunks_drawn = 0
+        self.sprites_drawn = 0
+        self.draw_calls = 0
+
+    def split(self, sprite_list):
+        """Sorts a layer's sprites into the chunks their centers are
+        in, with the area each chunk's sprites cover, and returns
+        whether every sprite fits inside its chunk"""
+        chunks = {}
+        fits = True
+        for sprite in sprite_list:
+            column = int(sprite.center_x // self.chunk_width)
+            row = int(sprite.center_y // self.chunk_height)
+            left, right = sprite.left, sprite.right
+            bottom, top = sprite.bottom, sprite.top
+            if left < column * self.chunk_width - 0.01 \
+                    or right > (column + 1) * self.chunk_width + 0.01 \
+                    or bottom < row * self.chunk_height - 0.01 \
+                    or top > (row + 1) * self.chunk_height + 0.01:
+                fits = False
+            if (column, row) in chunks:
+                bounds, sprites = chunks[column, row]
+                bounds = (min(left, bounds[0]), max(right, bounds[1]),
+                          min(bottom, bounds[2]), max(top, bounds[3]))
+                sprites.append(sprite)
+            else:
+                bounds, sprites = (left, right, bottom, top), [sprite]
+            chunks[column, row] = (bounds, sprites)
+        return chunks, fits
+
+    def visible(self, left, bottom, width, height):
+        """Returns the sprite lists to draw, in order, for a view with
+        the given bottom left corner and size, and counts them"""
+        right = left + width
+        top = bottom + height
+        sprite_lists = []
+        self.chunks_drawn = 0
+        for static, chunks in self.steps:
+            for chunk_left, chunk_right, chunk_bottom, chunk_top, \
+                    sprite_list in chunks:
+                if chunk_right > left and chunk_left < right \
+                        and chunk_top > bottom and chunk_bottom < top:
+                    sprite_lists.append(sprite_list)
+                    self.chunks_drawn += static
+        self.draw_calls = len(sprite_lists)
+        self.sprites_drawn = sum(len(sprite_list)
+                                 for sprite_list in sprite_lists)
+        return sprite_lists
+
+    def initialize(self):
+        """Creates the OpenGL resources of every sprite list drawn"""
+        for static, chunks in self.steps:
+            for chunk in chunks:
+                chunk[4].initialize()
+
+    def draw(self, camera):
+        """Draws the chunks the camera can see and the dynamic layers"""
+        left, bottom = camera.position
+        for sprite_list in self.visible(
+                left, bottom, camera.viewport_width * camera.scale,
+                camera.viewport_height * camera.scale):
+            sprite_list.draw()
+
+
+class StreamedTriggers:
+    """Everything the player can set something off by touching in a
+    streaming level, laid out on the map grid in named sets, so the
+    chunks of a layer can be added as they load and taken out as they
+    are dropped. Answers the same queries as the collision grid."""
+
+    def __init__(self, level_data, scene, layers=TRIGGER_LAYERS, pool=None):
+        """Lays out the sprites of the trigger layers that are already
+        in the scene, which are the ones that aren't streamed"""
+        scaling = level_data.header["scaling"]
+        self.cell_width = level_data.tile_width * scaling
+        self.cell_height = level_data.tile_height * scaling
+        self.pool = pool or SpritePool(scene, ())
+
+        # A grid for each trigger layer in the map, in the order they
+        # are checked.
+        self.grids = {layer: WallGrid(self.cell_width, self.cell_height,
+                                      "triggers")
+                      for layer in layers if layer in scene.name_mapping}
+        for layer, grid in self.grids.items():
+            grid.add(None, scene[layer])
+
+    def add(self, layer, name, sprites):
+        """Lays out a set of sprites in a trigger layer"""
+        if layer in self.grids:
+            self.grids[layer].add(name, sprites)
+
+    def remove(self, layer, name):
+        """Takes a set of sprites out of a trigger layer"""
+        if layer in self.grids:
+            self.grids[layer].remove(name)
+
+    def query(self, sprite):
+        """Returns each trigger layer the sprite touches along with the
+        sprites it touches in that layer, in the order the layers were
+        given"""
+        COLLISION_QUERIES["triggers"] += 1
+        x_points, y_points = zip(*sprite.get_adjusted_hit_box())
+        sprite_left = min(x_points)
+        sprite_right = max(x_points)
+        sprite_bottom = min(y_points)
+        sprite_top = max(y_points)
+
+        # Like the collision grid, touching counts, so the hit box edges
+        # are checked before the slower polygon check, and collected
+        # sprites are skipped.
+        hits = []
+        indices = self.pool.indices
+        pool_flags = self.pool.flags
+        for layer, grid in self.grids.items():
+            first_column, last_column, first_row, last_row = \
+                grid.cell_range(sprite_left, sprite_right, sprite_bottom,
+                                sprite_top)
+            touched = []
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    for other_left, other_right, other_bottom, other_top, \
+                            other in grid.cells.get((row, column), ()):
+                        index = indices.get(id(other), -1)
+                        if other_left > sprite_right \
+                                or other_right < sprite_left \
+                                or other_bottom > sprite_top \
+                                or other_top < sprite_bottom \
+                                or index >= 0 \
+                                and not pool_flags[index] & POOL_COLLIDABLE \
+                                or other in touched:
+                            continue
+                        if arcade.check_for_collision(sprite, other):
+                            touched.append(other)
+            if touched:
+                hits.append((layer, touched))
+        return hits
+
+
+class ChunkStreamer:
+    """Loads the tiles of a level's streamed layers in square chunks
+    around the screen as it moves, and drops the chunks used longest
+    ago once more sprites than the budget are loaded. The walls and
+    triggers of a chunk are added to the physics engine and trigger
+    grid when it loads and taken out when it is dropped. Both lay them
+    out on the whole map's grid, so the player collides the same way
+    across the edges of chunks."""
+
+    def __init__(self, level_data, physics_engine, triggers,
+                 radius=STREAM_RADIUS, budget=STREAM_SPRITE_BUDGET,
+                 lazy=False):
+        """Creates the streamer with no chunks loaded"""
+        self.level_data = level_data
+        self.physics_engine = physics_engine
+        self.triggers = triggers
+        self.radius = radius
+        self.budget = budget
+        self.lazy = lazy
+        self.scaling = level_data.header["scaling"]
+        self.chunk_width = STATIC_CHUNK_TILES * level_data.tile_width \
+            * self.scaling
+        self.chunk_height = STATIC_CHUNK_TILES * level_data.tile_height \
+            * self.scaling
+        self.columns = -(-level_data.width // STATIC_CHUNK_TILES)
+        self.rows = -(-level_data.height // STATIC_CHUNK_TILES)
+        self.layers = [layer for layer in level_data.layers
+                       if layer["name"] in streamed_layers(level_data)]
+
+        # The loaded chunks by column and row, used longest ago first,
+        # each with the sprite list of every streamed layer, how many
+        # sprites it has and the area they cover.
+        self.chunks = OrderedDict()
+        self.sprite_count = 0
+
+        # Counts the chunks loaded and dropped, and the most sprites
+        # that were loaded at once.
+        self.loads = 0
+        self.evictions = 0
+        self.most_sprites = 0
+
+    def needed(self, left, bottom, width, height):
+        """Returns the chunks within the radius of a view with the
+        given bottom left corner and size"""
+        first_column = max(int(left // self.chunk_width) - self.radius, 0)
+        last_column = min(int((left + width) // self.chunk_width)
+                          + self.radius, self.columns - 1)
+        first_row = max(int(bottom // self.chunk_height) - self.radius, 0)
+        last_row = min(int((bottom + height) // self.chunk_height)
+                       + self.radius, self.rows - 1)
+        return [(column, row) for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
+
+    def load(self, key):
+        """Creates the sprites of a chunk's tiles and adds its walls and
+        triggers"""
+        column, row = key
+        level_data = self.level_data
+        first_column = column * STATIC_CHUNK_TILES
+
+        # Map rows are counted down from the top, and chunk rows up
+        # from the bottom.
+        last_row = level_data.height - row * STATIC_CHUNK_TILES
+        first_row = max(last_row - STATIC_CHUNK_TILES, 0)
+
+        layers = {}
+        count = 0
+        bounds = (np.inf, -np.inf, np.inf, -np.inf)
+        for layer in self.layers:
+            options = LAYER_OPTIONS.get(layer["name"], {})
+            sprite_list = arcade.SpriteList(
+                use_spatial_hash=options.get("use_spatial_hash"),
+                lazy=self.lazy)
+            gids = level_data.tile_gids[layer["index"]][
+                first_row:last_row,
+                first_column:first_column + STATIC_CHUNK_TILES]
+            for tile_row, tile_column in zip(*np.nonzero(gids)):
+                sprite_list.append(create_placed_tile(
+                    level_data, int(gids[tile_row, tile_column]),
+                    first_row + tile_row, first_column + tile_column,
+                    self.scaling))
+            layers[layer["name"]] = sprite_list
+            count += len(sprite_list)
+            for sprite in sprite_list:
+                bounds = (min(bounds[0], sprite.left),
+                          max(bounds[1], sprite.right),
+                          min(bounds[2], sprite.bottom),
+                          max(bounds[3], sprite.top))
+
+            # Adds the chunk's walls, ladders and triggers as their own
+            # sets, so they can be taken out again on their own.
+            name = (layer["name"], key)
+            if layer["name"] == LAYER_NAME_PLATFORMS:
+                self.physics_engine.add_walls(name, sprite_list)
+            elif layer["name"] == LAYER_NAME_LADDERS:
+                self.physics_engine.add_ladders(name, sprite_list)
+            self.triggers.add(layer["name"], name, sprite_list)
+
+        self.chunks[key] = (layers, count, bounds)
+        self.sprite_count += count
+        self.loads += 1
+
+    def unload(self, key):
+        """Drops a chunk's sprites and takes out its walls and
+        triggers"""
+        layers, count, bounds = self.chunks.pop(key)
+        for layer in layers:
+            name = (layer, key)
+            if layer == LAYER_NAME_PLATFORMS:
+                self.physics_engine.remove_walls(name)
+            elif layer == LAYER_NAME_LADDERS:
+                self.physics_engine.remove_ladders(name)
+            self.triggers.remove(layer, name)
+
+            # Sprites and their lists refer to each other, so the list
+            # is cleared to free the sprites now rather than leave them
+            # for the garbage collector.
+            layers[layer].clear()
+        self.sprite_count -= count
+        self.evictions += 1
+
+    def update(self, left, bottom, width, height):
+        """Loads the chunks within the radius of a view with the given
+        bottom left corner and size, then drops the chunks used longest
+        ago until the sprites loaded are within the budget"""
+        needed = self.needed(left, bottom, width, height)
+        for key in needed:
+            if key in self.chunks:
+                self.chunks.move_to_end(key)
+            else:
+                self.load(key)
+        self.most_sprites = max(self.most_sprites, self.sprite_count)
+
+        # The chunks that are needed are the last ones used, so they are
+        # never dropped, even if they don't fit in the budget.
+        while self.sprite_count > self.budget \
+                and len(self.chunks) > len(needed):
+            self.unload(next(iter(self.chunks)))
+
+
+class StreamingRenderer:
+    """Draws a streaming level's loaded chunks that are on screen, and
+    the layers that aren't streamed whole, in the order the layers are
+    drawn"""
+
+    def __init__(self, scene, streamer):
+        """Draws the scene's layers, taking the streamed ones from the
+        streamer's chunks"""
+        self.scene = scene
+        self.streamer = streamer
+        self.streamed = {layer["name"] for layer in streamer.layers}
+
+        # Counts what the last frame drew.
+        self.chunks_drawn = 0
+        self.sprites_drawn = 0
+        self.draw_calls = 0
+
+    @property
+    def chunk_count(self):
+        """Returns how many chunks are loaded"""
+        return len(self.streamer.chunks)
+
+    def visible(self, left, bottom, width, height):
+        """Returns the sprite lists to draw, in order, for a view with
+        the given bottom left corner and size, and counts them"""
+        right = left + width
+        top = bottom + height
+        chunks = [layers for layers, count, (chunk_left, chunk_right,
+                                             chunk_bottom, chunk_top)
+                  in self.streamer.chunks.values()
+                  if chunk_right > left and chunk_left < right
+                  and chunk_top > bottom and chunk_bottom < top]
+        self.chunks_drawn = len(chunks)
+
+        sprite_lists = []
+        for name, sprite_list in self.scene.name_mapping.items():
+            if name in self.streamed:
+                sprite_lists.extend(layers[name] for layers in chunks)
+            else:
+                sprite_lists.append(sprite_list)
+        self.draw_calls = len(sprite_lists)
+        self.sprites_drawn = sum(len(sprite_list)
+                                 for sprite_list in sprite_lists)
+        return sprite_lists
+
+    def initialize(self):
+        """Creates the OpenGL resources of the layers that aren't
+        streamed, as the chunks create theirs when they load"""
+        for name, sprite_list in self.scene.name_mapping.items():
+            if name not in self.streamed:
+                sprite_list.initialize()
+
+    def draw(self, camera):
+        """Draws the chunks the camera can see and the other layers"""
+        left, bottom = camera.position
+        for sprite_list in self.visible(
+                left, bottom, camera.viewport_width * camera.scale,
+                camera.viewport_height * camera.scale):
+            sprite_list.draw()
+
+
+def camera_position(player_sprite, viewport_width, viewport_height):
+    """Returns where the bottom left corner of the camera goes to have
+    the player in the middle of the screen"""
+
+    # Centers the camera on the player sprite,
+    # subtracting half the viewport width and height.
+    screen_center_x = player_sprite.center_x - (viewport_width / 2)
+    screen_center_y = player_sprite.center_y - (viewport_height / 2)
+
+    # Accounts for the edges of the screen
+    # and centers the camera accordingly.
+    if screen_center_x < 0:
+        screen_center_x = 0
+    if screen_center_y < 0:
+        screen_center_y = 0
+    return screen_center_x, screen_center_y
+
+
+def prepare_level(level, streaming=False):
+    """Loads both timelines of a level and creates their scenes without
+    using OpenGL, so it can be run on a worker thread. A streaming
+    level's scenes leave out the tiles that are loaded in chunks."""
+    level_data = {}
+    for timeline in TIMELINES:
+        level_data[timeline] = load_level_data(level_map_name(level, timeline))
+        preload_textures(level_data[timeline])
+    scenes = build_scenes(level_data, lazy=True, streaming=streaming)
+
+    # Loads the player's textures too, which only happens for the first
+    # level as they are kept after that.
+    TEXTURES.character(PLAYER_TEXTURE_PATH)
+    return level_data, scenes
+
+
+class LevelPrefetcher:
+    """Loads the next level on a worker thread while the current
+    level is being played"""
+
+    def __init__(self, streaming=False):
+        """Starts the worker thread used for loading levels, which are
+        loaded for streaming if asked to"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="level-prefetch")
+        self.streaming = streaming
+
+        # The levels being loaded in the background.
+        self.pending = {}
+
+        # The level that was last handed to the game, kept so dying or
+        # restarting doesn't load it again.
+        self.current_level = None
+        self.current_data = None
+
+        # Records the level, whether it was already loaded (a hit) and
+        # how long the game waited for it on every level change.
+        self.transitions = []
+
+    def prefetch(self, level):
+        """Starts loading a level in the background"""
+        if level > LEVEL_COUNT or level == self.current_level \
+                or level in self.pending:
+            return
+        self.pending[level] = self.executor.submit(prepare_level, level,
+                                                   self.streaming)
+
+    def take(self, level):
+        """Returns the level data and scenes for both timelines of a
+        level, loading it now if it wasn't loaded in the background in
+        time. The scenes are only handed out once, so a level that is
+        taken again gets None and has to create new scenes."""
+        if level == self.current_level:
+            return self.current_data, None
+
+        start_time = time.perf_counter()
+        future = self.pending.pop(level, None)
+        hit = future is not None and future.done()
+        if future is not None:
+            level_data, scenes = future.result()
+        else:
+            level_data, scenes = prepare_level(level, self.streaming)
+        wait_time = time.perf_counter() - start_time
+
+        self.transitions.append((level, hit, wait_time))
+
+        self.current_level = level
+        self.current_data = level_data
+        return level_data, scenes
+
+    def summary(self):
+        """Returns how many level changes found the level already
+        loaded, and the longest the game waited for one"""
+        hits = sum(hit for level, hit, wait_time in self.transitions)
+        longest = max((wait_time for level, hit, wait_time
+                       in self.transitions), default=0)
+        return (f"prefetch {hits}/{len(self.transitions)} hits, "
+                f"longest wait {longest * 1000:.1f}ms")
+
+
+class SpritePool:
+    """The keys, potions and locks of a scene, which stay in their
+    sprite lists for the whole level. Collecting one hides it and clears
+    its flags in a byte array so nothing touches it, instead of taking
+    it out of its sprite lists, and restoring the pool sets them
+    again."""
+
+    def __init__(self, scene, layers=COLLECTABLE_LAYERS):
+        """Gives every sprite in the layers a place in the pool, with
+        its flags set"""
+        self.sprites = []
+        self.layers = {}
+        for layer in layers:
+            start = len(self.sprites)
+            self.sprites.extend(scene[layer])
+            self.layers[layer] = range(start, len(self.sprites))
+        self.indices = {id(sprite): index
+                        for index, sprite in enumerate(self.sprites)}
+        self.flags = bytearray([POOL_PRESENT]) * len(self.sprites)
+
+        # The places of the sprites that have been collected, so
+        # restoring only goes through those.
+        self.collected = []
+
+        # A copy of the flags, kept until they next change, so saving
+        # the game state every step doesn't copy them every step.
+        self.saved_flags = None
+
+    def collect(self, sprites):
+        """Hides the sprites and stops them being touched"""
+        for sprite in sprites:
+            index = self.indices[id(sprite)]
+            if self.flags[index]:
+                self.flags[index] = 0
+                sprite.visible = False
+                self.collected.append(index)
+                self.saved_flags = None
+
+    def present(self, layer):
+        """Returns the sprites of a layer that haven't been collected"""
+        flags = self.flags
+        return [self.sprites[index] for index in self.layers[layer]
+                if flags[index] & POOL_COLLIDABLE]
+
+    def restore(self):
+        """Shows every collected sprite again and lets it be touched"""
+        for index in self.collected:
+            self.flags[index] = POOL_PRESENT
+            self.sprites[index].visible = True
+            self.saved_flags = None
+        self.collected.clear()
+
+    def save(self):
+        """Returns a copy of the flags"""
+        if self.saved_flags is None:
+            self.saved_flags = bytes(self.flags)
+        return self.saved_flags
+
+    def load(self, flags):
+        """Sets the flags to a copy made by save, only showing or hiding
+        the sprites whose flags change"""
+        if len(flags) != len(self.flags):
+            raise ValueError(f"flags for {len(flags)} sprites, not "
+                             f"{len(self.flags)}")
+        if flags == self.flags:
+            return
+        for index, (old, new) in enumerate(zip(self.flags, flags)):
+            if old != new:
+                self.sprites[index].visible = bool(new & POOL_VISIBLE)
+        self.flags[:] = flags
+        self.collected = [index for index, value in enumerate(flags)
+                          if not value]
+        self.saved_flags = flags
+
+
+class LevelSnapshot:
+    """Records the starting state of a level's keys, potions, locks and
+    player spawn, so the level can be reset without loading it again"""
+
+    def __init__(self, pools, spawn):
+        """Keeps the sprite pool of each timeline, which know which
+        keys, potions and locks have been collected"""
+        self.spawn = spawn
+        self.pools = pools
+
+    def restore_timeline(self, timeline):
+        """Puts back any keys, potions and locks that were collected in
+        a timeline, as if its map had just been loaded"""
+        self.pools[timeline].restore()
+
+    def restore(self, player_sprite):
+        """Puts every timeline back to how it started and moves the
+        player back to the spawn point"""
+        for timeline in self.pools:
+            self.restore_timeline(timeline)
+        player_sprite.respawn(self.spawn)
+
+
+class LevelSession:
+    """Keeps the scenes for both timelines of a level loaded so
+    swapping timelines doesn't reload the map"""
+
+    def __init__(self, level, player_sprite, level_data, scenes=None,
+                 headless=False, streaming=False):
+        """Creates the scenes for both timelines of the level once,
+        unless they were already made by the prefetcher. A headless
+        session has no window, so it never creates OpenGL resources. A
+        streaming session loads the tiles of the layers that never
+        change in chunks around the player instead of all at once."""
+
+        self.level = level
+        self.level_data = level_data
+        self.scenes = {}
+        self.pools = {}
+        self.collision_grids = {}
+        self.physics_engines = {}
+        self.renderers = {}
+        self.streamers = {}
+
+        # Tracks how long each timeline swap and level reset took
+        # in seconds.
+        self.swap_latencies = []
+        self.reset_latencies = []
+
+        # Use scene to load up all layers from the map as SpriteLists
+        # in the scene in the proper order.
+        # The scene's static layers are never drawn themselves, so
+        # they stay lazy and don't create any OpenGL resources.
+        if not scenes:
+            scenes = build_scenes(level_data, lazy=True,
+                                  streaming=streaming)
+
+        for timeline in TIMELINES:
+            scene = scenes[timeline]
+
+            # Pools the keys, potions and locks, then indexes everything
+            # the player can touch on the map grid. A streaming session
+            # indexes them in sets that chunks can be added to and taken
+            # out of.
+            self.pools[timeline] = SpritePool(scene)
+            if streaming:
+                self.collision_grids[timeline] = StreamedTriggers(
+                    level_data[timeline], scene, pool=self.pools[timeline])
+            else:
+                self.collision_grids[timeline] = CollisionGrid(
+                    level_data[timeline], scene, pool=self.pools[timeline])
+
+            # Lays the platforms and ladders out for the physics engine
+            # once. Which of the locks or placeholders are walls is
+            # changed by the simulation as keys are collected.
+            scaling = level_data[timeline].header["scaling"]
+            physics_engine = PlatformerPhysics(
+                player_sprite, level_data[timeline].tile_width * scaling,
+                level_data[timeline].tile_height * scaling)
+            physics_engine.add_walls(LAYER_NAME_PLATFORMS,
+                                     scene[LAYER_NAME_PLATFORMS])
+            physics_engine.add_ladders(LAYER_NAME_LADDERS,
+                                       scene[LAYER_NAME_LADDERS])
+            self.physics_engines[timeline] = physics_engine
+
+            # The same player sprite is in both scenes, so its position
+            # is kept when the active scene changes.
+            player_list = arcade.SpriteList(lazy=headless)
+            player_list.append(player_sprite)
+            scene.add_sprite_list(LAYER_NAME_PLAYER, sprite_list=player_list)
+            self.scenes[timeline] = scene
+
+            # Streams the chunks of the layers that never change in and
+            # out of the physics engine and trigger grid.
+            if streaming:
+                self.streamers[timeline] = ChunkStreamer(
+                    level_data[timeline], physics_engine,
+                    self.collision_grids[timeline], lazy=headless)
+
+            # Splits the static layers into chunks to draw and creates
+            # the OpenGL resources of what is drawn now, so the first
+            # swap to this timeline doesn't have to.
+            if not headless:
+                if streaming:
+                    renderer = StreamingRenderer(
+                        scene, self.streamers[timeline])
+                else:
+                    renderer = SceneRenderer(scene, level_data[timeline])
+                renderer.initialize()
+                self.renderers[timeline] = renderer
+
+        # Records the starting state so dying or restarting can put
+        # the level back without loading it again.
+        self.snapshot = LevelSnapshot(self.pools,
+                                      (PLAYER_START_X, PLAYER_START_Y))
+
+    def swap(self, timeline):
+        """Makes the given timeline active and returns its scene"""
+        start_time = time.perf_counter()
+
+        self.snapshot.restore_timeline(timeline)
+        scene = self.scenes[timeline]
+
+        # Records the swap time so the profiler overlay can show it.
+        self.swap_latencies.append(time.perf_counter() - start_time)
+
+        return scene
+
+    def summary(self):
+        """Returns how many timeline swaps there were, how many took
+        longer than a frame, and the longest one"""
+        slow = sum(latency > SWAP_FRAME_BUDGET
+                   for latency in self.swap_latencies)
+        longest = max(self.swap_latencies, default=0)
+        return (f"swaps {len(self.swap_latencies)}, {slow} over "
+                f"{SWAP_FRAME_BUDGET * 1000:.1f}ms, "
+                f"longest {longest * 1000:.1f}ms")
+
+    def stream(self, timeline, player_sprite):
+        """Loads the chunks of a streaming session's timeline around the
+        screen with the player in the middle"""
+        streamer = self.streamers.get(timeline)
+        if streamer is not None:
+            streamer.update(*camera_position(player_sprite, SCREEN_WIDTH,
+                                             SCREEN_HEIGHT),
+                            SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def reset(self, player_sprite):
+        """Puts the level back to how it started"""
+        start_time = time.perf_counter()
+        self.snapshot.restore(player_sprite)
+        self.reset_latencies.append(time.perf_counter() - start_time)
+
+
+class InputState:
+    """The buttons held down, and the actions pressed, for one step of
+    the simulation"""
+
+    __slots__ = ("left", "right", "up", "down", "swap", "reset", "teleport")
+
+    def __init__(self, left=False, right=False, up=False, down=False,
+                 swap=False, reset=False, teleport=False):
+        """Sets which buttons are held and which actions were pressed"""
+
+        # The movement buttons are true for as long as they are held.
+        self.left = left
+        self.right = right
+        self.up = up
+        self.down = down
+
+        # The actions are only true on the step they were pressed.
+        self.swap = swap
+        self.reset = reset
+        self.teleport = teleport
+
+    def copy(self):
+        """Returns a copy of the input state"""
+        return InputState(self.left, self.right, self.up, self.down,
+                          self.swap, self.reset, self.teleport)
+
+    def to_bits(self):
+        """Returns the input state packed into the bits of a byte"""
+        return (INPUT_LEFT * self.left | INPUT_RIGHT * self.right
+                | INPUT_UP * self.up | INPUT_DOWN * self.down
+                | INPUT_SWAP * self.swap | INPUT_RESET * self.reset
+                | INPUT_TELEPORT * self.teleport)
+
+    @classmethod
+    def from_bits(cls, bits):
+        """Unpacks an input state from the bits of a byte"""
+        return cls(bool(bits & INPUT_LEFT), bool(bits & INPUT_RIGHT),
+                   bool(bits & INPUT_UP), bool(bits & INPUT_DOWN),
+                   bool(bits & INPUT_SWAP), bool(bits & INPUT_RESET),
+                   bool(bits & INPUT_TELEPORT))
+
+
+class InputRecording:
+    """The input state of every step of a game, which can be saved to
+    a file and played back to get exactly the same game"""
+
+    def __init__(self, level=1, frames=b"", final_state=None):
+        """Creates a recording of a game started on the given level"""
+        self.level = level
+
+        # One byte of input bits for each step.
+        self.frames = bytearray(frames)
+
+        # The simulation's summary after the last step, so a replay
+        # can check it ended the same way.
+        self.final_state = final_state
+
+    def record(self, input_state, simulation):
+        """Adds the input of a step the simulation just took"""
+        self.frames.append(input_state.to_bits())
+        self.final_state = simulation.summary()
+
+    def inputs(self):
+        """Yields the input state of each step in order"""
+        for bits in self.frames:
+            yield InputState.from_bits(bits)
+
+    def save(self, file_name):
+        """Writes the recording to a file. Buttons are held for many
+        steps in a row, so the frames compress very well."""
+        level, timeline, keys, potions, x, y = self.final_state
+        with open(file_name, "wb") as file:
+            file.write(RECORDING_HEADER.pack(
+                RECORDING_MAGIC, RECORDING_VERSION, self.level,
+                len(self.frames), level, timeline, keys, potions, x, y))
+            file.write(zlib.compress(bytes(self.frames), 9))
+
+    @classmethod
+    def load(cls, file_name):
+        """Reads a recording from a file, raising a ValueError if it
+        isn't a whole recording"""
+        with open(file_name, "rb") as file:
+            data = file.read()
+        if len(data) < RECORDING_HEADER.size:
+            raise ValueError(f"{file_name} is not an input recording")
+        magic, version, start_level, frame_count, level, timeline, \
+            keys, potions, x, y = RECORDING_HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"{file_name} is not an input recording "
+                             f"of version {RECORDING_VERSION}")
+        try:
+            frames = zlib.decompress(data[RECORDING_HEADER.size:])
+        except zlib.error:
+            raise ValueError(f"{file_name} has damaged frames") from None
+        if len(frames) != frame_count:
+            raise ValueError(f"{file_name} should have {frame_count} "
+                             f"frames but has {len(frames)}")
+        return cls(start_level, frames,
+                   (level, timeline, keys, potions, x, y))
+
+
+class GameState:
+    """Everything a game needs to carry on from a step, which can be
+    taken from a simulation and put back into it, and saved as bytes.
+    The keys, potions and locks that are gone are kept as the flags of
+    each timeline's sprite pool."""
+
+    __slots__ = ("level", "timeline", "timeline_change", "keys", "potions",
+                 "claims", "placeholder", "facing_forward",
+                 "jump_needs_reset", "finished", "held", "frame", "x", "y",
+                 "change_x", "change_y", "can_jump", "is_on_ladder",
+                 "against_wall", "animation", "facing", "animation_frame",
+                 "elapsed", "pools")
+
+    # The parts of the state that are true or false, in the order they
+    # are packed into the bits of a byte.
+    BOOLEANS = ("placeholder", "facing_forward", "jump_needs_reset",
+                "finished", "can_jump", "is_on_ladder", "against_wall")
 
     def __init__(self):
-        """Allows the class to run object oriented attributes"""
-
-        # Returns an object that represents a parent class.
-        super().__init__()
-        
-        # Creates a variable for our tile map.
-        self.tile_map = None
+        """Creates the state of a game that has just started"""
 
-        # Sets the path to run the game view.
-        file_path = os.path.dirname(os.path.abspath(__file__))
-        os.chdir(file_path)
+        # Where the game is up to, and what the player has collected,
+        # with the claimed layers as bits in the order of the
+        # collectable layers.
+        self.level = 1
+        self.timeline = 1
+        self.timeline_change = 0
+        self.keys = 0
+        self.potions = 0
+        self.claims = 0
+        self.placeholder = False
 
-        # Creates variables to track the current 
-        # state of what key is pressed.
-        self.left_pressed = False
-        self.right_pressed = False
-        self.up_pressed = False
-        self.down_pressed = False
+        # The buttons held on the last step, and what they did.
+        self.facing_forward = True
+        self.jump_needs_reset = False
+        self.finished = False
+        self.held = 0
+        self.frame = 0
+
+        # Where the player is, how they are moving and what they were
+        # touching, and the animation they show.
+        self.x = PLAYER_START_X
+        self.y = PLAYER_START_Y
+        self.change_x = 0.0
+        self.change_y = 0.0
+        self.can_jump = False
+        self.is_on_ladder = False
+        self.against_wall = False
+        self.animation = ANIMATION_IDLE
+        self.facing = RIGHT_FACING
+        self.animation_frame = 0
+        self.elapsed = 0.0
+
+        # The flags of each timeline's keys, potions and locks.
+        self.pools = (b"",) * len(TIMELINES)
+
+    def to_bytes(self):
+        """Returns the state packed into bytes"""
+        booleans = 0
+        for bit, name in enumerate(self.BOOLEANS):
+            booleans |= getattr(self, name) << bit
+        return GAME_STATE_RECORD.pack(
+            GAME_STATE_MAGIC, GAME_STATE_VERSION, self.level,
+            self.timeline, self.timeline_change, self.keys, self.potions,
+            self.claims, booleans, self.held, self.frame, self.x, self.y,
+            self.change_x, self.change_y, tuple(ANIMATIONS).index(
+                self.animation), self.facing, self.animation_frame,
+            self.elapsed, *(len(flags) for flags in self.pools)) \
+            + b"".join(self.pools)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Unpacks a state from bytes made by to_bytes"""
+        if len(data) < GAME_STATE_RECORD.size:
+            raise ValueError("not a game state")
+        magic, version, *values = GAME_STATE_RECORD.unpack_from(data)
+        if magic != GAME_STATE_MAGIC or version != GAME_STATE_VERSION:
+            raise ValueError(f"not a game state of version "
+                             f"{GAME_STATE_VERSION}")
+
+        state = cls()
+        state.level, state.timeline, state.timeline_change, state.keys, \
+            state.potions, state.claims, booleans, state.held, \
+            state.frame, state.x, state.y, state.change_x, \
+            state.change_y, animation, state.facing, \
+            state.animation_frame, state.elapsed, *sizes = values
+        for bit, name in enumerate(cls.BOOLEANS):
+            setattr(state, name, bool(booleans >> bit & 1))
+
+        # Checks the values that pick a level, timeline or animation,
+        # so a damaged state can't pick one that doesn't exist.
+        if not 1 <= state.level <= LEVEL_COUNT + 1 \
+        or state.timeline not in TIMELINES \
+        or animation >= len(ANIMATIONS) \
+        or state.facing not in (RIGHT_FACING, LEFT_FACING):
+            raise ValueError("a game state with a value out of range")
+        state.animation = tuple(ANIMATIONS)[animation]
+
+        # The flags of each timeline follow one after another.
+        pools = []
+        start = GAME_STATE_RECORD.size
+        for size in sizes:
+            pools.append(bytes(data[start:start + size]))
+            start += size
+        if start != len(data):
+            raise ValueError("not a whole game state")
+        state.pools = tuple(pools)
+        return state
+
+    def save(self, file_name):
+        """Writes the state to a file"""
+        with open(file_name, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file_name):
+        """Reads a state from a file"""
+        with open(file_name, "rb") as file:
+            data = file.read()
+        try:
+            return cls.from_bytes(data)
+        except ValueError as error:
+            raise ValueError(f"{file_name} is {error}") from None
+
+
+class RewindBuffer:
+    """The game states of the latest steps, which the game can be
+    stepped back through. The states are kept packed into bytes, which
+    take less than half the memory, and once it is full the oldest state
+    is dropped for each new one."""
+
+    def __init__(self, capacity=REWIND_FRAMES):
+        """Creates an empty buffer that holds at most the given number
+        of states"""
+        self.states = deque(maxlen=capacity)
+        self.level = None
+
+    def __len__(self):
+        """Returns how many states the buffer holds"""
+        return len(self.states)
+
+    def push(self, state):
+        """Adds the state of the latest step. The buffer starts again
+        when the level changes, as going back to an earlier level would
+        load its map again."""
+        if state.level != self.level:
+            self.states.clear()
+            self.level = state.level
+        self.states.append(state.to_bytes())
+
+    def pop(self):
+        """Takes out and returns the latest state, or None if the
+        buffer is empty"""
+        if self.states:
+            return GameState.from_bytes(self.states.pop())
+        return None
+
+    def clear(self):
+        """Drops every state"""
+        self.states.clear()
+
+
+class Simulation:
+    """The rules of the game, stepped one fixed timestep at a time by an
+    input state. It doesn't need a window, so it can run headless as
+    well as be drawn by GameView."""
+
+    def __init__(self, level=1, prefetcher=None, headless=False,
+                 streaming=False):
+        """Creates the game state and sets up the first level"""
+
+        # A headless simulation never creates OpenGL resources, and a
+        # streaming one only loads the map in chunks around the player.
+        self.headless = headless
+        self.streaming = streaming
+
+        # Creates the prefetcher that loads the next level in the
+        # background.
+        self.prefetcher = prefetcher or LevelPrefetcher(streaming)
+
+        # The buttons that were held on the last step.
+        self.held = InputState()
         self.jump_needs_reset = False
 
-        # Creates a variable for our scene object.
+        # Creates variables for the level session, which holds the
+        # scenes for both timelines of the current level, the scene of
+        # the current timeline, the pool of its keys, potions and locks,
+        # the collision grid of its triggers, its physics engine and the
+        # renderer that draws it, which headless games don't have.
+        self.level_session = None
         self.scene = None
+        self.pool = None
+        self.collision_grid = None
+        self.renderer = None
 
-        # Creates a variable that holds the player sprite.
+        # Creates variables for the player sprite, physics engine and
+        # what the player was touching after the last physics step.
         self.player_sprite = None
-
-        # Creates a variable for our physics engine.
         self.physics_engine = None
+        self.contacts = ContactState()
 
-        # Assigns a variable for a camera to scroll the screen.
-        self.camera = None
-
-        # Assigns a variable for a Camera that can be 
-        # used to draw GUI elements.
-        self.gui_camera = None
-        
         # Creates variable for multiple levels and two timelines.
-        self.level = 1
+        self.level = level
         self.timeline = 1
 
         # Sets the timeline_change variable to 0
         # showing the timeline hasn't changed yet.
         self.timeline_change = 0
 
-        # Sets the constant for locks and variables for if the yellow
-        # key(s) has been claimed and whether they are available
-        # for use.
+        # Sets the constant for locks and the number of keys and
+        # potions available for use.
         self.lock_state = LAYER_NAME_LOCKS
         self.keys_available = 0
-        self.key_claim_1 = 0
-        self.key_claim_2 = 0
-
-        # Sets the variables for the number of potions the user has
-        # collected and whether they are available for use.
         self.potions_available = 0
-        self.potion_claim_1 = 0
-        self.potion_claim_2 = 0
-        
-        # Assigns a variabele for the direction the player sprite is
-        # facing, so we can refer to it for this class.
-        self.character_face_direction = \
-        PlayerCharacter().character_face_direction
-        
-        # Load sounds to play when doing applicable activities.
-        self.jump_sound = arcade.load_sound(":resources:sounds/jump1.wav")
+
+        # Tracks which key and potion layers have been claimed in this
+        # level, since each one only counts once across both timelines.
+        self.claimed_layers = set()
+
+        # Tracks which way the player last moved, so teleporting
+        # goes that way.
+        self.facing_forward = True
+
+        # Counts the steps taken, and lists what happened on the last
+        # one that the game might want to play a sound for.
+        self.frame = 0
+        self.events = []
+
+        # How many collision queries the last step made.
+        self.step_queries = 0
+
+        # Set once the player has finished the last level.
+        self.finished = False
+
+        # Registers what happens when the player touches each kind of
+        # trigger.
+        self.triggers = TriggerDispatcher()
+        self.triggers.register(TRIGGER_BOUNCE, self.on_bounce)
+        self.triggers.register(TRIGGER_HAZARD, self.on_hazard)
+        self.triggers.register(TRIGGER_EXIT, self.on_exit)
+        self.triggers.register(TRIGGER_KEY, self.on_collect_key)
+        self.triggers.register(TRIGGER_LOCK, self.on_open_lock)
+        self.triggers.register(TRIGGER_POTION, self.on_collect_potion)
 
         self.setup()
 
     def setup(self):
         """This function is called whenever the 
         game needs to be setup"""
-  
-        # Setup the cameras.
-        self.camera = arcade.Camera()
-        self.gui_camera = arcade.Camera()
 
-        # Closes the game if the player beats level 3
-        if self.level > 3:
-            arcade.exit()
+        # Finishes the game if the player beats level 3
+        if self.level > LEVEL_COUNT:
+            self.finished = True
+            return
 
-        # Name of map file to load, along with the relevant level and 
-        # timeline to load to allow for easy switching between
-        # levels and timelines.
-        self.map_name = f"C:/Users/kevin/Documents/School/13DTP/\
-game_level_{self.level}_{self.timeline}.tmx"
-
-        # Layer specific options make the SpriteList for the platforms 
-        # layer, with spatial hashing used for detection.
-        layer_options = {
-            LAYER_NAME_PLATFORMS: {
-                "use_spatial_hash": True,
-            LAYER_NAME_DONT_TOUCH: {
-                "use_spatial_hash": True,
-            LAYER_NAME_LOCKS: {
-                "use_spatial_hash": True,
-            LAYER_NAME_LADDERS: {
-                "use_spatial_hash": False,
-            LAYER_NAME_KEY_1: {
-                "use_spatial_hash": False,
-            LAYER_NAME_KEY_2: {
-                "use_spatial_hash": False,          
-
-            }}}}}}},
-
-        # Loading the tiled map.
-        self.tile_map = arcade.load_tilemap(self.map_name, 
-        TILE_SCALING, layer_options)
-
-        # Use scene to load up all layers from the map as SpriteLists 
-        # in the scene in the proper order.
-        self.scene = arcade.Scene.from_tilemap(self.tile_map)
-    
-        # Sets up the character and the starting coordinates 
+        # Takes the level from the prefetcher first, as that also loads
+        # the player's textures.
+        level_data, scenes = self.prefetcher.take(self.level)
+
+        # Sets up the character and the starting coordinates
         # and scales them accordingly.
         self.player_sprite = PlayerCharacter()
         self.player_sprite.center_x = PLAYER_START_X
         self.player_sprite.center_y = PLAYER_START_Y
-        self.scene.add_sprite(LAYER_NAME_PLAYER, self.player_sprite)
-
-        # The character is placed at these coordinates when they spawn
-        # at the beginning.
-        # When the timeline_change = 0, it means the player has just 
-        # started the level and will spawn at the starting coordinates.
-        if self.timeline_change == 0:
-            self.player_sprite.center_x = PLAYER_START_X
-            self.player_sprite.center_y = PLAYER_START_Y
-
-        # When the timeline changes, the player wil preserve their 
-        # position from the grass/snow timeline into the 
-        # current timeline.
-        elif self.timeline_change > 0:
-            self.player_sprite.center_x = self.position_x 
-            self.player_sprite.center_y = self.position_y
-
-        # Updates the physics engine whenever setup is run.
-        self.physics()
-    
-    def physics(self):
-        """A seperate function for the physics engine in order to 
-        update to it when necessary."""
 
-        # Create the physics engine for the object oriented programming
-        # which sets the gravity constant and specific collision
-        # types for specific objects.
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player_sprite, gravity_constant=GRAVITY, 
-            platforms=self.scene[LAYER_NAME_PLATFORMS],
-            walls=self.scene[self.lock_state],
-            ladders=self.scene[LAYER_NAME_LADDERS]
-            )
+        # Creates both timelines of the level from the prefetched level
+        # data, then uses the scene of the timeline the player is in.
+        self.level_session = LevelSession(self.level, self.player_sprite,
+                                          level_data, scenes, self.headless,
+                                          self.streaming)
+        self.scene = self.level_session.scenes[self.timeline]
+        self.use_timeline()
 
-    def on_show(self):
-        """Runs the setup function when the game screen is shown"""
-        self.setup()
+        # Starts loading the next level in the background while
+        # this one is being played.
+        self.prefetcher.prefetch(self.level + 1)
 
-    def on_draw(self):
-        """Renders the screen and draws the applicable text"""
-
-        # Clear the screen of anything from previous screens.
-        self.clear()
+        # Makes the locks solid in the new level.
+        self.physics()
 
-        # Activates the game camera.
-        self.camera.use()
+    def swap_timeline(self):
+        """Switches to the scene of the current timeline, keeping the
+        player where they are instead of reloading the level"""
+        self.scene = self.level_session.swap(self.timeline)
+        self.use_timeline()
+        self.physics()
 
-        # Draws our Scene.
-        self.scene.draw()
+    def use_timeline(self):
+        """Uses the sprite pool, collision grid, physics engine and
+        renderer of the current timeline"""
+        self.pool = self.level_session.pools[self.timeline]
+        self.collision_grid = self.level_session.collision_grids[
+            self.timeline]
+        self.physics_engine = self.level_session.physics_engines[
+            self.timeline]
+        self.renderer = self.level_session.renderers.get(self.timeline)
+
+    def reset_level(self):
+        """Restarts the current level, putting back the collected keys,
+        potions and locks from the level snapshot instead of loading
+        the map again"""
+        self.timeline_change = 0
+        self.claimed_layers.clear()
+        self.keys_available = 0
+        self.potions_available = 0
+        self.lock_state = LAYER_NAME_LOCKS
+        self.level_session.reset(self.player_sprite)
+        self.physics()
 
-        # Refers to the GUI camera to draw GUI elements.
-        self.gui_camera.use()
+    def physics(self):
+        """A seperate function for the physics engine in order to 
+        update to it when necessary."""
 
-        # Creates a counter on screen for potions the player can use.
-        potions_available = f"Potions: {self.potions_available}"
-        arcade.draw_text(
-            potions_available,
-            50,
-            50,
-            arcade.csscolor.WHITE,
-            20,
-        )
+        # Loads the chunks of the map around the player first if the
+        # level is streamed, as they may have moved to another timeline
+        # or back to the start.
+        self.level_session.stream(self.timeline, self.player_sprite)
+
+        # Makes the locks solid, or the placeholders once a key has been
+        # collected, without laying out the platforms again. The set
+        # that stays solid is laid out again too, as resetting or
+        # swapping timeline can put back locks that were opened, and
+        # only the locks that haven't been opened are solid.
+        for layer in (LAYER_NAME_LOCKS, LAYER_NAME_PLACEHOLDER):
+            if layer != self.lock_state:
+                self.physics_engine.remove_walls(layer)
+        if self.lock_state in self.pool.layers:
+            walls = self.pool.present(self.lock_state)
+        else:
+            walls = self.scene[self.lock_state]
+        self.physics_engine.add_walls(self.lock_state, walls)
 
-        # Creates a counter on screen for keys the player can use.
-        keys_available = f"Keys: {self.keys_available}"
-        arcade.draw_text(
-            keys_available,
-            50,
-            75,
-            arcade.csscolor.WHITE,
-            20,
-        )
+        # The walls or where the player is have changed, so what they
+        # are touching is worked out again.
+        self.contacts = self.physics_engine.contacts()
 
     def process_keychange(self):
         """A function for when we move up/down/left/right
         or we move on/off a ladder"""
+        held = self.held
+
+        contacts = self.contacts
 
         # Creates the users ability to move up and down
         # with reference to objects.
-        if self.up_pressed and not self.down_pressed:
-            if self.physics_engine.is_on_ladder():
+        if held.up and not held.down:
+            if contacts.on_ladder:
                 self.player_sprite.change_y = PLAYER_MOVEMENT_SPEED
             elif (
-                self.physics_engine.can_jump(y_distance=10)
+                contacts.can_jump
                 and not self.jump_needs_reset
             ):
                 self.player_sprite.change_y = PLAYER_JUMP_SPEED
                 self.jump_needs_reset = True
-                arcade.play_sound(self.jump_sound)
-        elif self.down_pressed and not self.up_pressed:
-            if self.physics_engine.is_on_ladder():
+                self.events.append("jump")
+        elif held.down and not held.up:
+            if contacts.on_ladder:
                 self.player_sprite.change_y = -PLAYER_MOVEMENT_SPEED
 
         # Creates the users ability to move up and down 
         # when on a ladder and with no movement.
-        if self.physics_engine.is_on_ladder():
-            if not self.up_pressed and not self.down_pressed:
+        if contacts.on_ladder:
+            if not held.up and not held.down:
                 self.player_sprite.change_y = 0
-            elif self.up_pressed and self.down_pressed:
+            elif held.up and held.down:
                 self.player_sprite.change_y = 0
 
         # Creates the users ability to move left and right
         # with reference to player movement speed.
-        if self.right_pressed and not self.left_pressed:
+        if held.right and not held.left:
             self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
-        elif self.left_pressed and not self.right_pressed:
+        elif held.left and not held.right:
             self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
         else:
             self.player_sprite.change_x = 0
 
-    def on_key_press(self, key, modifiers):
-        """Whenever a certain key is pressed, 
-        a resulting action will occur"""
+    def apply_input(self, input_state):
+        """Applies the buttons pressed and released since the last step"""
 
-        # Allows the movement keys of the player sprite.
-        if key == arcade.key.UP or key == arcade.key.W \
-        or key == arcade.key.SPACE:
-            self.up_pressed = True
-        elif key == arcade.key.DOWN or key == arcade.key.S:
-            self.down_pressed = True
-        elif key == arcade.key.LEFT or key == arcade.key.A:
-            self.left_pressed = True
+        held = self.held
+        pressed = (input_state.left != held.left
+                   or input_state.right != held.right
+                   or input_state.up != held.up
+                   or input_state.down != held.down
+                   or input_state.swap or input_state.reset
+                   or input_state.teleport)
+
+        # Faces the way the player starts moving, and lets them jump
+        # again once they let go of the jump button.
+        if input_state.left and not held.left:
             self.facing_forward = False
-        elif key == arcade.key.RIGHT or key == arcade.key.D:
-            self.right_pressed = True
+        if input_state.right and not held.right:
             self.facing_forward = True
+        if not input_state.up:
+            self.jump_needs_reset = False
+        self.held = input_state.copy()
 
         # Refer back to this function to process how far they will
-        # travel or how they will move on ladders.
-        self.process_keychange()
+        # travel or how they will move on ladders, whenever a button
+        # was pressed or released.
+        if pressed:
+            self.process_keychange()
+
+        # Switches between the timelines.
+        if input_state.swap:
 
-        # The user presses Z or Q to switch between timelines.
-        if key == arcade.key.Z or key == arcade.key.Q:
-            
             # If the player is in the snow timeline:
-            # Preserve the players' location 
-            # and change or increment the relevant variables
+            # Change or increment the relevant variables
             # When they switch to the grass timeline.
+            # The player stays where they are, as only the scene swaps.
             if self.timeline == 1:
-                self.position_x = self.player_sprite.center_x
-                self.position_y = self.player_sprite.center_y
                 self.timeline += 1
                 self.timeline_change += 1
-                self.setup()
+                self.swap_timeline()
 
             # If the player is in the grass timeline:
-            # Preserve the players' location 
-            # and change or increment the relevant variables
+            # Change or increment the relevant variables
             # When they switch to the snow timeline.
+            # The player stays where they are, as only the scene swaps.
             elif self.timeline == 2:
-                self.position_x = self.player_sprite.center_x
-                self.position_y = self.player_sprite.center_y
                 self.timeline -= 1
                 self.timeline_change += 1
                 self.keys_available = 0
                 self.lock_state = LAYER_NAME_LOCKS
-                self.setup()
- 
+                self.swap_timeline()
+
         # Restarts the level completely, as if the user were to run
         # the code from scratch again.
-        if key == arcade.key.R:
-            self.timeline_change = 0
-            self.keys_available = 0
-            self.potions_available = 0
-            self.lock_state = LAYER_NAME_LOCKS
-            self.setup()
+        if input_state.reset:
+            self.reset_level()
 
         # Allows the player sprite to teleport a short distance forward
         # depending on what direction they are facing or moving in
-        # and whether they have potions to do so.
-        if key == arcade.key.E and self.potions_available > 0:
+        # and whether they have potions to do so. The teleport stops at
+        # the first wall in the way instead of passing through it.
+        if input_state.teleport and self.potions_available > 0:
             self.potions_available -= 1
-            if self.facing_forward == True:
-                self.player_sprite.center_x += 200
-            elif self.facing_forward == False:
-                self.player_sprite.center_x -= 200
-                
-    def on_key_release(self, key, modifiers):
-        """A function for when the user releases a key"""
-
-        # Stops the applicable movement when the user releases a key.
-        if key == arcade.key.UP or key == arcade.key.W \
-        or key == arcade.key.SPACE:
-            self.up_pressed = False
-            self.jump_needs_reset = False
-        elif key == arcade.key.DOWN or key == arcade.key.S:
-            self.down_pressed = False
-        elif key == arcade.key.LEFT or key == arcade.key.A:
-            self.left_pressed = False
-        elif key == arcade.key.RIGHT or key == arcade.key.D:
-            self.right_pressed = False
-
-        # Refer back to this function to process how far they will
-        # travel or how they will move on ladders.
-        self.process_keychange()
-
-    def center_camera_to_player(self):
-        """Centers the camera on the player"""
-
-        # Centers the camera on the player sprite,
-        # subtracting half the viewport width and height.
-        screen_center_x = self.player_sprite.center_x - (
-            self.camera.viewport_width / 2)
-        screen_center_y = self.player_sprite.center_y - (
-            self.camera.viewport_height / 2)
-       
-        # Accounts for the edges of the screen
-        # and centers the camera accordingly.
-        if screen_center_x < 0:
-            screen_center_x = 0
-        if screen_center_y < 0:
-            screen_center_y = 0
-        player_centered = screen_center_x, screen_center_y
-
-        self.camera.move_to(player_centered)
-
-    def on_update(self, delta_time):
-        """Updates the relevant game objects 
-        and player sprite interactions"""
-
-        # Moves the player with regards to the physics engine.
-        self.physics_engine.update()
-
-        # Centers the camera on the player. 
-        self.center_camera_to_player()
-
-        # Updates animations when the player sprite jumps
-        # or climbs ladders.
-        if self.physics_engine.can_jump():
+            if self.facing_forward:
+                self.physics_engine.teleport(TELEPORT_DISTANCE)
+            else:
+                self.physics_engine.teleport(-TELEPORT_DISTANCE)
+            self.contacts = self.physics_engine.contacts()
+
+    def save_state(self):
+        """Returns the game state, which load_state can put back"""
+        state = GameState()
+        state.level = self.level
+        state.timeline = self.timeline
+        state.timeline_change = self.timeline_change
+        state.keys = self.keys_available
+        state.potions = self.potions_available
+        state.claims = sum(1 << index for index, layer
+                           in enumerate(COLLECTABLE_LAYERS)
+                           if layer in self.claimed_layers)
+        state.placeholder = self.lock_state == LAYER_NAME_PLACEHOLDER
+        state.facing_forward = self.facing_forward
+        state.jump_needs_reset = self.jump_needs_reset
+        state.finished = self.finished
+        state.held = self.held.to_bits()
+        state.frame = self.frame
+
+        player_sprite = self.player_sprite
+        animation = player_sprite.animation
+        state.x, state.y = player_sprite.position
+        state.change_x = player_sprite.change_x
+        state.change_y = player_sprite.change_y
+        state.can_jump = player_sprite.can_jump
+        state.is_on_ladder = player_sprite.is_on_ladder
+        state.against_wall = self.physics_engine.against_wall
+        state.animation = animation.animation
+        state.facing = animation.facing
+        state.animation_frame = animation.frame
+        state.elapsed = animation.elapsed
+
+        pools = self.level_session.pools
+        state.pools = tuple(pools[timeline].save()
+                            for timeline in TIMELINES)
+        return state
+
+    def fits(self, state):
+        """Returns whether the state has flags for every key, potion
+        and lock of the level, and a frame its animation has"""
+        pools = self.level_session.pools
+        frames = self.player_sprite.animations[state.animation][0]
+        return state.animation_frame < len(frames) and all(
+            len(flags) == len(pools[timeline].flags)
+            for timeline, flags in zip(TIMELINES, state.pools))
+
+    def load_state(self, state):
+        """Puts the game back to a state made by save_state. A state
+        from another level loads that level first. A state that doesn't
+        fit the level raises a ValueError and leaves the game as it
+        was."""
+        if self.level_session.level != state.level:
+            previous = self.save_state()
+            self.events = []
+            self.finished = state.finished
+            self.level = state.level
+            self.setup()
+            if self.finished:
+                return
+            if not self.fits(state):
+                self.load_state(previous)
+                raise ValueError("a game state that doesn't fit "
+                                 f"level {state.level}")
+        elif not self.fits(state):
+            raise ValueError("a game state that doesn't fit "
+                             f"level {state.level}")
+        self.events = []
+        self.finished = state.finished
+
+        # Which locks or placeholders are solid only depends on the
+        # timeline, the lock state and the timeline's flags, so they are
+        # only laid out again if one of those changes.
+        walls = (self.timeline, self.lock_state, self.pool.save())
+
+        # Switches to the state's timeline without putting back its
+        # keys, potions and locks like a swap does, as the flags put
+        # back which of them are gone.
+        self.level = state.level
+        if self.timeline != state.timeline:
+            self.timeline = state.timeline
+            self.scene = self.level_session.scenes[self.timeline]
+            self.use_timeline()
+        pools = self.level_session.pools
+        for timeline, flags in zip(TIMELINES, state.pools):
+            pools[timeline].load(flags)
+
+        self.timeline_change = state.timeline_change
+        self.keys_available = state.keys
+        self.potions_available = state.potions
+        self.claimed_layers = {layer for index, layer
+                               in enumerate(COLLECTABLE_LAYERS)
+                               if state.claims >> index & 1}
+        self.lock_state = LAYER_NAME_PLACEHOLDER if state.placeholder \
+            else LAYER_NAME_LOCKS
+        self.facing_forward = state.facing_forward
+        self.jump_needs_reset = state.jump_needs_reset
+        self.held = InputState.from_bits(state.held)
+        self.frame = state.frame
+
+        # Puts the player back, with the frame of the animation they
+        # were showing.
+        player_sprite = self.player_sprite
+        player_sprite.position = (state.x, state.y)
+        player_sprite.change_x = state.change_x
+        player_sprite.change_y = state.change_y
+        player_sprite.can_jump = state.can_jump
+        player_sprite.is_on_ladder = state.is_on_ladder
+        animation = player_sprite.animation
+        if animation.animation != state.animation:
+            animation.frames, animation.frame_time = \
+                player_sprite.animations[state.animation]
+            animation.animation = state.animation
+        animation.facing = state.facing
+        animation.frame = state.animation_frame
+        animation.elapsed = state.elapsed
+        texture = animation.frames[animation.frame][animation.facing]
+        if texture is not player_sprite.texture:
+            player_sprite.texture = texture
+
+        # Works out what the player is touching again, after laying out
+        # the locks or placeholders if they changed.
+        self.physics_engine.against_wall = state.against_wall
+        if walls != (self.timeline, self.lock_state, self.pool.save()):
+            self.physics()
+        else:
+            self.level_session.stream(self.timeline, self.player_sprite)
+            self.contacts = self.physics_engine.contacts()
+
+    def summary(self):
+        """Returns the level, timeline, keys, potions and player
+        position, which are enough to tell if two games ended the
+        same way"""
+        return (self.level, self.timeline, self.keys_available,
+                self.potions_available, self.player_sprite.center_x,
+                self.player_sprite.center_y)
+
+    def step(self, input_state):
+        """Moves the game on by one fixed timestep"""
+        self.events = []
+        if self.finished:
+            return
+        self.frame += 1
+        queries = sum(COLLISION_QUERIES.values())
+        with PROFILER.span("input"):
+            self.apply_input(input_state)
+        with PROFILER.span("physics"):
+            self.update_physics()
+        with PROFILER.span("collision"):
+            self.update_triggers()
+        self.step_queries = sum(COLLISION_QUERIES.values()) - queries
+
+    def update_physics(self):
+        """Moves the player and works out whether they are jumping or
+        on a ladder"""
+
+        # Moves the player with regards to the physics engine, which
+        # already knows whether they are on a ladder from the last step,
+        # then works out what they are touching once for the rest of
+        # the step. A streamed level loads the chunks around the player
+        # before they move into them.
+        self.level_session.stream(self.timeline, self.player_sprite)
+        self.physics_engine.update(self.contacts.on_ladder)
+        contacts = self.contacts = self.physics_engine.contacts()
+
+        # Tracks whether the player is jumping or climbing ladders
+        # for their animations.
+        if contacts.grounded:
             self.player_sprite.can_jump = False
         else:
             self.player_sprite.can_jump = True
 
-        if self.physics_engine.is_on_ladder() \
-        and not self.physics_engine.can_jump():
+        if contacts.on_ladder and not contacts.grounded:
             self.player_sprite.is_on_ladder = True
             self.process_keychange()
         else:
             self.player_sprite.is_on_ladder = False
             self.process_keychange()
 
-        # Update animations with respect to time and the player sprite.
-        self.scene.update_animation(
-            delta_time, [LAYER_NAME_PLAYER]
-        )
+    def update_triggers(self):
+        """Handles what the player is touching, or restarts the level
+        if they fell off the map"""
 
-        # Checks if the player hits a trampoline 
-        # and bounces them up higher than a regular jump would.
-        if arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_BOUNCE]
-         ):
-            self.player_sprite.change_y = 30
-
-        # Checks if the player hits a hazard and moves them back to the 
-        # starting position while reseting the level.
-        if arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_DONT_TOUCH]
-        ):
-            self.timeline_change = 0
-            self.key_claim_1 = 0
-            self.key_claim_2 = 0
-            self.keys_available = 0
-            self.potions_available = 0
-            self.potion_claim_1 = 0
-            self.potion_claim_2 = 0
-            self.lock_state = LAYER_NAME_LOCKS
-            self.setup()
-            
-        # Checks if the player falls off the map 
+        # Checks if the player falls off the map
         # and restarts the level.
         if self.player_sprite.center_y < 1:
-            self.timeline_change = 0
-            self.key_claim_1 = 0
-            self.key_claim_2 = 0
-            self.keys_available = 0
-            self.potions_available = 0
-            self.potion_claim_1 = 0
-            self.potion_claim_2 = 0
-            self.lock_state = LAYER_NAME_LOCKS
-            self.setup()
+            self.reset_level()
+            return
 
-        # Checks if the player finishes a level (hits an exit sign),
-        # moving them to the next level.
-        if arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_EXIT_SIGN]
-        ):
-            self.level += 1
-            self.timeline_change = 0
-            self.potion_claim_1 = 0
-            self.potion_claim_2 = 0
-            self.key_claim_1 = 0
-            self.key_claim_2 = 0
-            self.setup()
+        # Handles every trampoline, hazard, exit sign, key, lock and
+        # potion the player is touching with one collision grid lookup.
+        self.triggers.dispatch(self.collision_grid, self.player_sprite)
 
-        # Checks if the user touches key number 1 of any given map,
-        # removing it and updating the relevant variables.
-        key_hit_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_KEY_1]
-        )
+    def on_bounce(self, layer, trampolines):
+        """Bounces the player up higher than a regular jump would"""
+        self.player_sprite.change_y = BOUNCE_SPEED
 
-        if self.key_claim_1 == 0:
-
-            for key in key_hit_list:
-                self.keys_available += 1
-                self.key_claim_1 += 1
-                key.remove_from_sprite_lists()
-                self.lock_state = LAYER_NAME_PLACEHOLDER
-                self.physics()
-    
-        if self.key_claim_1 == 1:
-  
-            for key in key_hit_list:
-                key.remove_from_sprite_lists()
-
-        # Checks if the user touches key number 2 of any given map,
-        # removing it and updating the relevant variables.  
-        key_hit_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_KEY_2]
-        )
+    def on_hazard(self, layer, hazards):
+        """Moves the player back to the starting position while
+        reseting the level"""
+        self.reset_level()
+        return True
 
-        if self.key_claim_2 == 0:
+    def on_exit(self, layer, exit_signs):
+        """Moves the player to the next level"""
+        self.level += 1
+        self.timeline_change = 0
+        self.claimed_layers.clear()
+        self.setup()
+        return True
+
+    def on_collect_key(self, layer, keys):
+        """Collects the keys, giving the player a key and unlocking the
+        locks the first time a key from this layer is collected"""
+        if layer not in self.claimed_layers:
+            self.claimed_layers.add(layer)
+            self.keys_available += 1
+            self.lock_state = LAYER_NAME_PLACEHOLDER
+            self.physics()
+        self.pool.collect(keys)
+
+    def on_open_lock(self, layer, locks):
+        """Opens any locks the player collides with, which they can
+        only reach once they have a key"""
+        self.pool.collect(locks)
+
+        # Lays the locks out again without the opened ones if they are
+        # still solid.
+        if self.lock_state == LAYER_NAME_LOCKS:
+            self.physics()
+
+    def on_collect_potion(self, layer, potions):
+        """Collects the potions, giving the player a potion the first
+        time a potion from this layer is collected"""
+        if layer not in self.claimed_layers:
+            self.claimed_layers.add(layer)
+            self.potions_available += 1
+        self.pool.collect(potions)
+
+
+# Works out how many fixed ticks to run for the time that has passed,
+# and keeps count of how well the frames kept up.
+class FrameClock:
+    """Turns the time between updates into a whole number of fixed
+    ticks, keeping the time left over for the next update, and counts
+    the frames that were late or dropped and the ticks that were
+    skipped to stop the game falling further behind"""
+
+    def __init__(self, tick_rate=TICK_RATE, render_rate=RENDER_RATE,
+                 max_ticks=MAX_CATCH_UP_TICKS):
+        """Starts the clock with no time waiting to be ticked"""
+        self.tick_time = 1 / tick_rate
+        self.render_time = 1 / render_rate
+        self.max_ticks = max_ticks
+
+        # The time that hasn't been ticked yet, and when it was added.
+        self.accumulator = 0.0
+        self.advanced_at = None
+
+        # When the last frame was drawn.
+        self.drawn_at = None
+
+        # Counts the ticks run and skipped, and the frames drawn, late
+        # and dropped.
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self.most_ticks = 0
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+
+    def advance(self, delta_time, now=None):
+        """Adds the time since the last update and returns how many
+        ticks to run, skipping the ticks past the catch up limit"""
+        self.advanced_at = time.perf_counter() if now is None else now
+        self.accumulator += delta_time
+        ticks = int(self.accumulator // self.tick_time)
+        self.accumulator -= ticks * self.tick_time
+
+        # Skips the ticks that would take too long to catch up on, so
+        # one slow frame doesn't make the next ones slow too.
+        if ticks > self.max_ticks:
+            self.skipped_ticks += ticks - self.max_ticks
+            ticks = self.max_ticks
+        self.ticks += ticks
+        self.most_ticks = max(self.most_ticks, ticks)
+        return ticks
+
+    def alpha(self, now=None):
+        """Returns how far it is from the last tick to the next, from
+        0 to 1, to show the player between them"""
+        if self.advanced_at is None:
+            return 1.0
+        now = time.perf_counter() if now is None else now
+        waiting = self.accumulator + now - self.advanced_at
+        return min(1.0, waiting / self.tick_time)
+
+    def frame(self, now=None):
+        """Records a frame being drawn, counting it as late if it took
+        too long and the frames that should have been drawn since"""
+        now = time.perf_counter() if now is None else now
+        if self.drawn_at is not None:
+            frames = (now - self.drawn_at) / self.render_time
+            if frames > LATE_FRAME_FACTOR:
+                self.late_frames += 1
+                self.dropped_frames += round(frames) - 1
+        self.drawn_at = now
+        self.frames += 1
+
+    def summary(self):
+        """Returns the counts of the ticks and frames as a line of
+        text"""
+        return (f"{self.ticks} ticks, {self.skipped_ticks} skipped, "
+                f"{self.frames} frames, {self.late_frames} late, "
+                f"{self.dropped_frames} dropped")
+
+
+# Creates a layer of text that is laid out once and then drawn as one
+# batch, as laying text out again every frame is slow.
+class TextLayer:
+    """A batch of text labels that are only laid out again when their
+    text changes, and are all drawn with one call"""
 
-            for key in key_hit_list:
-                self.keys_available += 1
-                self.key_claim_2 += 1
-                key.remove_from_sprite_lists()
-                self.lock_state = LAYER_NAME_PLACEHOLDER
-                self.physics()
-    
-        if self.key_claim_2 == 1:
+    def __init__(self):
+        """Allows the class to run object oriented attributes"""
+        self.batch = pyglet.graphics.Batch()
+        self.labels = []
 
-            for key in key_hit_list:
-                key.remove_from_sprite_lists()
+    def add(self, text, x, y, font_size, width=None, align="left"):
+        """Adds a white label to the batch, returning it so that its
+        text can be changed later"""
+        label = pyglet.text.Label(
+            text, x=x, y=y, font_name=("calibri", "arial"),
+            font_size=font_size, color=(255, 255, 255, 255), width=width,
+            align=align, multiline=align != "left", batch=self.batch)
+        self.labels.append(label)
+        return label
 
-        # Removes any locks the player collides with, provided that
-        # they have a key available.
-        lock_hit_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_LOCKS]
-        )
+    def draw(self):
+        """Draws every label in the batch at once"""
 
-        for locks in lock_hit_list:
-            locks.remove_from_sprite_lists()
+        # Raw pyglet drawing needs arcade's pyglet rendering state.
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
 
-        # Checks if the user touches potion number 1 of any given map,
-        # removing it and updating the relevant variables.  
-        self.potion_hit_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene[LAYER_NAME_POTION_1]
-        )
 
-        if self.potion_claim_1 == 0:
+class GameView(arcade.View):
+    """Game view class for when the game is playing, which draws the
+    simulation and turns the keys pressed into its input"""
 
-            for self.potions in self.potion_hit_list:
-                self.potion_claim_1 += 1
-                self.potions_available += 1
-                self.potions.remove_from_sprite_lists()
-            
-        if self.potion_claim_1 == 1:
+    def __init__(self):
+        """Allows the class to run object oriented attributes"""
 
-            for self.potions in self.potion_hit_list:
-                self.potions.remove_from_sprite_lists()
+        # Returns an object that represents a parent class.
+        super().__init__()
 
-        # Checks if the user touches potion number 2 of any given map,
-        # removing it and updating the relevant variables.     
-        self.potion_hit_list = arcade.check_for_collision_with_list(
-        self.player_sprite, self.scene[LAYER_NAME_POTION_2]
-        )
+        # Records when start was pressed, to time the first frame.
+        self.start_time = time.perf_counter()
+
+        # Sets the path to run the game view.
+        file_path = os.path.dirname(os.path.abspath(__file__))
+        os.chdir(file_path)
+
+        # Creates a variable to track the current state of what key is
+        # pressed, which is handed to the simulation every update.
+        self.input_state = InputState()
+
+        # The movement buttons pressed since the last step, and the ones
+        # let go of before the step they were pressed on, which are held
+        # for that step so a quick tap isn't missed.
+        self.pressed = InputState()
+        self.released = InputState()
+
+        # Assigns a camera to scroll the screen.
+        self.camera = arcade.Camera()
 
-        if self.potion_claim_2 == 0:
+        # Assigns a Camera that can be used to draw GUI elements.
+        self.gui_camera = arcade.Camera()
 
-            for self.potions in self.potion_hit_list:
-                self.potion_claim_2 += 1
-                self.potions_available += 1
-                self.potions.remove_from_sprite_lists()
+        # Load sounds to play when doing applicable activities.
+        self.jump_sound = arcade.load_sound(":resources:sounds/jump1.wav")
 
-        if self.potion_claim_2 == 1:
+        # Creates the simulation, which sets up the first level, taking
+        # it from the window's prefetcher if the menu started loading it.
+        self.simulation = Simulation(
+            prefetcher=getattr(self.window, "prefetcher", None),
+            streaming=getattr(self.window, "streaming", False))
+
+        # Creates the counters for the potions and keys once, and only
+        # changes their text when the counts change.
+        self.hud = TextLayer()
+        self.potions_text = self.hud.add("", 50, 50, 20)
+        self.keys_text = self.hud.add("", 50, 75, 20)
+        self.hud_counts = None
+
+        # Creates the message under the counters, which shows what
+        # quicksaving or quickloading did until the time it goes.
+        self.message_text = self.hud.add("", 50, 100, 16)
+        self.message_end = 0
+
+        # Creates the profiler overlay, which is hidden until its key
+        # is pressed and only updated every few frames.
+        self.show_profiler = False
+        self.profiler_text = arcade.Text(
+            "", 10, SCREEN_HEIGHT - 10, arcade.csscolor.WHITE, 12,
+            width=400, font_name=("courier new", "courier", "monospace"),
+            anchor_y="top", multiline=True)
+        self.profiler_refresh = 0
+
+        # Uses the window's frame clock if the game runs with the fixed
+        # loop, and remembers the player and where they were before the
+        # last tick, to draw them between there and where they are.
+        self.frame_clock = getattr(self.window, "frame_clock", None)
+        self.previous_position = None
+
+        # Keeps the state of the latest steps to rewind through while
+        # the rewind key is held.
+        self.rewind_buffer = RewindBuffer()
+        self.rewinding = False
+
+    def on_draw(self):
+        """Renders the screen and draws the applicable text"""
+        if self.frame_clock is not None:
+            self.frame_clock.frame()
+        with PROFILER.span("draw"):
+            if self.frame_clock is None:
+                self.draw_game()
+            else:
+                self.draw_interpolated()
+
+        # Records how long the first frame took from pressing start.
+        if "game" not in STARTUP_TIMES:
+            STARTUP_TIMES["game"] = time.perf_counter() - self.start_time
+
+        # Draws the profiler overlay outside the draw span, so it
+        # doesn't count itself.
+        if self.show_profiler:
+            self.draw_profiler()
+
+    def draw_game(self):
+        """Draws the scene and the counters for the keys and potions"""
+
+        # Clear the screen of anything from previous screens.
+        self.clear()
+
+        # Activates the game camera.
+        self.camera.use()
+
+        # Draws our Scene, skipping the chunks that are off screen.
+        with PROFILER.span("draw_scene"):
+            self.simulation.renderer.draw(self.camera)
+
+        # Refers to the GUI camera to draw GUI elements.
+        self.gui_camera.use()
+
+        with PROFILER.span("draw_hud"):
+            self.draw_hud()
+
+    def draw_interpolated(self):
+        """Draws the game with the player moved back to between where
+        they were on the last two ticks, then puts them back"""
+        player = self.simulation.player_sprite
+        previous = self.previous_position
+        x = player.center_x
+        y = player.center_y
+
+        # Shows the player where they are if they changed level or
+        # jumped too far to slide there, like when teleporting.
+        if previous is None or previous[0] is not player \
+        or abs(x - previous[1]) + abs(y - previous[2]) \
+        > INTERPOLATION_SNAP_DISTANCE:
+            self.draw_game()
+            return
+
+        alpha = self.frame_clock.alpha()
+        player.center_x = previous[1] + (x - previous[1]) * alpha
+        player.center_y = previous[2] + (y - previous[2]) * alpha
+        self.center_camera_to_player()
+        self.draw_game()
+        player.center_x = x
+        player.center_y = y
+
+    def draw_hud(self):
+        """Draws the counters for the potions and keys the player can
+        use, changing their text only when a count has changed"""
+        counts = (self.simulation.potions_available,
+                  self.simulation.keys_available)
+        if counts != self.hud_counts:
+            self.hud_counts = counts
+            self.potions_text.text = f"Potions: {counts[0]}"
+            self.keys_text.text = f"Keys: {counts[1]}"
+        if self.message_text.text \
+        and time.perf_counter() > self.message_end:
+            self.message_text.text = ""
+        self.hud.draw()
+
+    def show_message(self, text):
+        """Shows a message under the counters for a few seconds"""
+        self.message_text.text = text
+        self.message_end = time.perf_counter() + MESSAGE_TIME
+
+    def toggle_profiler(self):
+        """Shows or hides the profiler overlay, profiling the frames
+        while it is shown"""
+        self.show_profiler = not self.show_profiler
+        PROFILER.enabled = self.show_profiler or PROFILER.tracing
+        self.profiler_refresh = 0
+
+    def draw_profiler(self):
+        """Draws the percentiles of each phase of the frame on the GUI
+        camera, updating them every few frames"""
+        if self.profiler_refresh <= 0:
+            renderer = self.simulation.renderer
+            lines = PROFILER.table() + [
+                f"chunks {renderer.chunks_drawn}/{renderer.chunk_count}"
+                f"  sprites {renderer.sprites_drawn}"
+                f"  draw calls {renderer.draw_calls}",
+                f"collision queries {self.simulation.step_queries}"]
+            if self.frame_clock is not None:
+                lines.append(self.frame_clock.summary())
+            lines.append(self.simulation.prefetcher.summary())
+            lines.append(self.simulation.level_session.summary())
+            lines.append(f"textures decoded {TEXTURES.decode_count}")
+            lines.append(TILE_ATLAS.summary())
+            if "menu" in STARTUP_TIMES and "game" in STARTUP_TIMES:
+                lines.append(f"menu {STARTUP_TIMES['menu'] * 1000:.0f}ms"
+                             f"  first frame "
+                             f"{STARTUP_TIMES['game'] * 1000:.0f}ms")
+            self.profiler_text.text = "\n".join(lines)
+            self.profiler_refresh = PROFILER_OVERLAY_REFRESH
+        self.profiler_refresh -= 1
+        self.profiler_text.draw()
+
+    def on_key_press(self, key, modifiers):
+        """Whenever a certain key is pressed, 
+        a resulting action will occur"""
+
+        # Allows the movement keys of the player sprite.
+        if key == arcade.key.UP or key == arcade.key.W \
+        or key == arcade.key.SPACE:
+            self.press_button("up")
+        elif key == arcade.key.DOWN or key == arcade.key.S:
+            self.press_button("down")
+        elif key == arcade.key.LEFT or key == arcade.key.A:
+            self.press_button("left")
+        elif key == arcade.key.RIGHT or key == arcade.key.D:
+            self.press_button("right")
+
+        # The user presses Z or Q to switch between timelines.
+        if key == arcade.key.Z or key == arcade.key.Q:
+            self.input_state.swap = True
+
+        # Restarts the level completely, as if the user were to run
+        # the code from scratch again.
+        if key == arcade.key.R:
+            self.input_state.reset = True
+
+        # Teleports the player a short distance forward.
+        if key == arcade.key.E:
+            self.input_state.teleport = True
+
+        # Shows or hides the profiler overlay.
+        if key == PROFILER_KEY:
+            self.toggle_profiler()
+
+        # Saves the game to the quicksave file or loads it back, or
+        # rewinds the game for as long as the rewind key is held.
+        if key == QUICKSAVE_KEY:
+            self.quicksave()
+        elif key == QUICKLOAD_KEY and self.can_go_back():
+            self.quickload()
+        elif key == REWIND_KEY and self.can_go_back():
+            self.rewinding = True
+
+    def on_key_release(self, key, modifiers):
+        """A function for when the user releases a key"""
+
+        # Stops rewinding the game.
+        if key == REWIND_KEY:
+            self.rewinding = False
+
+        # Stops the applicable movement when the user releases a key.
+        if key == arcade.key.UP or key == arcade.key.W \
+        or key == arcade.key.SPACE:
+            self.release_button("up")
+        elif key == arcade.key.DOWN or key == arcade.key.S:
+            self.release_button("down")
+        elif key == arcade.key.LEFT or key == arcade.key.A:
+            self.release_button("left")
+        elif key == arcade.key.RIGHT or key == arcade.key.D:
+            self.release_button("right")
+
+    def press_button(self, name):
+        """Holds a movement button down, remembering it was pressed
+        since the last step"""
+        setattr(self.input_state, name, True)
+        setattr(self.pressed, name, True)
+        setattr(self.released, name, False)
+
+    def release_button(self, name):
+        """Lets go of a movement button, or if it was pressed since the
+        last step, lets go of it after the next step, so the step still
+        sees the tap"""
+        if getattr(self.pressed, name):
+            setattr(self.released, name, True)
+        else:
+            setattr(self.input_state, name, False)
+
+    def can_go_back(self):
+        """Returns whether the game can be quickloaded or rewound, which
+        it can't while it is being recorded, as the recording wouldn't
+        play back the same"""
+        if getattr(self.window, "recording", None) is not None:
+            self.show_message("Quickload and rewind are turned off "
+                              "while recording")
+            return False
+        return True
+
+    def quicksave(self):
+        """Saves the game state to the quicksave file"""
+        self.simulation.save_state().save(QUICKSAVE_NAME)
+        self.show_message(f"Saved the game to {QUICKSAVE_NAME}")
+
+    def quickload(self):
+        """Puts the game back to the state in the quicksave file"""
+        try:
+            state = GameState.load(QUICKSAVE_NAME)
+            self.simulation.load_state(state)
+        except (OSError, ValueError) as error:
+            self.show_message(f"Couldn't load the quicksave: {error}")
+            return
+        self.rewind_buffer.clear()
+        self.show_message(f"Loaded the game from {QUICKSAVE_NAME}")
+        self.center_camera_to_player()
+
+    def center_camera_to_player(self):
+        """Centers the camera on the player"""
+        player_centered = camera_position(self.simulation.player_sprite,
+                                          self.camera.viewport_width,
+                                          self.camera.viewport_height)
+        self.camera.move_to(player_centered)
+
+    def on_update(self, delta_time):
+        """Steps the simulation with the keys pressed and updates
+        what is drawn to match"""
+        with PROFILER.span("update"):
+            if self.frame_clock is None:
+                self.update_game(delta_time)
+            else:
+                self.update_ticks(delta_time)
+
+    def update_ticks(self, delta_time):
+        """Steps the simulation once for each fixed tick there has
+        been time for since the last update"""
+        for tick in range(self.frame_clock.advance(delta_time)):
+            player = self.simulation.player_sprite
+            self.previous_position = (player, player.center_x,
+                                      player.center_y)
+            self.update_game(self.frame_clock.tick_time)
+            if self.simulation.finished:
+                return
+
+    def update_game(self, delta_time):
+        """Steps the simulation, or rewinds it, and updates the camera,
+        sounds and animations to match"""
+        simulation = self.simulation
+
+        # Steps back to the state before the last step while the rewind
+        # key is held, and keeps the state before each step otherwise.
+        if self.rewinding:
+            state = self.rewind_buffer.pop()
+            if state is not None:
+                simulation.load_state(state)
+        else:
+            self.rewind_buffer.push(simulation.save_state())
+            simulation.step(self.input_state)
+
+            # Records the input of the step if the game is being
+            # recorded.
+            recording = getattr(self.window, "recording", None)
+            if recording is not None:
+                recording.record(self.input_state, simulation)
+
+        # The actions only happen once for each time they are pressed,
+        # and the buttons tapped since the last step are let go of now
+        # that it has seen them.
+        self.input_state.swap = False
+        self.input_state.reset = False
+        self.input_state.teleport = False
+        for name in ("left", "right", "up", "down"):
+            if getattr(self.released, name):
+                setattr(self.input_state, name, False)
+        self.pressed = InputState()
+        self.released = InputState()
+
+        # Closes the game once the player beats level 3.
+        if simulation.finished:
+            arcade.exit()
+            return
+
+        # Plays the sounds for what happened in the step.
+        if "jump" in simulation.events:
+            arcade.play_sound(self.jump_sound)
+
+        # Centers the camera on the player. 
+        with PROFILER.span("camera"):
+            self.center_camera_to_player()
+
+        # Update animations with respect to time and the player sprite.
+        with PROFILER.span("animation"):
+            simulation.scene.update_animation(
+                delta_time, [LAYER_NAME_PLAYER]
+            )
 
-            for self.potions in self.potion_hit_list:    
-                self.potions.remove_from_sprite_lists()
-  
 
 class InstructionsView(arcade.View):
     """A class for the instructions window of the game"""
@@ -692,6 +3547,15 @@ class InstructionsView(arcade.View):
                 child=self.v_box)
             )
 
+        # Lays out the title and the instructions below it once.
+        self.text = TextLayer()
+        self.text.add("Instructions Screen", 0, 800, 50, SCREEN_WIDTH,
+                      "center")
+        start_y = 700
+        for line in INSTRUCTION_LINES:
+            self.text.add(line, 0, start_y, 20, SCREEN_WIDTH)
+            start_y -= DEFAULT_LINE_HEIGHT
+
     def on_show(self):
         """Showing a blue background when we switch to 
         the instructions view"""
@@ -706,58 +3570,9 @@ class InstructionsView(arcade.View):
         self.clear()
         self.manager.draw()
 
-        # Create the starting coordinates to use as a reference point
-        # for the text and begin drawing the text.
-        start_x = 0
-        start_y = 800
-        arcade.draw_text("Instructions Screen", start_x, start_y,
-                         arcade.color.WHITE, font_size=50, width = 
-                         SCREEN_WIDTH, align = "center")
-
-        start_y -= 100
-        arcade.draw_text(" - Use WASD or arrow keys to move and jump",
-                        start_x, start_y, arcade.color.WHITE, font_size=20, 
-                        width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- There are two timelines, \
-press Q or Z to swap between them",
-start_x, start_y, arcade.color.WHITE, font_size=20, 
-width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Press R to restart the level", start_x, start_y,
-                        arcade.color.WHITE, font_size=20, 
-                        width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Press E to teleport a short distance forward, \
-if you collect a potion",
-start_x, start_y, arcade.color.WHITE, font_size=20, 
-width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Grass and snow blocks indicate that the specific \
-tile exists in both timelines", start_x, start_y,
-arcade.color.WHITE, font_size=20, 
-width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Purple blocks are only available in the \
-current timeline", start_x, start_y, 
-arcade.color.WHITE, font_size=20, width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Keys will freeze if travelling from the \
-grass timeline to snow timeline", start_x, start_y, 
-arcade.color.WHITE, font_size=20, width = SCREEN_WIDTH, align = "left")
-
-        start_y -= DEFAULT_LINE_HEIGHT
-        arcade.draw_text("- Get to the exit sign at each level! \
-It doesn't matter which timeline you exit in", 
-start_x, start_y, arcade.color.WHITE, font_size=20, 
-width = SCREEN_WIDTH, align = "left")  
-                                                                
+        # Draws the text, which was laid out when the view was made.
+        self.text.draw()
+
     def on_click_start(self, event):
         """If the user presses the start button, 
         the game will commence"""
@@ -821,14 +3636,12 @@ class MainMenu(arcade.View):
         """Switches to the game view when the user clicks start"""
         game_view = GameView()
         self.window.show_view(game_view)
-        arcade.run()
 
     def on_click_instructions(self, event):
         """Switches to the instructions screen when 
         the user clicks instructions"""
         instructions_view = InstructionsView()
         self.window.show_view(instructions_view)
-        arcade.run()
 
     def on_click_quit(self, event):
         """Closes the game when the user clicks on quit"""
@@ -840,19 +3653,103 @@ class MainMenu(arcade.View):
         self.clear()
         self.manager.draw()
 
+        # Records how long the game took to show the menu.
+        if "menu" not in STARTUP_TIMES:
+            STARTUP_TIMES["menu"] = time.perf_counter() - START_TIME
+
     def on_hide_view(self):
         """Disables any buttons drawn from previous screens"""
         self.manager.disable()
 
 
-def main():
-    """Main function which runs whenever the code begins,
-    putting the user at the main menu screen."""
+def open_game(streaming=False):
+    """Opens the window on the main menu and starts loading level 1 in
+    the background while the menu is shown"""
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+
+    # The game view takes level 1 from this prefetcher when start is
+    # pressed, by which time it has usually finished loading.
+    window.streaming = streaming
+    window.prefetcher = LevelPrefetcher(streaming)
+    window.prefetcher.prefetch(1)
+
     start_view = MainMenu()
     window.show_view(start_view)
-    arcade.run()
+    return window
+
+
+def main(record_name=None, trace_name=None, loop=LOOP_DEFAULT,
+         tick_rate=TICK_RATE, render_rate=RENDER_RATE, streaming=False):
+    """Main function which runs whenever the code begins,
+    putting the user at the main menu screen."""
+    window = open_game(streaming)
+
+    # Steps the game at a fixed tick rate if asked to, with arcade
+    # calling the update once a tick.
+    window.frame_clock = None
+    if loop == LOOP_FIXED:
+        window.frame_clock = FrameClock(tick_rate, render_rate)
+        window.set_update_rate(1 / tick_rate)
+
+    # Profiles every frame if asked to, which is saved as a trace once
+    # the game is closed.
+    if trace_name:
+        PROFILER.enabled = True
+        PROFILER.tracing = True
+
+    # Records the input of every step if asked to, which is saved
+    # once the game is closed.
+    window.recording = InputRecording() if record_name else None
+
+    # arcade.run draws as often as pyglet's default, so the fixed loop
+    # runs pyglet itself to draw at its own rate.
+    if window.frame_clock is None or window.headless:
+        arcade.run()
+    else:
+        pyglet.app.run(1 / render_rate)
+
+    if window.frame_clock is not None:
+        print(window.frame_clock.summary())
+
+    if window.recording is not None and window.recording.frames:
+        window.recording.save(record_name)
+        print(f"Saved {len(window.recording.frames)} frames "
+              f"to {record_name}")
+    if trace_name:
+        PROFILER.save_trace(trace_name)
+        print(f"Saved {len(PROFILER.trace)} spans to {trace_name}")
+
+
+def run_command_line():
+    """Runs the game with the options given on the command line. The
+    developer tools are run with benchmarks/tools.py."""
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--record", metavar="FILE",
+                        help="record the game's input to a file")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="profile every frame into a Chrome trace file")
+    parser.add_argument("--loop", choices=LOOP_MODES, default=LOOP_DEFAULT,
+                        help="step the game once a frame, or at a fixed "
+                             "tick rate with its own render rate")
+    parser.add_argument("--tick-rate", type=float, default=TICK_RATE,
+                        help="ticks a second for the fixed loop")
+    parser.add_argument("--render-rate", type=float, default=RENDER_RATE,
+                        help="frames a second for the fixed loop")
+    parser.add_argument("--streaming", action="store_true",
+                        help="load the levels in chunks around the player")
+    arguments = parser.parse_args()
+
+    # The maps and images are loaded relative to the game folder, so
+    # any files given are found from where the game was run first.
+    for name in ("record", "trace"):
+        if getattr(arguments, name):
+            setattr(arguments, name, os.path.abspath(getattr(arguments,
+                                                             name)))
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    main(arguments.record, arguments.trace, arguments.loop,
+         arguments.tick_rate, arguments.render_rate, arguments.streaming)
 
 # Run the main function on startup.
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_command_line()
\ No newline at end of file
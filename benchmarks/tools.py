@@ -0,0 +1,2735 @@
+"""Developer tools for Puzzle Platformer: the benchmarks, profiling
+and level checks, which run the game headless from its file"""
+import argparse
+import gc
+import heapq
+import importlib.util
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# The game is one script with a space in its name, so it is loaded from
+# its file and registered as a module the tools import from. The
+# processes the batch and analyze commands start find it there too.
+# The game imports arcade itself after it records when it started, so
+# the startup command still counts that import.
+GAME_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location(
+    "puzzle_platformer", os.path.join(GAME_FOLDER, "Puzzle platformer.py"))
+game = importlib.util.module_from_spec(spec)
+sys.modules["puzzle_platformer"] = game
+spec.loader.exec_module(game)
+
+import arcade
+from PIL import Image
+from puzzle_platformer import (
+    BOUNCE_SPEED, COLLECTABLE_LAYERS, COLLISION_QUERIES, DYNAMIC_LAYERS,
+    GRAVITY, GROUND_DISTANCE, INPUT_DOWN, INPUT_LEFT, INPUT_RESET,
+    INPUT_RIGHT, INPUT_SWAP, INPUT_TELEPORT, INPUT_UP, JUMP_DISTANCE,
+    LAYER_KIND_TILES, LAYER_NAME_LADDERS, LAYER_NAME_LOCKS,
+    LAYER_NAME_PLACEHOLDER, LAYER_NAME_PLATFORMS, LAYER_OPTIONS,
+    LEVEL_COUNT, MAX_CATCH_UP_TICKS, PHYSICS_PUSH_LIMIT, PHYSICS_SKIN,
+    PLAYER_JUMP_SPEED, PLAYER_MOVEMENT_SPEED, PLAYER_START_X,
+    PLAYER_START_Y, PROFILER, RENDER_RATE, REWIND_FRAMES, SCREEN_HEIGHT,
+    SCREEN_WIDTH, STARTUP_TIMES, TELEPORT_DISTANCE, TEXTURES, TICK_RATE,
+    TILE_ATLAS, TILE_ATLAS_DIRECTORY, TILE_ATLAS_MANIFEST,
+    TILE_ATLAS_VERSION, TILE_GID_MASK, TILE_SCALING, TIMELINES,
+    TRIGGER_BOUNCE, TRIGGER_EXIT, TRIGGER_HAZARD, TRIGGER_KEY,
+    TRIGGER_LAYERS, TRIGGER_LOCK, TRIGGER_POTION, ChunkStreamer,
+    CollisionGrid, ContactState, FrameClock, GameState, InputRecording,
+    InputState, LevelData, MainMenu, PlatformerPhysics, PlayerCharacter,
+    RewindBuffer, SceneRenderer, Simulation, StreamedTriggers, TileAtlas,
+    build_scene, build_scenes, camera_position, file_signature,
+    level_cache_name, level_map_name, load_level_data, open_game,
+    preload_textures, prepare_level, streamed_layers, tile_atlas_key)
+
+# How many steps the reachability analyzer holds buttons down for when
+# walking or climbing and when jumping, how many steps into a jump it
+# tries swapping timeline or teleporting, and how many steps apart the
+# two teleports of a jump that teleports twice are. After a move the
+# player lets go of everything, and the move ends once they stop, or
+# once they have spent the settle steps still moving, such as falling
+# or bouncing on a trampoline. Places are told apart by the cell the
+# player is in, with each cell split into columns, as where the player
+# stands in a cell can decide whether a long jump makes it. The
+# analyzer tries at most a chunk of moves at once.
+ANALYZER_HOLDS = (3, 5, 10, 20, 40)
+ANALYZER_JUMP_HOLDS = (5, 15, 30)
+ANALYZER_EVENT_STEPS = (6, 12, 18)
+ANALYZER_TELEPORT_GAP = 5
+ANALYZER_SETTLE_STEPS = 60
+ANALYZER_CELL_COLUMNS = 2
+ANALYZER_CHUNK = 20000
+
+# The stored benchmark results new ones are compared against, how much
+# worse a result can get before it counts as a regression, how many
+# times the benchmarks repeat what they time, and how many times the
+# cold loads and the frame updates are run again from the start, with
+# the best run kept.
+BENCHMARK_BASELINE = os.path.join("benchmarks", "baseline.json")
+BENCHMARK_THRESHOLD = 0.25
+BENCHMARK_REPEATS = 200
+BENCHMARK_FRAMES = 600
+BENCHMARK_RUNS = 5
+
+# The update rates the animation benchmark plays the player's animation
+# at, which all update together every 1/30 of a second, and the
+# movements it plays as how many 30ths of a second each lasts, the
+# player's speed across and up, and whether they are on a ladder.
+ANIMATION_BENCHMARK_RATES = (30, 60, 120, 240)
+ANIMATION_BENCHMARK_MOTION = (
+    (30, PLAYER_MOVEMENT_SPEED, 0, False),
+    (15, 0, 0, False),
+    (30, -PLAYER_MOVEMENT_SPEED, 0, False),
+    (10, 0, PLAYER_JUMP_SPEED, False),
+    (10, -PLAYER_MOVEMENT_SPEED, -PLAYER_JUMP_SPEED, False),
+    (30, 0, PLAYER_MOVEMENT_SPEED, True),
+    (15, 0, 0, True),
+    (15, 0, -PLAYER_MOVEMENT_SPEED, True),
+    (20, PLAYER_MOVEMENT_SPEED, 0, False),
+)
+ANIMATION_BENCHMARK_REPEATS = 50
+
+# The frame times the pacing benchmark runs the loops with, as a name,
+# a list of frame times in seconds that is repeated, and how many
+# seconds they are run for.
+PACING_BENCHMARK_SECONDS = 10
+PACING_BENCHMARK_FRAMES = (
+    ("steady 60 fps", (1 / 60,)),
+    ("steady 30 fps", (1 / 30,)),
+    ("low end 20 fps", (1 / 20,)),
+    ("a slow frame in 20", (1 / 60,) * 19 + (0.1,)),
+    ("a half second stall", (1 / 60,) * 299 + (0.5,)),
+)
+
+# The streaming benchmark builds a big map out of copies of a level's
+# tile layers, this many across and up, and moves the screen across
+# every row of it this many pixels a step.
+STREAM_BENCHMARK_LEVEL = 2
+STREAM_BENCHMARK_COPIES = (20, 4)
+STREAM_BENCHMARK_SPEED = 16
+
+# The size of each page the atlas command packs the tile images onto.
+TILE_ATLAS_PAGE_SIZE = 2048
+
+
+def tile_image(level_data, gid):
+    """Returns the image a gid shows and how it is flipped, which is the
+    same for the same tile in any map, whatever its gid is"""
+    return tuple(level_data.tiles[gid & TILE_GID_MASK]), gid & ~TILE_GID_MASK
+
+
+def shared_tile_mask(level_data, gids, base_data, base_gids):
+    """Returns which tiles of a layer show the same image in the same
+    place as the same layer of the base map"""
+    if gids.shape != base_gids.shape:
+        return np.zeros(gids.shape, bool)
+    images = {}
+    image_ids = []
+    for data, layer_gids in ((level_data, gids), (base_data, base_gids)):
+        unique, inverse = np.unique(layer_gids, return_inverse=True)
+        ids = np.array([images.setdefault(tile_image(data, gid), len(images))
+                        if gid else -1 for gid in unique.tolist()])
+        image_ids.append(ids[inverse].reshape(layer_gids.shape))
+    return (gids != 0) & (image_ids[0] == image_ids[1])
+
+
+def tile_object_key(level_data, tile_object):
+    """Returns the image, place and size of a tile object, which are the
+    same for two objects that look the same"""
+    return (tile_image(level_data, int(tile_object["gid"])),
+            float(tile_object["center_x"]), float(tile_object["center_y"]),
+            float(tile_object["width"]), float(tile_object["height"]))
+
+
+def compile_levels():
+    """Compiles every level map into the level cache and prints how
+    long each one takes to load from the TMX and from the cache"""
+    print(f"{'Map':<22}{'TMX load':>12}{'Cached load':>14}"
+          f"{'TMX decode':>13}{'Cached decode':>16}")
+    for level in range(1, LEVEL_COUNT + 1):
+        for timeline in TIMELINES:
+            map_name = level_map_name(level, timeline)
+            cache_name = level_cache_name(map_name)
+            LevelData.from_tmx(map_name).save(cache_name)
+
+            # Loads the map once first, so both ways are timed with the
+            # textures already in arcade's texture cache.
+            arcade.Scene.from_tilemap(
+                arcade.load_tilemap(map_name, TILE_SCALING, LAYER_OPTIONS))
+
+            start_time = time.perf_counter()
+            arcade.Scene.from_tilemap(
+                arcade.load_tilemap(map_name, TILE_SCALING, LAYER_OPTIONS))
+            tmx_load = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            build_scene(load_level_data(map_name))
+            cached_load = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            LevelData.from_tmx(map_name)
+            tmx_decode = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            LevelData.from_cache(cache_name)
+            cached_decode = time.perf_counter() - start_time
+
+            print(f"{map_name:<22}{tmx_load * 1000:>10.2f}ms"
+                  f"{cached_load * 1000:>12.2f}ms"
+                  f"{tmx_decode * 1000:>11.2f}ms"
+                  f"{cached_decode * 1000:>14.2f}ms")
+
+
+def scene_memory(build):
+    """Returns how many bytes of memory the scenes made by a function
+    take up, and the scenes"""
+    gc.collect()
+    tracemalloc.start()
+    scenes = build()
+
+    # Frees what building them left in reference cycles first, so only
+    # the scenes are counted.
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, scenes
+
+
+def report_shared_tiles():
+    """Prints, for each level, how many static tiles are in the same
+    place in both timelines, how many of those show the same image and
+    so could be shared between the timelines' scenes, and about how
+    much memory sharing them would save"""
+    print(f"{'Level':<7}{'Tiles':>7}{'Same place':>12}{'Same image':>12}"
+          f"{'Ratio':>8}{'Saved':>10}")
+    for level in range(1, LEVEL_COUNT + 1):
+        level_data, scenes = prepare_level(level)
+        base_data = level_data[TIMELINES[0]]
+        base_layers = {layer["name"]: layer for layer in base_data.layers}
+
+        # Counts the static tiles, and the ones of the other timelines
+        # in a place the first timeline has a tile of the same layer in
+        # too, and of those the ones that look the same.
+        tiles = 0
+        same_place = 0
+        same_image = 0
+        for timeline in TIMELINES:
+            data = level_data[timeline]
+            for layer in data.layers:
+                if layer["name"] in DYNAMIC_LAYERS:
+                    continue
+                tiles += len(scenes[timeline][layer["name"]])
+                base_layer = base_layers.get(layer["name"])
+                if timeline == TIMELINES[0] or base_layer is None \
+                        or layer["kind"] != base_layer["kind"]:
+                    continue
+                if layer["kind"] == LAYER_KIND_TILES:
+                    gids = data.tile_gids[layer["index"]]
+                    base_gids = base_data.tile_gids[base_layer["index"]]
+                    if gids.shape == base_gids.shape:
+                        same_place += int(np.count_nonzero(
+                            (gids != 0) & (base_gids != 0)))
+                    same_image += int(np.count_nonzero(shared_tile_mask(
+                        data, gids, base_data, base_gids)))
+                    continue
+
+                # Tile objects are matched one to one by their place
+                # and size, and by their image too.
+                start = base_layer["start"]
+                base_keys = [tile_object_key(base_data, tile_object)
+                             for tile_object in base_data.objects[
+                                 start:start + base_layer["count"]]]
+                places = Counter(key[1:] for key in base_keys)
+                images = Counter(base_keys)
+                start = layer["start"]
+                for tile_object in data.objects[start:start
+                                                + layer["count"]]:
+                    key = tile_object_key(data, tile_object)
+                    if places[key[1:]]:
+                        places[key[1:]] -= 1
+                        same_place += 1
+                    if images[key]:
+                        images[key] -= 1
+                        same_image += 1
+
+        # Builds the scenes again, once the textures are loaded, to see
+        # how much memory a sprite takes, which is what sharing each
+        # tile would save.
+        size = scene_memory(lambda: build_scenes(level_data, lazy=True))[0]
+        sprites = sum(len(sprite_list) for scene in scenes.values()
+                      for sprite_list in scene.name_mapping.values())
+        saved = size / sprites * same_image
+
+        print(f"{level:<7}{tiles:>7}{same_place:>12}{same_image:>12}"
+              f"{same_image / tiles:>8.1%}{saved / 1024:>8.1f}KB")
+
+
+def pack_atlas_pages(sizes, page_size=TILE_ATLAS_PAGE_SIZE):
+    """Packs images of the given sizes onto pages in rows, tallest
+    first, returning the page and top left corner of each image and
+    the size of each page"""
+    placements = [None] * len(sizes)
+    pages = []
+    x = y = row_height = 0
+    for index in sorted(range(len(sizes)), key=lambda index:
+                        (-sizes[index][1], -sizes[index][0])):
+        width, height = sizes[index]
+
+        # Starts a new row when the image doesn't fit on this one, and
+        # a new page when the row doesn't fit on this page.
+        if pages and x + width > page_size:
+            x, y, row_height = 0, y + row_height, 0
+        if not pages or y + height > max(page_size, height):
+            pages.append([0, 0])
+            x = y = row_height = 0
+        placements[index] = (len(pages) - 1, x, y)
+        x += width
+        row_height = max(row_height, height)
+        pages[-1] = [max(pages[-1][0], x), max(pages[-1][1], y + height)]
+    return placements, pages
+
+
+def build_tile_atlas():
+    """Shrinks every tile image the levels use to the biggest size it
+    is drawn at, packs them onto the tile atlas pages and writes its
+    manifest, then compares loading each level's tiles with and
+    without it"""
+
+    # Finds the biggest size each tile image is drawn at in any map.
+    # Tiles are drawn at the map's scaling and objects at their size.
+    drawn_sizes = {}
+    for level in range(1, LEVEL_COUNT + 1):
+        for timeline in TIMELINES:
+            level_data = LevelData.from_tmx(level_map_name(level, timeline))
+            scaling = level_data.header["scaling"]
+            drawn = [(gid, 0, 0) for gid in
+                     np.unique(level_data.tile_gids).tolist()]
+            drawn += level_data.objects[["gid", "width", "height"]].tolist()
+            for gid, width, height in drawn:
+                if gid & TILE_GID_MASK == 0:
+                    continue
+                tile = tuple(level_data.tiles[gid & TILE_GID_MASK])
+                if not width:
+                    width, height = tile[3] * scaling, tile[4] * scaling
+                old_width, old_height = drawn_sizes.get(tile, (0, 0))
+                drawn_sizes[tile] = (max(width, old_width),
+                                     max(height, old_height))
+
+    # Cuts each tile out of its image and shrinks it. Images drawn at
+    # their full size or bigger, like the backgrounds, would gain
+    # nothing, so they are left out and still load from their own file.
+    # The hit box comes from the full size image.
+    images = {}
+    tiles = []
+    shrunk = []
+    hit_boxes = []
+    for tile, (drawn_width, drawn_height) in drawn_sizes.items():
+        source, image_x, image_y, width, height = tile
+        size = (max(1, min(width, int(np.ceil(drawn_width)))),
+                max(1, min(height, int(np.ceil(drawn_height)))))
+        if size == (width, height):
+            continue
+        if source not in images:
+            images[source] = Image.open(source).convert("RGBA")
+        image = images[source].crop((image_x, image_y, image_x + width,
+                                     image_y + height))
+        tiles.append(tile)
+        hit_boxes.append(arcade.calculate_hit_box_points_simple(image))
+        shrunk.append(image.resize(size, Image.Resampling.LANCZOS))
+
+    # Packs the shrunk images onto the pages and saves them.
+    placements, page_sizes = pack_atlas_pages(
+        [image.size for image in shrunk])
+    pages = [Image.new("RGBA", tuple(size)) for size in page_sizes]
+    for image, (page, x, y) in zip(shrunk, placements):
+        pages[page].paste(image, (x, y))
+    os.makedirs(TILE_ATLAS_DIRECTORY, exist_ok=True)
+    page_names = []
+    for index, page in enumerate(pages):
+        page_names.append(f"page_{index}.png")
+        page.save(os.path.join(TILE_ATLAS_DIRECTORY, page_names[-1]))
+
+    manifest = {
+        "version": TILE_ATLAS_VERSION,
+        "scaling": TILE_SCALING,
+        "sources": [file_signature(source) for source in sorted(images)],
+        "pages": page_names,
+        "tiles": {
+            tile_atlas_key(*tile): {
+                "page": page,
+                "x": x,
+                "y": y,
+                "width": image.width,
+                "height": image.height,
+                "hit_box": hit_box,
+            }
+            for tile, image, (page, x, y), hit_box in zip(
+                tiles, shrunk, placements, hit_boxes)
+        },
+    }
+    with open(TILE_ATLAS_MANIFEST, "w") as file:
+        json.dump(manifest, file)
+    print(f"Packed {len(tiles)} of the {len(drawn_sizes)} tile images from "
+          f"{len(images)} files onto {len(pages)} pages in "
+          f"{TILE_ATLAS_DIRECTORY}")
+
+    # Times decoding each level's tiles from their own images and from
+    # the atlas, both from cold, and adds up the memory the decoded
+    # images and the tile textures take.
+    print(f"{'Level':<8}{'Image decode':>14}{'Atlas decode':>14}"
+          f"{'Image MB':>10}{'Atlas MB':>10}{'Tiles MB':>10}"
+          f"{'Atlas tiles MB':>16}")
+    for level in range(1, LEVEL_COUNT + 1):
+        level_data = [load_level_data(level_map_name(level, timeline))
+                      for timeline in TIMELINES]
+        used = {tuple(data.tiles[gid & TILE_GID_MASK])
+                for data in level_data
+                for gid in set(np.unique(data.tile_gids).tolist())
+                | set(data.objects["gid"].tolist()) if gid}
+        atlas = TileAtlas()
+        times = []
+        for tile_atlas in (None, atlas):
+            arcade.cleanup_texture_cache()
+            start_time = time.perf_counter()
+            for data in level_data:
+                preload_textures(data, tile_atlas)
+            times.append((time.perf_counter() - start_time) * 1000)
+
+        # Decoded images are four bytes a pixel. With the atlas, the
+        # tiles it doesn't have still need their own images.
+        def image_bytes(tiles):
+            """Adds up the size of the images the tiles are cut from"""
+            return sum(np.prod(Image.open(source).size) * 4
+                       for source in {tile[0] for tile in tiles})
+
+        def tile_bytes(tiles):
+            """Adds up the size of the tiles themselves"""
+            return sum(tile[3] * tile[4] * 4 for tile in tiles)
+
+        entries = [atlas.manifest["tiles"][tile_atlas_key(*tile)]
+                   for tile in used
+                   if tile_atlas_key(*tile) in atlas.manifest["tiles"]]
+        missing = [tile for tile in used
+                   if tile_atlas_key(*tile) not in atlas.manifest["tiles"]]
+        atlas_bytes = image_bytes(missing) + sum(
+            np.prod(page.size) * 4 for page in atlas.pages.values())
+        atlas_tile_bytes = tile_bytes(missing) + sum(
+            entry["width"] * entry["height"] * 4 for entry in entries)
+        print(f"{level:<8}{times[0]:>12.2f}ms{times[1]:>12.2f}ms"
+              f"{image_bytes(used) / 1e6:>10.2f}{atlas_bytes / 1e6:>10.2f}"
+              f"{tile_bytes(used) / 1e6:>10.2f}"
+              f"{atlas_tile_bytes / 1e6:>16.2f}")
+    TILE_ATLAS.clear()
+
+
+def benchmark_collisions():
+    """Places the player at every half cell of each level map and
+    prints how long finding what they touch in every trigger layer
+    takes with sprite list scans and with the collision grid"""
+    print(f"{'Map':<22}{'Queries':>9}{'List scans':>13}"
+          f"{'Grid':>11}{'Speedup':>10}{'Mismatches':>12}")
+    player_sprite = PlayerCharacter()
+    for level in range(1, LEVEL_COUNT + 1):
+        for timeline in TIMELINES:
+            map_name = level_map_name(level, timeline)
+            level_data = load_level_data(map_name)
+            scene = build_scene(level_data, lazy=True)
+            collision_grid = CollisionGrid(level_data, scene)
+
+            scan_time = 0
+            grid_time = 0
+            queries = 0
+            mismatches = 0
+            step_x = collision_grid.cell_width / 2
+            step_y = collision_grid.cell_height / 2
+            for row in range(collision_grid.rows * 2):
+                for column in range(collision_grid.columns * 2):
+                    player_sprite.position = (column * step_x,
+                                              row * step_y)
+
+                    # The way on_update used to check the layers, with
+                    # one scan for each layer.
+                    start_time = time.perf_counter()
+                    scanned = []
+                    for layer in TRIGGER_LAYERS:
+                        hit_list = arcade.check_for_collision_with_list(
+                            player_sprite, scene[layer])
+                        if hit_list:
+                            scanned.append((layer, hit_list))
+                    scan_time += time.perf_counter() - start_time
+
+                    start_time = time.perf_counter()
+                    touched = collision_grid.query(player_sprite)
+                    grid_time += time.perf_counter() - start_time
+
+                    queries += 1
+                    mismatches += (
+                        [(layer, set(hits)) for layer, hits in scanned]
+                        != [(layer, set(hits)) for layer, hits in touched])
+
+            print(f"{map_name:<22}{queries:>9}"
+                  f"{scan_time / queries * 1e6:>11.2f}us"
+                  f"{grid_time / queries * 1e6:>9.2f}us"
+                  f"{scan_time / grid_time:>9.1f}x{mismatches:>12}")
+
+
+class ArcadePhysics(arcade.PhysicsEnginePlatformer):
+    """Arcade's platformer physics engine, with the contacts of
+    PlatformerPhysics worked out from its own checks, so the physics
+    benchmark can run the game with either engine"""
+
+    def update(self, on_ladder=None):
+        """Moves the player the way arcade does, which checks the
+        ladders itself"""
+        return super().update()
+
+    def contacts(self):
+        """Returns what the player is touching, checking the walls on
+        each side as well as under the player's feet"""
+        player_sprite = self.player_sprite
+        walls = self.walls + self.platforms
+        against_wall = False
+        if player_sprite.change_x:
+            player_sprite.center_x += math.copysign(1, player_sprite.change_x)
+            against_wall = bool(arcade.check_for_collision_with_lists(
+                player_sprite, walls))
+            player_sprite.center_x -= math.copysign(1, player_sprite.change_x)
+        return ContactState(grounded=self.can_jump(GROUND_DISTANCE),
+                            can_jump=self.can_jump(JUMP_DISTANCE),
+                            on_ladder=self.is_on_ladder(),
+                            against_wall=against_wall)
+
+
+def benchmark_physics(steps):
+    """Runs the scripted input on each level and times every physics
+    step with the game's physics engine and with arcade's, both from
+    the same position, along with changing which walls are solid. Then
+    drops the player onto every platform fast enough to pass through it
+    in one step, and counts how often each engine lets them."""
+    print(f"{'Level':<8}{'Steps':>7}{'Arcade':>11}{'Grid':>10}"
+          f"{'Speedup':>9}{'Queries':>9}{'Max diff':>10}{'Rebuild':>10}"
+          f"{'Walls':>9}")
+    for level in range(1, LEVEL_COUNT + 1):
+        simulation = Simulation(level, headless=True)
+        player_sprite = simulation.player_sprite
+        arcade_engines = {}
+        step_times = np.zeros((steps, 2))
+        step_queries = np.zeros(steps)
+        max_difference = 0
+        for frame in range(steps):
+            simulation.events = []
+            simulation.apply_input(scripted_input(frame))
+            if simulation.level != level:
+                break
+
+            # Arcade's engine has to be created again whenever the walls
+            # change, so one is kept for each timeline and lock state.
+            key = (simulation.timeline, simulation.lock_state)
+            if key not in arcade_engines:
+                arcade_engines[key] = ArcadePhysics(
+                    player_sprite, gravity_constant=GRAVITY,
+                    platforms=simulation.scene[LAYER_NAME_PLATFORMS],
+                    walls=simulation.scene[simulation.lock_state],
+                    ladders=simulation.scene[LAYER_NAME_LADDERS])
+
+            # Steps arcade's engine and then the game's from the same
+            # state, carrying on from where the game's engine ends up.
+            state = (player_sprite.position, player_sprite.change_x,
+                     player_sprite.change_y, simulation.jump_needs_reset,
+                     simulation.contacts)
+            grid_engine = simulation.physics_engine
+            simulation.physics_engine = arcade_engines[key]
+            step_times[frame, 0] = time_call(simulation.update_physics)
+            arcade_position = player_sprite.position
+            player_sprite.position, player_sprite.change_x, \
+                player_sprite.change_y, simulation.jump_needs_reset, \
+                simulation.contacts = state
+            simulation.physics_engine = grid_engine
+            queries = sum(COLLISION_QUERIES.values())
+            step_times[frame, 1] = time_call(simulation.update_physics)
+            step_queries[frame] = sum(COLLISION_QUERIES.values()) - queries
+            max_difference = max(max_difference, math.dist(
+                arcade_position, player_sprite.position))
+            simulation.update_triggers()
+            if simulation.level != level:
+                break
+        step_times = step_times[:frame + 1]
+        step_queries = step_queries[:frame + 1]
+
+        # Times making the placeholders solid instead of the locks, as
+        # collecting a key does, both ways.
+        scene = simulation.scene
+        rebuild_time = np.median([time_call(
+            arcade.PhysicsEnginePlatformer, player_sprite,
+            scene[LAYER_NAME_PLATFORMS], GRAVITY, scene[LAYER_NAME_LADDERS],
+            scene[LAYER_NAME_PLACEHOLDER]) for _ in range(100)])
+        wall_times = []
+        for index in range(100):
+            simulation.lock_state = (LAYER_NAME_PLACEHOLDER if index % 2
+                                     else LAYER_NAME_LOCKS)
+            wall_times.append(time_call(simulation.physics))
+        arcade_time, grid_time = np.median(step_times, axis=0) * 1000
+        print(f"{level:<8}{len(step_times):>7}{arcade_time:>9.1f}us"
+              f"{grid_time:>8.1f}us{arcade_time / grid_time:>8.1f}x"
+              f"{step_queries.mean():>9.2f}{max_difference:>8.2f}px"
+              f"{rebuild_time * 1000:>8.1f}us"
+              f"{np.median(wall_times) * 1000:>7.1f}us")
+
+    print()
+    print(f"{'Map':<22}{'Platforms':>11}{'Speed':>14}"
+          f"{'Arcade tunnelled':>18}{'Grid tunnelled':>16}")
+    for level in range(1, LEVEL_COUNT + 1):
+        simulation = Simulation(level, headless=True)
+        player_sprite = simulation.player_sprite
+        for timeline in TIMELINES:
+            scene = simulation.level_session.scenes[timeline]
+            grid_engine = simulation.level_session.physics_engines[timeline]
+            arcade_engine = ArcadePhysics(
+                player_sprite, gravity_constant=GRAVITY,
+                platforms=scene[LAYER_NAME_PLATFORMS])
+            platforms = scene[LAYER_NAME_PLATFORMS]
+            speed = (grid_engine.top - grid_engine.bottom
+                     + 2 * grid_engine.walls.cell_height)
+            dropped = 0
+            tunnelled = [0, 0]
+            for platform in platforms:
+
+                # Starts the player just above the platform, skipping
+                # platforms with something on top of them.
+                start = (platform.center_x,
+                         platform.top - grid_engine.bottom + 1)
+                if grid_engine.walls.overlapping(*grid_engine.box(*start)):
+                    continue
+                dropped += 1
+                for index, engine in enumerate((arcade_engine,
+                                                grid_engine)):
+                    player_sprite.position = start
+                    player_sprite.change_x = 0
+                    player_sprite.change_y = -speed
+                    engine.update()
+                    tunnelled[index] += (player_sprite.center_y
+                                         + grid_engine.top
+                                         < platform.bottom)
+            print(f"{level_map_name(level, timeline):<22}{dropped:>11}"
+                  f"{speed:>6.0f}px/step{tunnelled[0]:>18}"
+                  f"{tunnelled[1]:>16}")
+
+
+def scripted_input(frame):
+    """Returns the input for a frame of the run the benchmarks use,
+    where the player runs right, jumps and swaps timeline now and
+    then"""
+    return InputState(right=True, up=frame % 40 < 10,
+                      swap=frame % 300 == 299)
+
+
+def benchmark_simulation(steps, level, record_name=None):
+    """Runs the simulation headless for a number of steps, with the
+    player running right, jumping and swapping timeline now and then,
+    and prints how many steps it ran a second. The input can be saved
+    as a recording to play back later."""
+    simulation = Simulation(level, headless=True)
+    recording = InputRecording(level)
+    start_time = time.perf_counter()
+    for frame in range(steps):
+        input_state = scripted_input(frame)
+        simulation.step(input_state)
+        if record_name:
+            recording.record(input_state, simulation)
+    run_time = time.perf_counter() - start_time
+    if record_name:
+        recording.save(record_name)
+
+    print(f"Ran {steps} steps in {run_time:.2f}s, "
+          f"{steps / run_time:.0f} steps/sec "
+          f"({steps / run_time / 60:.1f}x the game's 60 updates/sec)")
+    player_sprite = simulation.player_sprite
+    print(f"Ended on level {simulation.level} timeline "
+          f"{simulation.timeline} at ({player_sprite.center_x:.1f}, "
+          f"{player_sprite.center_y:.1f}) with "
+          f"{simulation.keys_available} keys and "
+          f"{simulation.potions_available} potions")
+    print(simulation.prefetcher.summary())
+
+
+def benchmark_animation():
+    """Plays the same movements through the player's animation at each
+    of the benchmark's update rates, and prints how long an update
+    takes and how many times a second the texture is set. Checks every
+    rate shows the same texture as 60 updates a second whenever they
+    both update, which they will if the animation speed doesn't depend
+    on the update rate. Returns whether they all did."""
+    player = PlayerCharacter()
+    shown = {}
+    for rate in ANIMATION_BENCHMARK_RATES:
+
+        # The movement of each update, which changes every 30th of a
+        # second on an update all the rates share.
+        motion = [movement[1:] for movement in ANIMATION_BENCHMARK_MOTION
+                  for _ in range(movement[0] * rate // 30)]
+        delta_time = 1 / rate
+
+        textures = []
+        texture_sets = 0
+        run_time = 0
+        for repeat in range(ANIMATION_BENCHMARK_REPEATS):
+            player.respawn((PLAYER_START_X, PLAYER_START_Y))
+            start_time = time.perf_counter()
+            for change_x, change_y, on_ladder in motion:
+                player.change_x = change_x
+                player.change_y = change_y
+                player.is_on_ladder = on_ladder
+                player.update_animation(delta_time)
+            run_time += time.perf_counter() - start_time
+
+            # Plays it once more to see which texture each update shows
+            # and how often it changes.
+            if repeat == 0:
+                player.respawn((PLAYER_START_X, PLAYER_START_Y))
+                for change_x, change_y, on_ladder in motion:
+                    player.change_x = change_x
+                    player.change_y = change_y
+                    player.is_on_ladder = on_ladder
+                    texture = player.texture
+                    player.update_animation(delta_time)
+                    texture_sets += player.texture is not texture
+                    textures.append(player.texture)
+        shown[rate] = textures[rate // 30 - 1::rate // 30]
+
+        updates = len(motion) * ANIMATION_BENCHMARK_REPEATS
+        seconds = len(motion) / rate
+        print(f"{rate:3d} updates/sec: {run_time / updates * 1e6:.2f}us an "
+              f"update, texture changed {texture_sets / seconds:.1f} "
+              f"times/sec")
+
+    matches = {rate: sum(texture is other for texture, other
+                         in zip(textures, shown[60]))
+               for rate, textures in shown.items()}
+    for rate, count in matches.items():
+        print(f"{rate:3d} updates/sec shows the same texture as 60 in "
+              f"{count} of {len(shown[60])} 30ths of a second")
+    return all(count == len(shown[60]) for count in matches.values())
+
+
+def benchmark_pacing(tick_rate=TICK_RATE, render_rate=RENDER_RATE,
+                     max_ticks=MAX_CATCH_UP_TICKS,
+                     seconds=PACING_BENCHMARK_SECONDS):
+    """Runs the default and fixed loops with each of the benchmark's
+    frame times, and prints how fast the game ran against real time
+    with each loop, and the ticks, late frames and dropped frames the
+    fixed loop counted"""
+    for name, frame_times in PACING_BENCHMARK_FRAMES:
+        clock = FrameClock(tick_rate, render_rate, max_ticks)
+        now = 0.0
+        frames = 0
+        while now < seconds:
+            delta_time = frame_times[frames % len(frame_times)]
+            now += delta_time
+            frames += 1
+            clock.advance(delta_time, now)
+            clock.frame(now)
+
+        # The default loop steps the game once a frame, and the game
+        # moves a 60th of a second a step.
+        default_speed = frames / 60 / now
+        fixed_speed = clock.ticks * clock.tick_time / now
+        print(f"{name}: default loop {default_speed:.0%} speed, fixed "
+              f"loop {fixed_speed:.0%} speed, up to {clock.most_ticks} "
+              f"ticks a frame")
+        print(f"  {clock.summary()}")
+
+
+def benchmark_respawn(cycles=100):
+    """Collects every key, potion and lock in both timelines of each
+    level and then dies, over and over, and prints how long a cycle
+    takes, the memory it allocates and keeps, and the garbage
+    collector's pauses"""
+    handlers = {TRIGGER_KEY: "on_collect_key", TRIGGER_LOCK: "on_open_lock",
+                TRIGGER_POTION: "on_collect_potion"}
+    for level in range(1, LEVEL_COUNT + 1):
+        simulation = Simulation(level, headless=True)
+
+        # Waits for the next level to load in the background, so only
+        # the cycles are measured.
+        for future in simulation.prefetcher.pending.values():
+            future.result()
+
+        def cycle():
+            """Collects everything in each timeline, then dies"""
+            for timeline in TIMELINES:
+                for layer in COLLECTABLE_LAYERS:
+                    handler = getattr(simulation,
+                                      handlers[TRIGGER_LAYERS[layer]])
+                    handler(layer, simulation.pool.present(layer))
+                simulation.apply_input(InputState(swap=True))
+            simulation.on_hazard(None, [])
+
+        # Times every garbage collection while the cycles run.
+        pauses = []
+        collection_start = [0.0]
+
+        def time_collection(phase, info):
+            """Records how long each garbage collection takes"""
+            if phase == "start":
+                collection_start[0] = time.perf_counter()
+            else:
+                pauses.append(time.perf_counter() - collection_start[0])
+
+        cycle()
+        gc.collect()
+        gc.callbacks.append(time_collection)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        start_size = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        for _ in range(cycles):
+            cycle()
+        run_time = time.perf_counter() - start_time
+        size, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count_diff for stat in
+                     tracemalloc.take_snapshot().compare_to(before,
+                                                            "filename"))
+        tracemalloc.stop()
+        gc.callbacks.remove(time_collection)
+
+        print(f"Level {level}: {run_time / cycles * 1000:.2f}ms a cycle, "
+              f"peak {(peak - start_size) / 1024:.1f}KB, kept "
+              f"{(size - start_size) / 1024:.1f}KB in {blocks} blocks, "
+              f"{len(pauses)} collections taking "
+              f"{sum(pauses) * 1000:.2f}ms, longest "
+              f"{max(pauses, default=0) * 1000:.2f}ms")
+
+
+def benchmark_game_states(steps=REWIND_FRAMES):
+    """Plays each level with random input, keeping the game state
+    before every step in a rewind buffer, and prints the memory the
+    buffer takes and how long saving, loading, packing and unpacking a
+    state take. Checks that putting back each state and taking the step
+    from it again gets to the next state, and returns whether every
+    state did."""
+    same = True
+    for level in range(1, LEVEL_COUNT + 1):
+        simulation = Simulation(level, headless=True)
+        for future in simulation.prefetcher.pending.values():
+            future.result()
+        inputs = [InputState.from_bits(int(bits))
+                  for bits in random_inputs(steps, 1, level)[:, 0]]
+
+        # Measures the memory the states kept in the buffer take.
+        buffer = RewindBuffer(steps)
+        gc.collect()
+        tracemalloc.start()
+        start_size = tracemalloc.get_traced_memory()[0]
+        for input_state in inputs:
+            buffer.push(simulation.save_state())
+            simulation.step(input_state)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - start_size
+        tracemalloc.stop()
+        states = [GameState.from_bytes(data) for data in buffer.states]
+        states.append(simulation.save_state())
+
+        # Loads each state, saves it again and takes the step from it,
+        # timing the loads and saves.
+        load_time = save_time = 0
+        differs = 0
+        for index, state in enumerate(states[:-1]):
+            start_time = time.perf_counter()
+            simulation.load_state(state)
+            load_time += time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            saved = simulation.save_state()
+            save_time += time.perf_counter() - start_time
+            simulation.step(inputs[steps - len(states) + 1 + index])
+            differs += saved.to_bytes() != state.to_bytes() \
+                or simulation.save_state().to_bytes() \
+                != states[index + 1].to_bytes()
+        same = same and not differs
+
+        start_time = time.perf_counter()
+        packed = [state.to_bytes() for state in states]
+        pack_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for data in packed:
+            GameState.from_bytes(data)
+        unpack_time = time.perf_counter() - start_time
+        count = len(states) - 1
+        print(f"Level {level}: {count} states kept in "
+              f"{size / 1024:.0f}KB, {size / count:.0f} bytes each, "
+              f"{differs} didn't play the same again")
+        print(f"  save {save_time / count * 1e6:.1f}us, load "
+              f"{load_time / count * 1e6:.1f}us, pack "
+              f"{pack_time / len(packed) * 1e6:.1f}us, unpack "
+              f"{unpack_time / len(packed) * 1e6:.1f}us")
+    return same
+
+
+def random_inputs(steps, count, seed=0):
+    """Returns random input for a number of instances, shaped (steps,
+    instances). The direction buttons are held for a quarter of a
+    second at a time, mostly running right and jumping, and the other
+    buttons are pressed now and then."""
+    rng = np.random.default_rng(seed)
+    holds = steps // 15 + 1
+    held = ((rng.random((holds, count)) < 0.75) * INPUT_RIGHT
+            | (rng.random((holds, count)) < 0.1) * INPUT_LEFT
+            | (rng.random((holds, count)) < 0.5) * INPUT_UP
+            | (rng.random((holds, count)) < 0.1) * INPUT_DOWN)
+    pressed = ((rng.random((steps, count)) < 0.01) * INPUT_SWAP
+               | (rng.random((steps, count)) < 0.01) * INPUT_TELEPORT
+               | (rng.random((steps, count)) < 0.002) * INPUT_RESET)
+    return (held.repeat(15, axis=0)[:steps] | pressed).astype(np.uint8)
+
+
+def benchmark_batch(level, count, steps, processes, seed, checks=20):
+    """Runs many instances of a level with random input in a batch
+    environment, prints how many instance steps it ran a second and
+    how far they got, and checks the first few instances end the same
+    way as the simulation does with the same input"""
+    start_time = time.perf_counter()
+    batch_level = BatchLevel.load(level)
+    print(f"Laid out level {level} for the batch environment in "
+          f"{(time.perf_counter() - start_time) * 1000:.0f}ms")
+
+    inputs = random_inputs(steps, count, seed)
+    start_time = time.perf_counter()
+    state = run_batch(batch_level, inputs, processes)
+    run_time = time.perf_counter() - start_time
+    print(f"Ran {count} instances for {steps} steps in {run_time:.2f}s "
+          f"with {processes or 1} process(es), "
+          f"{count * steps / run_time:.0f} instance steps/sec")
+    print(f"{state['won'].sum()} won, {(state['keys'] > 0).sum()} ended "
+          f"holding keys and {(state['potions'] > 0).sum()} holding "
+          f"potions")
+
+    environment = BatchEnvironment(batch_level, count)
+    environment.load_state(state)
+    checks = min(checks, count)
+    matches = 0
+    for index in range(checks):
+        simulation = Simulation(level, headless=True)
+        for bits in inputs[:, index]:
+            if simulation.level != level:
+                break
+            simulation.step(InputState.from_bits(int(bits)))
+        matches += simulation.summary() == environment.summary(index)
+    print(f"{matches} of {checks} instances ended the same as the "
+          f"simulation")
+    return matches == checks
+
+
+def big_level_data(level, across, up, cache_name):
+    """Writes a map made of copies of a level's tile layers to the level
+    cache format and memory maps it back, like a big compiled level"""
+    level_data = load_level_data(level_map_name(level, TIMELINES[0]))
+    header = dict(level_data.header)
+    header["width"] = level_data.width * across
+    header["height"] = level_data.height * up
+    header["layers"] = [layer for layer in level_data.layers
+                        if layer["kind"] == LAYER_KIND_TILES]
+    tile_gids = np.tile(level_data.tile_gids, (1, up, across))
+    LevelData(header, tile_gids, level_data.objects[:0]).save(cache_name)
+    return LevelData.from_cache(cache_name)
+
+
+def benchmark_streaming(steps=BENCHMARK_FRAMES,
+                        copies=STREAM_BENCHMARK_COPIES):
+    """Checks every level plays the same streamed as it does loaded
+    whole, then moves the screen across a big map made of copies of a
+    level and prints how many chunks it loaded and dropped, how long
+    loading them took and the most sprites that were loaded, with the
+    memory they take against loading the whole map. Returns whether
+    every level played the same."""
+
+    # Plays each level with the benchmarks' run and random input, with
+    # a budget of nothing, so chunks are dropped as soon as they are
+    # off screen, and checks the game is the same after every step.
+    same = True
+    for level in range(1, LEVEL_COUNT + 1):
+        inputs = [scripted_input(frame) for frame in range(steps)]
+        inputs += [InputState.from_bits(int(bits))
+                   for bits in random_inputs(steps, 1, level)[:, 0]]
+        whole = Simulation(level, headless=True)
+        streamed = Simulation(level, headless=True, streaming=True)
+        for streamer in streamed.level_session.streamers.values():
+            streamer.budget = 0
+        for frame, input_state in enumerate(inputs):
+            whole.step(input_state)
+            streamed.step(input_state)
+            if whole.summary() != streamed.summary():
+                print(f"Level {level}: streamed differs on step {frame}")
+                same = False
+                break
+        else:
+            streamers = streamed.level_session.streamers.values()
+            print(f"Level {level}: same for {len(inputs)} steps, "
+                  f"{sum(streamer.loads for streamer in streamers)} "
+                  f"chunks loaded and "
+                  f"{sum(streamer.evictions for streamer in streamers)} "
+                  f"dropped")
+
+    with tempfile.TemporaryDirectory() as directory:
+        across, up = copies
+        level_data = big_level_data(STREAM_BENCHMARK_LEVEL, across, up,
+                                    os.path.join(directory, "big.bin"))
+        preload_textures(level_data)
+        whole_size, scene = scene_memory(
+            lambda: build_scene(level_data, lazy=True))
+        tile_count = sum(len(sprite_list) for sprite_list
+                         in scene.name_mapping.values())
+        sprite_size = whole_size / tile_count
+        del scene
+        gc.collect()
+
+        # Streams the map for a player moving the screen along every
+        # row of it, with the walls and triggers they would touch.
+        player_sprite = PlayerCharacter()
+        scene = build_scene(level_data, lazy=True,
+                            streamed=streamed_layers(level_data))
+        triggers = StreamedTriggers(level_data, scene)
+        scaling = level_data.header["scaling"]
+        physics_engine = PlatformerPhysics(
+            player_sprite, level_data.tile_width * scaling,
+            level_data.tile_height * scaling)
+        streamer = ChunkStreamer(level_data, physics_engine, triggers,
+                                 lazy=True)
+        map_width = level_data.width * level_data.tile_width * scaling
+        map_height = level_data.height * level_data.tile_height * scaling
+
+        update_times = []
+        for y in np.arange(SCREEN_HEIGHT / 2, map_height, SCREEN_HEIGHT):
+            for x in np.arange(SCREEN_WIDTH / 2, map_width,
+                               STREAM_BENCHMARK_SPEED):
+                player_sprite.position = (float(x), float(y))
+                start_time = time.perf_counter()
+                streamer.update(*camera_position(
+                    player_sprite, SCREEN_WIDTH, SCREEN_HEIGHT),
+                    SCREEN_WIDTH, SCREEN_HEIGHT)
+                update_times.append(time.perf_counter() - start_time)
+                physics_engine.contacts()
+                triggers.query(player_sprite)
+
+    update_times = np.array(update_times) * 1000
+    print(f"Map of {level_data.width}x{level_data.height} tiles with "
+          f"{tile_count} tile sprites, "
+          f"{whole_size / 1024 / 1024:.1f}MB loaded whole")
+    print(f"Streamed over {len(update_times)} steps: {streamer.loads} "
+          f"chunks loaded, {streamer.evictions} dropped, at most "
+          f"{streamer.most_sprites} sprites at once, about "
+          f"{streamer.most_sprites * sprite_size / 1024 / 1024:.1f}MB")
+    print(f"Streaming update {update_times.mean():.3f}ms a step, "
+          f"99th percentile {np.percentile(update_times, 99):.2f}ms, "
+          f"longest {update_times.max():.2f}ms")
+    return same
+
+
+def replay_recording(file_name, trace_name=None):
+    """Plays a recording back headless as fast as it can, printing how
+    the game ended and how long the steps took. The phases of each
+    step can be profiled into a trace file too. Returns whether it
+    ended the same way as when it was recorded."""
+    recording = InputRecording.load(file_name)
+    simulation = Simulation(recording.level, headless=True)
+    PROFILER.enabled = bool(trace_name)
+    step_times = np.zeros(len(recording.frames))
+    for frame, input_state in enumerate(recording.inputs()):
+        start_time = time.perf_counter()
+        simulation.step(input_state)
+        step_times[frame] = time.perf_counter() - start_time
+
+    if len(step_times):
+        run_time = step_times.sum()
+        p50, p95, p99 = np.percentile(step_times, [50, 95, 99]) * 1000
+        print(f"Replayed {len(step_times)} frames in {run_time:.2f}s, "
+              f"{len(step_times) / run_time:.0f} frames/sec")
+        print(f"Frame times: mean {step_times.mean() * 1000:.3f}ms, "
+              f"p50 {p50:.3f}ms, p95 {p95:.3f}ms, p99 {p99:.3f}ms, "
+              f"max {step_times.max() * 1000:.3f}ms")
+    if trace_name:
+        print("\n".join(PROFILER.table()))
+        PROFILER.save_trace(trace_name)
+        print(f"Saved {len(PROFILER.trace)} spans to {trace_name}")
+
+    level, timeline, keys, potions, x, y = simulation.summary()
+    print(f"Ended on level {level} timeline {timeline} at ({x:.1f}, "
+          f"{y:.1f}) with {keys} keys and {potions} potions")
+    if simulation.summary() == recording.final_state:
+        print("This matches the recording")
+        return True
+    print(f"This doesn't match the recording, which ended with "
+          f"{recording.final_state}")
+    return False
+
+
+def time_call(function, *args):
+    """Calls a function and returns how long it took in milliseconds"""
+    start_time = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start_time) * 1000
+
+
+def load_with_arcade(map_name):
+    """Loads a map the way arcade does it, with its tilemap loader"""
+    arcade.Scene.from_tilemap(
+        arcade.load_tilemap(map_name, TILE_SCALING, LAYER_OPTIONS))
+
+
+def load_with_level_data(map_name):
+    """Loads a map the way the game does it, from the level cache"""
+    level_data = load_level_data(map_name)
+    preload_textures(level_data)
+    build_scene(level_data, lazy=True)
+
+
+def run_benchmarks():
+    """Times loading the maps, swapping timelines, restarting levels,
+    creating the player and updating a frame, and counts the sprites
+    drawn each frame. Times that are repeated use the median, which
+    isn't thrown off by the odd slow run, and the cold loads and frame
+    updates keep the best of several runs, so that a run slowed down
+    by something else on the computer doesn't count as a regression.
+    Returns the results by name, all of which are better when
+    lower."""
+    results = {}
+
+    # Loads each map cold, with arcade's texture cache emptied first
+    # so the tile images have to be decoded, then warm.
+    for level in range(1, LEVEL_COUNT + 1):
+        for timeline in TIMELINES:
+            map_name = level_map_name(level, timeline)
+            for name, load in (("arcade_load", load_with_arcade),
+                               ("level_load", load_with_level_data)):
+                cold_times = []
+                for _ in range(BENCHMARK_RUNS):
+                    arcade.cleanup_texture_cache()
+                    TILE_ATLAS.clear()
+                    cold_times.append(time_call(load, map_name))
+                results[f"{map_name}/{name}_cold_ms"] = min(cold_times)
+                results[f"{map_name}/{name}_warm_ms"] = min(
+                    time_call(load, map_name)
+                    for _ in range(BENCHMARK_RUNS))
+
+    # Creates the player once with none of its textures loaded, then
+    # many times once they are.
+    cold_times = []
+    for _ in range(BENCHMARK_RUNS):
+        TEXTURES.textures.clear()
+        TEXTURES.characters.clear()
+        arcade.cleanup_texture_cache()
+        cold_times.append(time_call(PlayerCharacter))
+    results["player/construct_cold_ms"] = min(cold_times)
+    results["player/construct_warm_ms"] = np.median(
+        [time_call(PlayerCharacter) for _ in range(100)])
+
+    for level in range(1, LEVEL_COUNT + 1):
+        group = f"level_{level}"
+        simulation = Simulation(level, headless=True)
+        session = simulation.level_session
+
+        # Swaps back and forth between the timelines.
+        for index in range(BENCHMARK_REPEATS):
+            session.swap(TIMELINES[index % len(TIMELINES)])
+        results[f"{group}/swap_ms"] = \
+            np.median(session.swap_latencies) * 1000
+
+        # Collects every key, potion and lock before each restart, as
+        # if the player had collected them all.
+        for _ in range(BENCHMARK_REPEATS):
+            for pool in session.pools.values():
+                pool.collect(pool.sprites)
+            session.reset(simulation.player_sprite)
+        results[f"{group}/reset_ms"] = \
+            np.median(session.reset_latencies) * 1000
+
+        # Splits the static layers of both timelines into chunks the
+        # same way the game does, without making any OpenGL resources.
+        renderers = {
+            timeline: SceneRenderer(scene, session.level_data[timeline],
+                                    lazy=True)
+            for timeline, scene in session.scenes.items()}
+
+        # Runs the scripted input through the simulation one phase at
+        # a time, the same as Simulation.step does, plus the player's
+        # animation which GameView does. Each frame counts the sprites
+        # and sprite lists (draw calls) the renderer of each timeline
+        # would draw with the camera on the player. The whole script
+        # is run several times from the start of the level, and each
+        # phase keeps the lowest of its medians.
+        phase_medians = np.zeros((BENCHMARK_RUNS, 3))
+        draw_counts = np.zeros((BENCHMARK_FRAMES, len(TIMELINES), 2))
+        for run in range(BENCHMARK_RUNS):
+            simulation.reset_level()
+            phase_times = np.zeros((BENCHMARK_FRAMES, 3))
+            for frame in range(BENCHMARK_FRAMES):
+                times = phase_times[frame]
+                times[0] = time_call(simulation.apply_input,
+                                     scripted_input(frame))
+                times[0] += time_call(simulation.update_physics)
+                times[1] = time_call(simulation.update_triggers)
+                times[2] = time_call(
+                    simulation.player_sprite.update_animation)
+                left, bottom = camera_position(simulation.player_sprite,
+                                               SCREEN_WIDTH, SCREEN_HEIGHT)
+                for index, renderer in enumerate(renderers.values()):
+                    draw_counts[frame, index] = (
+                        len(renderer.visible(left, bottom, SCREEN_WIDTH,
+                                             SCREEN_HEIGHT)),
+                        renderer.sprites_drawn)
+            phase_medians[run] = np.median(phase_times, axis=0)
+        for name, best in zip(("physics", "collision", "animation"),
+                              phase_medians.min(axis=0)):
+            results[f"{group}/update_{name}_us"] = best * 1000
+        for index, timeline in enumerate(renderers):
+            calls, sprites = np.median(draw_counts[:, index], axis=0)
+            results[f"{group}/timeline_{timeline}_draw_sprites"] = sprites
+            results[f"{group}/timeline_{timeline}_draw_calls"] = calls
+
+    return {name: float(value) for name, value in results.items()}
+
+
+def compare_benchmarks(results, baseline, threshold):
+    """Prints each result next to its baseline and returns how many
+    got worse by more than their threshold. The baseline can set its
+    own threshold for a result, or for a result on every map or level,
+    in its thresholds."""
+    thresholds = baseline.get("thresholds", {})
+    baseline_results = baseline.get("results", {})
+    regressions = 0
+    print(f"{'Result':<44}{'Baseline':>12}{'Now':>12}{'Change':>10}  Status")
+    for name, value in results.items():
+        base = baseline_results.get(name)
+        if base is None:
+            print(f"{name:<44}{'':>12}{value:>12.3f}{'':>10}  new")
+            continue
+        limit = thresholds.get(name, thresholds.get(
+            name.split("/")[-1], threshold))
+        change = (value - base) / base if base else 0
+        status = "ok"
+        if value > base * (1 + limit):
+            status = f"REGRESSION (over {limit:.0%})"
+            regressions += 1
+        print(f"{name:<44}{base:>12.3f}{value:>12.3f}{change:>+10.1%}"
+              f"  {status}")
+    return regressions
+
+
+def benchmark_game(output_name, baseline_name, threshold, save_baseline):
+    """Runs the benchmarks, writes the results to a JSON file and
+    compares them against the baseline. Returns whether nothing
+    regressed."""
+    results = run_benchmarks()
+    report = {"version": 1, "results": results}
+    if output_name:
+        with open(output_name, "w") as file:
+            json.dump(report, file, indent=2)
+
+    # Saving a new baseline keeps the thresholds of the old one.
+    if save_baseline:
+        if os.path.exists(baseline_name):
+            with open(baseline_name) as file:
+                report["thresholds"] = json.load(file).get("thresholds", {})
+        os.makedirs(os.path.dirname(baseline_name) or ".", exist_ok=True)
+        with open(baseline_name, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved the results as the baseline in {baseline_name}")
+        return True
+
+    if not os.path.exists(baseline_name):
+        print(f"There is no baseline in {baseline_name} to compare to")
+        return True
+    with open(baseline_name) as file:
+        baseline = json.load(file)
+    regressions = compare_benchmarks(results, baseline, threshold)
+    print(f"{regressions} regressions")
+    return not regressions
+
+
+def box_table(sprites, columns, rows, cell_width, cell_height,
+              touching=False):
+    """Lays the hit boxes of sprites out on the map grid as an array of
+    shape (rows, columns, boxes, 5), with a border of empty cells
+    around the map. Each box is its left, right, bottom and top edges
+    and the value given with its sprite. Empty boxes can't overlap
+    anything. The right and top edges of a box only reach into the
+    next cell if they go past its edge, unless boxes that only touch
+    are going to be looked for."""
+    cells = {}
+    for sprite, value in sprites:
+        x_points, y_points = zip(*sprite.get_adjusted_hit_box())
+        box = (min(x_points), max(x_points), min(y_points), max(y_points),
+               value)
+        first_column = int(box[0] // cell_width) + 1
+        first_row = int(box[2] // cell_height) + 1
+        if touching:
+            last_column = int(box[1] // cell_width) + 1
+            last_row = int(box[3] // cell_height) + 1
+        else:
+            last_column = math.ceil(box[1] / cell_width)
+            last_row = math.ceil(box[3] / cell_height)
+        for row in range(max(first_row, 0), min(last_row, rows + 1) + 1):
+            for column in range(max(first_column, 0),
+                                min(last_column, columns + 1) + 1):
+                cells.setdefault((row, column), []).append(box)
+
+    depth = max((len(boxes) for boxes in cells.values()), default=1)
+    table = np.empty((rows + 2, columns + 2, depth, 5))
+    table[...] = (np.inf, -np.inf, np.inf, -np.inf, -1)
+    for (row, column), boxes in cells.items():
+        table[row, column, :len(boxes)] = boxes
+    return table
+
+
+def stack_tables(tables):
+    """Stacks tables made by box_table into one array, emptying the
+    extra boxes of the tables with fewer boxes in a cell"""
+    depth = max(table.shape[2] for table in tables)
+    stacked = np.empty((len(tables),) + tables[0].shape[:2] + (depth, 5))
+    stacked[...] = (np.inf, -np.inf, np.inf, -np.inf, -1)
+    for index, table in enumerate(tables):
+        stacked[index, :, :, :table.shape[2]] = table
+    return stacked
+
+
+class BatchLevel:
+    """The walls, ladders and triggers of both timelines of a level laid
+    out on the map grid in NumPy arrays, which every instance of a batch
+    environment steps against. It holds no sprites, so it can be sent
+    to other processes."""
+
+    def __init__(self, level, cell_width, cell_height, walls, ladders,
+                 triggers, trigger_layers, trigger_shapes, collectables,
+                 player_box, player_points, player_scale,
+                 spawn=(PLAYER_START_X, PLAYER_START_Y)):
+        """Stores the arrays of a level"""
+        self.level = level
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.rows = walls.shape[1] - 2
+        self.columns = walls.shape[2] - 2
+
+        # The walls have a table for each timeline with the locks solid
+        # and then with the placeholders solid. The ladders and triggers
+        # have one for each timeline, with each trigger's value being
+        # its index in the trigger shapes of its timeline, which are the
+        # index of its layer in the trigger layers, its hit box and its
+        # number if it is a key or potion.
+        self.walls = walls
+        self.ladders = ladders
+        self.triggers = triggers
+        self.trigger_layers = trigger_layers
+        self.trigger_shapes = trigger_shapes
+
+        # Every key and potion as its layer, timeline and the column
+        # and row of the cell it is in.
+        self.collectables = collectables
+
+        # The edges of the player's hit box from its center, the points
+        # of its hit box before scaling and where they start.
+        self.player_box = player_box
+        self.player_points = player_points
+        self.player_scale = player_scale
+        self.spawn = spawn
+
+    @classmethod
+    def load(cls, level):
+        """Loads both timelines of a level and lays out their hit boxes"""
+        level_data, scenes = prepare_level(level)
+        first = level_data[TIMELINES[0]]
+        scaling = first.header["scaling"]
+        cell_width = first.tile_width * scaling
+        cell_height = first.tile_height * scaling
+        trigger_layers = list(TRIGGER_LAYERS)
+
+        walls = []
+        ladders = []
+        triggers = []
+        trigger_shapes = []
+        collectables = []
+        for timeline in TIMELINES:
+            scene = scenes[timeline]
+            size = (level_data[timeline].width, level_data[timeline].height,
+                    cell_width, cell_height)
+            for lock_state in (LAYER_NAME_LOCKS, LAYER_NAME_PLACEHOLDER):
+                walls.append(box_table(
+                    [(sprite, 0) for layer in (LAYER_NAME_PLATFORMS,
+                                               lock_state)
+                     for sprite in scene[layer]], *size))
+            ladders.append(box_table(
+                [(sprite, 0) for sprite in scene[LAYER_NAME_LADDERS]],
+                *size))
+
+            # Triggers are set off by touching them, like the collision
+            # grid checks. Each key and potion is numbered, so the ones
+            # the player picks up can be told apart.
+            shapes = []
+            for index, layer in enumerate(trigger_layers):
+                if layer not in scene.name_mapping:
+                    continue
+                for sprite in scene[layer]:
+                    number = -1
+                    if TRIGGER_LAYERS[layer] in (TRIGGER_KEY,
+                                                 TRIGGER_POTION):
+                        number = len(collectables)
+                        collectables.append((
+                            layer, timeline,
+                            int(sprite.center_x // cell_width),
+                            int(sprite.center_y // cell_height)))
+                    shapes.append((index, [tuple(point) for point in
+                                           sprite.get_adjusted_hit_box()],
+                                   number))
+            triggers.append(box_table(
+                [(sprite, shape) for shape, sprite in enumerate(
+                    sprite for layer in trigger_layers
+                    if layer in scene.name_mapping
+                    for sprite in scene[layer])],
+                *size, touching=True))
+            trigger_shapes.append(shapes)
+
+        # Works out the player's hit box the same way the physics
+        # engine does, so both give exactly the same positions.
+        player_sprite = PlayerCharacter()
+        player_sprite.position = (PLAYER_START_X, PLAYER_START_Y)
+        x_points, y_points = zip(*player_sprite.get_adjusted_hit_box())
+        player_box = (min(x_points) - PLAYER_START_X,
+                      max(x_points) - PLAYER_START_X,
+                      min(y_points) - PLAYER_START_Y,
+                      max(y_points) - PLAYER_START_Y)
+
+        return cls(level, cell_width, cell_height, stack_tables(walls),
+                   stack_tables(ladders), stack_tables(triggers),
+                   trigger_layers, trigger_shapes, collectables, player_box,
+                   [tuple(point) for point in player_sprite.hit_box],
+                   player_sprite.scale)
+
+
+class BatchEnvironment:
+    """Many independent games of one level stepped together, with the
+    state of every player in NumPy arrays, for playtesting and tuning.
+    It follows the same rules as Simulation and moves the player the
+    same way PlatformerPhysics does. An instance that reaches the exit
+    stops until it is reset."""
+
+    # The arrays that make up the state of every instance.
+    FIELDS = ("x", "y", "change_x", "change_y", "timeline", "keys",
+              "potions", "claims", "placeholder", "held",
+              "jump_needs_reset", "facing_forward", "grounded",
+              "can_jump", "on_ladder", "against_wall", "done", "won",
+              "frames", "collected")
+
+    def __init__(self, batch_level, count, gravity=GRAVITY,
+                 jump_speed=PLAYER_JUMP_SPEED,
+                 movement_speed=PLAYER_MOVEMENT_SPEED):
+        """Creates a number of instances at the start of the level. The
+        movement constants can be given for each instance, to tune them."""
+        self.level = batch_level
+        self.count = count
+        self.gravity = np.broadcast_to(
+            np.asarray(gravity, dtype=float), (count,)).copy()
+        self.jump_speed = np.broadcast_to(
+            np.asarray(jump_speed, dtype=float), (count,)).copy()
+        self.movement_speed = np.broadcast_to(
+            np.asarray(movement_speed, dtype=float), (count,)).copy()
+
+        # The player's position and speed.
+        self.x = np.zeros(count)
+        self.y = np.zeros(count)
+        self.change_x = np.zeros(count)
+        self.change_y = np.zeros(count)
+
+        # The timeline, the keys and potions available, a bit for each
+        # trigger layer that has been claimed, and whether the
+        # placeholders are solid instead of the locks.
+        self.timeline = np.ones(count, dtype=np.int8)
+        self.keys = np.zeros(count, dtype=np.int32)
+        self.potions = np.zeros(count, dtype=np.int32)
+        self.claims = np.zeros(count, dtype=np.uint32)
+        self.placeholder = np.zeros(count, dtype=bool)
+
+        # The buttons held on the last step, and the rest of what
+        # Simulation keeps between steps.
+        self.held = np.zeros(count, dtype=np.uint8)
+        self.jump_needs_reset = np.zeros(count, dtype=bool)
+        self.facing_forward = np.ones(count, dtype=bool)
+
+        # What each player was touching after their last step.
+        self.grounded = np.zeros(count, dtype=bool)
+        self.can_jump = np.zeros(count, dtype=bool)
+        self.on_ladder = np.zeros(count, dtype=bool)
+        self.against_wall = np.zeros(count, dtype=bool)
+
+        # Whether each instance has finished and whether it got to the
+        # exit, and how many steps it has taken.
+        self.done = np.zeros(count, dtype=bool)
+        self.won = np.zeros(count, dtype=bool)
+        self.frames = np.zeros(count, dtype=np.int32)
+
+        # A bit for each key and potion of the level each player has
+        # picked up since they were created, which restarting the
+        # level doesn't clear.
+        self.collected = np.zeros(count, dtype=np.uint64)
+
+        self.reset()
+
+    def state(self):
+        """Returns a copy of the state of every instance by name"""
+        return {name: getattr(self, name).copy() for name in self.FIELDS}
+
+    def load_state(self, state, mask=None):
+        """Puts back a state returned by state, for every instance or
+        just the ones in a mask"""
+        for name in self.FIELDS:
+            if mask is None:
+                getattr(self, name)[:] = state[name]
+            else:
+                getattr(self, name)[mask] = state[name][mask]
+
+    def keep(self, mask):
+        """Drops every instance that isn't in a mask"""
+        for name in self.FIELDS + ("gravity", "jump_speed",
+                                   "movement_speed"):
+            setattr(self, name, getattr(self, name)[mask])
+        self.count = len(self.x)
+
+    def reset(self, mask=None):
+        """Starts the instances in a mask, or all of them, from the start
+        of the level as if they had just been created"""
+        if mask is None:
+            mask = np.ones(self.count, dtype=bool)
+        self.timeline[mask] = TIMELINES[0]
+        self.held[mask] = 0
+        self.jump_needs_reset[mask] = False
+        self.facing_forward[mask] = True
+        self.against_wall[mask] = False
+        self.done[mask] = False
+        self.won[mask] = False
+        self.frames[mask] = 0
+        self.reset_level(mask)
+        self.update_contacts()
+
+    def reset_level(self, mask):
+        """Restarts the level for the instances in a mask, the same way
+        Simulation.reset_level does"""
+        self.keys[mask] = 0
+        self.potions[mask] = 0
+        self.claims[mask] = 0
+        self.placeholder[mask] = False
+        self.x[mask], self.y[mask] = self.level.spawn
+        self.change_x[mask] = 0
+        self.change_y[mask] = 0
+
+    def box(self, x, y):
+        """Returns the edges of the players' hit boxes with their
+        centers at positions"""
+        left, right, bottom, top = self.level.player_box
+        return x + left, x + right, y + bottom, y + top
+
+    def wall_tables(self):
+        """Returns the index of the wall table each instance uses"""
+        return ((self.timeline - TIMELINES[0]) * 2
+                + self.placeholder).astype(np.intp)
+
+    def gather(self, tables, table, left, right, bottom, top):
+        """Returns the boxes in every cell each rectangle covers, shaped
+        (instances, boxes, 5). Rectangles covering fewer cells than the
+        rest get some of their cells more than once."""
+        level = self.level
+        first_column = np.clip(np.floor(left / level.cell_width) + 1,
+                               0, level.columns + 1).astype(np.intp)
+        last_column = np.clip(np.floor(right / level.cell_width) + 1,
+                              0, level.columns + 1).astype(np.intp)
+        first_row = np.clip(np.floor(bottom / level.cell_height) + 1,
+                            0, level.rows + 1).astype(np.intp)
+        last_row = np.clip(np.floor(top / level.cell_height) + 1,
+                           0, level.rows + 1).astype(np.intp)
+        column_count = int((last_column - first_column).max(initial=0)) + 1
+        row_count = int((last_row - first_row).max(initial=0)) + 1
+
+        rows = np.minimum(first_row[:, None, None]
+                          + np.arange(row_count)[None, :, None],
+                          last_row[:, None, None])
+        columns = np.minimum(first_column[:, None, None]
+                             + np.arange(column_count)[None, None, :],
+                             last_column[:, None, None])
+        boxes = tables[table[:, None, None], rows, columns]
+        return boxes.reshape(len(left), -1, 5)
+
+    @staticmethod
+    def overlaps(boxes, left, right, bottom, top):
+        """Returns which boxes overlap the rectangle of their instance"""
+        return ((boxes[..., 0] < right[:, None])
+                & (boxes[..., 1] > left[:, None])
+                & (boxes[..., 2] < top[:, None])
+                & (boxes[..., 3] > bottom[:, None]))
+
+    def in_walls(self, table, x, y):
+        """Returns which players would be inside a wall at positions"""
+        box = self.box(x, y)
+        return self.overlaps(self.gather(self.level.walls, table, *box),
+                             *box).any(axis=1)
+
+    def update_contacts(self):
+        """Works out what every player is touching, the same way
+        PlatformerPhysics.contacts does"""
+        left, right, bottom, top = self.box(self.x, self.y)
+        below = bottom - JUMP_DISTANCE
+        boxes = self.gather(self.level.walls, self.wall_tables(),
+                            left, right, below, top)
+        floors = np.where(self.overlaps(boxes, left, right, below, top),
+                          bottom[:, None] - boxes[..., 3], np.inf)
+        floor = floors.min(axis=1)
+        self.grounded = floor < GROUND_DISTANCE
+        self.can_jump = floor < JUMP_DISTANCE
+
+        table = (self.timeline - TIMELINES[0]).astype(np.intp)
+        boxes = self.gather(self.level.ladders, table, left, right, bottom,
+                            top)
+        self.on_ladder = self.overlaps(boxes, left, right, bottom,
+                                       top).any(axis=1)
+
+    def sweep(self, table, x, y, change, across):
+        """Returns how far along one axis each player can move before a
+        wall stops them, whether one did, and the highest top of the
+        walls that stopped them, the same way PlatformerPhysics.sweep
+        does"""
+        left, right, bottom, top = self.box(x, y)
+        forward = change > 0
+        if across:
+            low = np.where(forward, right, left + change)
+            high = np.where(forward, right + change, left)
+            boxes = self.gather(self.level.walls, table, low, high, bottom,
+                                top)
+            hits = self.overlaps(boxes, low, high, bottom, top)
+            gaps = np.where(forward[:, None], boxes[..., 0] - right[:, None],
+                            left[:, None] - boxes[..., 1])
+        else:
+            low = np.where(forward, top, bottom + change)
+            high = np.where(forward, top + change, bottom)
+            boxes = self.gather(self.level.walls, table, left, right, low,
+                                high)
+            hits = self.overlaps(boxes, left, right, low, high)
+            gaps = np.where(forward[:, None], boxes[..., 2] - top[:, None],
+                            bottom[:, None] - boxes[..., 3])
+
+        gaps = np.where(hits, gaps, np.inf)
+        gap = gaps.min(axis=1)
+        blocked = (gap < np.inf) & (change != 0)
+        distance = np.where(blocked, np.maximum(gap - PHYSICS_SKIN, 0),
+                            np.abs(change))
+        tops = np.where(hits & (gaps == gap[:, None]), boxes[..., 3],
+                        -np.inf).max(axis=1)
+        return distance, blocked, tops
+
+    def push_out(self, indices):
+        """Moves the players given out of the walls they are inside, the
+        same way PlatformerPhysics.push_out does"""
+        table = self.wall_tables()
+        distance = 1
+        while len(indices) and distance <= PHYSICS_PUSH_LIMIT:
+            for step_x, step_y in ((0, 1), (0, -1), (1, 0), (-1, 0),
+                                   (1, 1), (1, -1), (-1, 1), (-1, -1)):
+                new_x = self.x[indices] + step_x * distance
+                new_y = self.y[indices] + step_y * distance
+                free = ~self.in_walls(table[indices], new_x, new_y)
+                moved = indices[free]
+                self.x[moved] = new_x[free]
+                self.y[moved] = new_y[free]
+                indices = indices[~free]
+                if not len(indices):
+                    break
+            distance *= 2
+
+    def process_keychange(self, mask):
+        """Sets the speed of the players in a mask from the buttons they
+        hold and what they are touching, the same way
+        Simulation.process_keychange does"""
+        held = self.held
+        left = mask & (held & INPUT_LEFT != 0)
+        right = mask & (held & INPUT_RIGHT != 0)
+        up = mask & (held & INPUT_UP != 0)
+        down = mask & (held & INPUT_DOWN != 0)
+        up_only = up & ~down
+
+        climb = up_only & self.on_ladder
+        jump = up_only & ~self.on_ladder & self.can_jump \
+            & ~self.jump_needs_reset
+        self.change_y[climb] = self.movement_speed[climb]
+        self.change_y[jump] = self.jump_speed[jump]
+        self.jump_needs_reset |= jump
+        climb_down = down & ~up & self.on_ladder
+        self.change_y[climb_down] = -self.movement_speed[climb_down]
+        self.change_y[mask & self.on_ladder & (up == down)] = 0
+
+        speed = self.movement_speed
+        self.change_x[mask] = np.where(
+            right & ~left, speed, np.where(left & ~right, -speed, 0))[mask]
+
+    def apply_input(self, inputs):
+        """Applies the buttons pressed and released since the last step,
+        the same way Simulation.apply_input does"""
+        directions = INPUT_LEFT | INPUT_RIGHT | INPUT_UP | INPUT_DOWN
+        swap = inputs & INPUT_SWAP != 0
+        reset = inputs & INPUT_RESET != 0
+        teleport = inputs & INPUT_TELEPORT != 0
+        pressed = ((inputs ^ self.held) & directions != 0) | swap | reset \
+            | teleport
+
+        started = inputs & ~self.held
+        self.facing_forward[started & INPUT_LEFT != 0] = False
+        self.facing_forward[started & INPUT_RIGHT != 0] = True
+        self.jump_needs_reset &= inputs & INPUT_UP != 0
+        self.held = inputs & directions
+        self.process_keychange(pressed)
+
+        # Swapping back to the first timeline loses the keys and makes
+        # the locks solid again.
+        back = swap & (self.timeline != TIMELINES[0])
+        self.timeline[swap] = np.where(back, TIMELINES[0],
+                                       TIMELINES[1])[swap]
+        self.keys[back] = 0
+        self.placeholder[back] = False
+        self.reset_level(reset)
+
+        # Teleports the players who have a potion, stopping them at the
+        # first wall in the way.
+        teleport &= self.potions > 0
+        if teleport.any():
+            self.potions[teleport] -= 1
+            indices = np.flatnonzero(teleport)
+            distance = np.where(self.facing_forward[indices],
+                                TELEPORT_DISTANCE, -TELEPORT_DISTANCE)
+            moved, _, _ = self.sweep(self.wall_tables()[indices],
+                                     self.x[indices], self.y[indices],
+                                     distance.astype(float), True)
+            self.x[indices] += np.copysign(moved, distance)
+        if (swap | reset | teleport).any():
+            self.update_contacts()
+
+    def update_physics(self):
+        """Moves every player and stops them against the walls, the same
+        way PlatformerPhysics.update does, then works out what they are
+        touching"""
+        self.change_y -= np.where(self.on_ladder, 0, self.gravity)
+        table = self.wall_tables()
+        inside = self.in_walls(table, self.x, self.y)
+        if inside.any():
+            self.push_out(np.flatnonzero(inside))
+
+        # Moves up or down first, stopping on the floor or ceiling.
+        distance, blocked, _ = self.sweep(table, self.x, self.y,
+                                          self.change_y, False)
+        self.y += np.copysign(distance, self.change_y)
+        self.change_y[blocked] = 0
+
+        # Then moves across, stepping up onto a low ledge if that is
+        # all that is in the way.
+        distance, blocked, tops = self.sweep(table, self.x, self.y,
+                                             self.change_x, True)
+        step = tops - (self.y + self.level.player_box[2]) + PHYSICS_SKIN
+        new_x = self.x + self.change_x
+        stepped = blocked & (step <= np.abs(self.change_x))
+        if stepped.any():
+            indices = np.flatnonzero(stepped)
+            stepped[indices] = ~self.in_walls(
+                table[indices], new_x[indices],
+                self.y[indices] + step[indices])
+        self.x = np.where(
+            blocked & ~stepped,
+            self.x + np.copysign(distance, self.change_x), new_x)
+        self.y = np.where(stepped, self.y + step, self.y)
+        self.against_wall = blocked & ~stepped
+
+        self.update_contacts()
+        self.process_keychange(np.ones(self.count, dtype=bool))
+
+    def touched_triggers(self, active):
+        """Returns which trigger layers each active player touches, shaped
+        (instances, layers), and marks the keys and potions they touch
+        as collected. The boxes around the triggers are checked for
+        every player at once, then the hit boxes of the few that touch
+        are checked the same way the collision grid does."""
+        level = self.level
+        touched = np.zeros((self.count, len(level.trigger_layers)),
+                           dtype=bool)
+        left, right, bottom, top = self.box(self.x, self.y)
+        table = (self.timeline - TIMELINES[0]).astype(np.intp)
+        boxes = self.gather(level.triggers, table, left, right, bottom, top)
+        near = ((boxes[..., 0] <= right[:, None])
+                & (boxes[..., 1] >= left[:, None])
+                & (boxes[..., 2] <= top[:, None])
+                & (boxes[..., 3] >= bottom[:, None]) & active[:, None])
+
+        scale = level.player_scale
+        for index in np.flatnonzero(near.any(axis=1)):
+            x = self.x[index]
+            y = self.y[index]
+            points = [(point_x * scale + x, point_y * scale + y)
+                      for point_x, point_y in level.player_points]
+            shapes = level.trigger_shapes[table[index]]
+            for shape in set(boxes[index, near[index], 4].astype(int)):
+                layer, trigger_points, number = shapes[shape]
+                if (not touched[index, layer] or number >= 0) and \
+                        arcade.are_polygons_intersecting(points,
+                                                         trigger_points):
+                    touched[index, layer] = True
+                    if number >= 0:
+                        self.collected[index] |= np.uint64(1 << number)
+        return touched
+
+    def update_triggers(self):
+        """Handles what every player is touching, the same way the
+        handlers of Simulation do, or restarts the level of the players
+        who fell off the map"""
+        fell = self.y < 1
+        self.reset_level(fell)
+        changed = fell.any()
+
+        active = ~fell
+        touched_layers = self.touched_triggers(active)
+        for index, layer in enumerate(self.level.trigger_layers):
+            touched = active & touched_layers[:, index]
+            if not touched.any():
+                continue
+            event = TRIGGER_LAYERS[layer]
+            claimed = touched & (self.claims & (1 << index) == 0)
+            if event == TRIGGER_BOUNCE:
+                self.change_y[touched] = BOUNCE_SPEED
+            elif event == TRIGGER_HAZARD:
+                self.reset_level(touched)
+                active &= ~touched
+                changed = True
+            elif event == TRIGGER_EXIT:
+                self.done |= touched
+                self.won |= touched
+                active &= ~touched
+            elif event == TRIGGER_KEY:
+                self.claims[claimed] |= 1 << index
+                self.keys[claimed] += 1
+                self.placeholder |= claimed
+                changed = True
+            elif event == TRIGGER_POTION:
+                self.claims[claimed] |= 1 << index
+                self.potions[claimed] += 1
+        if changed:
+            self.update_contacts()
+
+    def step(self, inputs, reset=None):
+        """Moves every instance on by one fixed timestep, with an input
+        byte for each, after resetting the instances in the reset mask"""
+        if reset is not None and np.any(reset):
+            self.reset(reset)
+        inputs = np.broadcast_to(np.asarray(inputs, dtype=np.uint8),
+                                 (self.count,))
+        frozen = self.done.copy()
+        saved = self.state() if frozen.any() else None
+
+        self.frames += 1
+        self.apply_input(inputs)
+        self.update_physics()
+        self.update_triggers()
+
+        if saved is not None:
+            self.load_state(saved, frozen)
+
+    def summary(self, index):
+        """Returns the same summary as Simulation.summary for one
+        instance, counting the exit as being on the next level"""
+        return (self.level.level + int(self.won[index]),
+                int(self.timeline[index]), int(self.keys[index]),
+                int(self.potions[index]), float(self.x[index]),
+                float(self.y[index]))
+
+
+def run_batch_chunk(batch_level, inputs, constants):
+    """Runs a batch environment through inputs shaped (steps, instances)
+    and returns its final state. This is what each process of a pool
+    runs."""
+    environment = BatchEnvironment(batch_level, inputs.shape[1],
+                                   **constants)
+    for step_inputs in inputs:
+        environment.step(step_inputs)
+    return environment.state()
+
+
+def run_batch(batch_level, inputs, processes=0, **constants):
+    """Runs instances of a level through inputs shaped (steps,
+    instances), splitting the instances between a pool of processes if
+    any are asked for, and returns the final state of every instance.
+    The movement constants can be given for each instance."""
+    if processes <= 1:
+        return run_batch_chunk(batch_level, inputs, constants)
+
+    # Each process gets a slice of the instances, with its slice of any
+    # constants given for each instance.
+    count = inputs.shape[1]
+    bounds = np.linspace(0, count, processes + 1).astype(int)
+    jobs = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        chunk_constants = {
+            name: value[start:end] if np.ndim(value) else value
+            for name, value in constants.items()}
+        jobs.append((batch_level, inputs[:, start:end], chunk_constants))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        states = list(executor.map(run_batch_chunk, *zip(*jobs)))
+    return {name: np.concatenate([state[name] for state in states])
+            for name in states[0]}
+
+
+class LevelAnalyzer:
+    """Finds every place in a level the player can get to, and a way to
+    the exit. A place is the timeline, the cell the player is in and
+    whether the placeholders are solid. Each of the analyzer's moves is
+    only tried once from each place, from the first state found there,
+    and the moves that use potions only once a state with them is found
+    there. They are tried in a batch environment so jumps, ladders,
+    trampolines, keys, locks, potions and timeline swaps all follow the
+    game's own physics and rules. The keys and potions a move picks up
+    are then worked out for every potions and claimed layers the place
+    is found with, one move further from the start each round. A state
+    is left out if one found before in the same place has as many
+    potions and has claimed no more, as it can do anything that can.
+
+    As the first state found in a place stands in for every other one,
+    the way to the exit is then searched for again with the real states,
+    trying first the states closest to the exit as the places found
+    make out, so the solution is the exact one the game plays."""
+
+    # The arrays a state is stored as, which are all a move needs to be
+    # tried from it again.
+    FIELDS = ("x", "y", "change_x", "change_y", "timeline", "keys",
+              "potions", "claims", "placeholder")
+
+    # What a state needs for a move to be worth trying from it.
+    NEEDS_LADDER = 1
+    NEEDS_FOOTING = 2
+    NEEDS_POTION = 4
+
+    def __init__(self, batch_level, chunk=ANALYZER_CHUNK):
+        """Sets up the search of a level, trying at most a chunk of
+        moves at once"""
+        self.level = batch_level
+        self.chunk = chunk
+        self.needs, self.moves = zip(*self.build_moves())
+        self.needs = np.array(self.needs)
+
+        # Each move as the buttons held on each of its steps, and how
+        # many potions it uses.
+        self.move_steps = np.array(
+            [sum(steps for _, steps in move) for move in self.moves])
+        self.move_inputs = np.zeros(
+            (len(self.moves), self.move_steps.max() + 1),
+            dtype=np.uint8)
+        for index, move in enumerate(self.moves):
+            start = 0
+            for buttons, steps in move:
+                self.move_inputs[index, start:start + steps] = buttons
+                start += steps
+        self.teleports = (self.move_inputs & INPUT_TELEPORT != 0).sum(
+            axis=1)
+
+        # The cells where the walls change when the placeholders are
+        # solid instead of the locks, counted up from the bottom left
+        # corner, so how many of them are in a rectangle of cells can
+        # be worked out at once.
+        walls = batch_level.walls
+        locks = (walls[0::2] != walls[1::2]).any(axis=(0, 3, 4))
+        self.lock_cells = np.pad(locks.cumsum(axis=0).cumsum(axis=1),
+                                 ((1, 0), (1, 0)))
+
+        # Whether there is anything at all in each cell or the cells
+        # below it, for each wall table, so a player falling with
+        # nothing below them is known to fall off the map.
+        filled = np.isfinite(walls[..., 0]).any(axis=3)
+        for tables in (batch_level.ladders, batch_level.triggers):
+            filled |= np.isfinite(tables[..., 0]).any(axis=3).repeat(
+                2, axis=0)
+        self.filled_below = np.logical_or.accumulate(filled, axis=1)
+
+        # The state standing in for each place, what each move tried
+        # from it did and how many potions it had for them.
+        self.stand_ins = {}
+        self.outcomes = {}
+        self.potions_tried = {}
+
+        # The states found, by their key, which is their place with their
+        # potions and claimed layers, as the key of the state they were
+        # found from, the move that got there and how many steps the
+        # game took to get there. The potions and claimed layers found
+        # in each place are kept, to leave out new states that can't do
+        # more than one of them, and the keys each state leads to.
+        self.states = {}
+        self.places = {}
+        self.leads_to = {}
+        self.won = []
+        self.collected = 0
+        self.moves_tried = 0
+        self.steps_run = 0
+
+    @classmethod
+    def build_moves(cls):
+        """Returns the moves the analyzer tries, each as what a state
+        needs for it to be worth trying and the buttons held one after
+        another and for how many steps"""
+        moves = [(0, ((buttons, steps),))
+                 for buttons in (INPUT_LEFT, INPUT_RIGHT)
+                 for steps in ANALYZER_HOLDS]
+        moves += [(cls.NEEDS_LADDER, ((buttons, steps),))
+                  for buttons in (INPUT_UP, INPUT_DOWN)
+                  for steps in ANALYZER_HOLDS]
+        moves += [(0, ((INPUT_SWAP, 1),)),
+                  (cls.NEEDS_POTION, ((INPUT_LEFT | INPUT_TELEPORT, 1),)),
+                  (cls.NEEDS_POTION, ((INPUT_RIGHT | INPUT_TELEPORT, 1),)),
+                  (cls.NEEDS_FOOTING, ((INPUT_UP, 1),))]
+
+        # Jumps across, and straight up and then across onto a ledge above.
+        for direction in (INPUT_LEFT, INPUT_RIGHT):
+            moves += [(cls.NEEDS_FOOTING, ((direction | INPUT_UP, steps),))
+                      for steps in ANALYZER_JUMP_HOLDS]
+            moves.append((cls.NEEDS_FOOTING,
+                          ((INPUT_UP, 12), (direction | INPUT_UP, 20))))
+
+        # Jumps that swap timeline or teleport part of the way through,
+        # which is how the player gets between platforms that are only
+        # in one of the timelines.
+        for direction in (0, INPUT_LEFT, INPUT_RIGHT):
+            for event, needs in ((INPUT_SWAP, cls.NEEDS_FOOTING),
+                                 (INPUT_TELEPORT,
+                                  cls.NEEDS_FOOTING | cls.NEEDS_POTION)):
+                if event == INPUT_TELEPORT and not direction:
+                    continue
+                for event_step in ANALYZER_EVENT_STEPS:
+                    buttons = direction | INPUT_UP
+                    for steps in ANALYZER_JUMP_HOLDS[1:] if direction \
+                            else (20,):
+                        if steps > event_step:
+                            moves.append((needs, (
+                                (buttons, event_step), (buttons | event, 1),
+                                (buttons, steps - event_step - 1))))
+
+            # Long jumps that teleport twice, for gaps too wide for one.
+            if direction:
+                buttons = direction | INPUT_UP
+                steps = ANALYZER_JUMP_HOLDS[-1]
+                for event_step in ANALYZER_EVENT_STEPS[:-1]:
+                    moves.append((cls.NEEDS_FOOTING | cls.NEEDS_POTION, (
+                        (buttons, event_step),
+                        (buttons | INPUT_TELEPORT, 1),
+                        (buttons, ANALYZER_TELEPORT_GAP),
+                        (buttons | INPUT_TELEPORT, 1),
+                        (buttons, steps - event_step
+                         - ANALYZER_TELEPORT_GAP - 2))))
+        return moves
+
+    def place(self, state, index):
+        """Returns the place of one state in a dict of arrays"""
+        level = self.level
+        return (int(state["timeline"][index]),
+                int(state["x"][index] * ANALYZER_CELL_COLUMNS
+                    // level.cell_width),
+                int(state["y"][index] // level.cell_height),
+                bool(state["placeholder"][index]))
+
+    def start_environment(self, starts, indices):
+        """Returns a batch environment with an instance for each index
+        into a dict of states, in those states"""
+        environment = BatchEnvironment(self.level, len(indices))
+        for name in self.FIELDS:
+            getattr(environment, name)[:] = starts[name][indices]
+        environment.update_contacts()
+        return environment
+
+    def worth_trying(self, starts):
+        """Returns which moves are worth trying from each of the states
+        in a dict of arrays, shaped (states, moves)"""
+        environment = self.start_environment(
+            starts, np.arange(len(starts["x"])))
+        has = (self.NEEDS_LADDER * environment.on_ladder
+               | self.NEEDS_FOOTING * (environment.can_jump
+                                       | environment.on_ladder)
+               | self.NEEDS_POTION * (environment.potions > 0))
+        return self.needs[None, :] & ~has[:, None] == 0
+
+    def near_locks(self, environment, inputs):
+        """Returns which players could touch a wall that changes when
+        the placeholders are solid instead of the locks on their next
+        step"""
+        level = self.level
+        reach = (np.maximum(np.abs(environment.change_x),
+                            np.abs(environment.change_y))
+                 + level.cell_width + np.where(
+                     inputs & INPUT_TELEPORT != 0, TELEPORT_DISTANCE, 0))
+        left, right, bottom, top = environment.box(environment.x,
+                                                   environment.y)
+        first_column, last_column = (
+            np.clip(np.floor(edge / level.cell_width) + 1, 0,
+                    level.columns + 1).astype(np.intp)
+            for edge in (left - reach, right + reach))
+        first_row, last_row = (
+            np.clip(np.floor(edge / level.cell_height) + 1, 0,
+                    level.rows + 1).astype(np.intp)
+            for edge in (bottom - reach, top + reach))
+        cells = self.lock_cells
+        return (cells[last_row + 1, last_column + 1]
+                - cells[first_row, last_column + 1]
+                - cells[last_row + 1, first_column]
+                + cells[first_row, first_column]) > 0
+
+    def falling_away(self, environment):
+        """Returns which players are falling with nothing at all below
+        them, who can only fall off the map if they hold no buttons"""
+        level = self.level
+        left, right, _, top = environment.box(environment.x,
+                                              environment.y)
+        row = np.clip(np.floor(top / level.cell_height) + 1, 0,
+                      level.rows + 1).astype(np.intp)
+        table = environment.wall_tables()
+        filled = np.zeros(environment.count, dtype=bool)
+        for edge in (left, right):
+            column = np.clip(np.floor(edge / level.cell_width) + 1, 0,
+                             level.columns + 1).astype(np.intp)
+            filled |= self.filled_below[table, row, column]
+        return ~filled & ~environment.on_ladder \
+            & (environment.change_y <= 0)
+
+    def try_moves(self, starts, sources, moves, stand_ins=False):
+        """Tries moves from the states in a dict of arrays, each from the
+        state at the same index in sources. Returns the state each move
+        ended in, the number of steps it took, whether it got to the
+        exit or restarted the level, whether it swapped back to the
+        first timeline or went near a lock, and the keys and potions it
+        picked up, as the step, the number of the collectable, the state
+        then, the potions used and whether it had swapped back by then.
+        Instances are dropped from the batch environment as their moves
+        end, and as soon as they can only fall off the map.
+
+        Stand-ins have enough potions for any move and have claimed
+        every layer, so nothing they pick up changes what the move does,
+        and touching a hazard is also known to restart the level for
+        them, as it clears their claims."""
+        count = len(moves)
+        environment = self.start_environment(starts, sources)
+        start_potions = environment.potions.copy()
+        instances = np.arange(count)
+        ends = {name: getattr(environment, name).copy()
+                for name in self.FIELDS}
+        steps = np.zeros(count, dtype=np.int32)
+        won = np.zeros(count, dtype=bool)
+        restarted = np.zeros(count, dtype=bool)
+        swapped_back = np.zeros(count, dtype=bool)
+        near_locks = np.zeros(count, dtype=bool)
+        pickups = [[] for _ in range(count)]
+        last_step = self.move_steps + ANALYZER_SETTLE_STEPS
+
+        step = 0
+        running = moves
+        while len(instances):
+            last_x = environment.x.copy()
+            last_y = environment.y.copy()
+            inputs = self.move_inputs[
+                running, np.minimum(step, self.move_inputs.shape[1] - 1)]
+            if stand_ins:
+                near_locks[instances] |= self.near_locks(environment,
+                                                         inputs)
+                last_timeline = environment.timeline.copy()
+                last_collected = environment.collected.copy()
+            environment.step(inputs)
+            self.steps_run += len(instances)
+            step += 1
+
+            ended = environment.done.copy()
+            if stand_ins:
+                swapped_back[instances] |= \
+                    (last_timeline != TIMELINES[0]) \
+                    & (environment.timeline == TIMELINES[0])
+                picked_up = environment.collected & ~last_collected
+                for index in np.flatnonzero(picked_up):
+                    state = {name: getattr(environment, name)[index:index + 1]
+                             for name in self.FIELDS}
+                    used = start_potions[instances[index]] \
+                        - environment.potions[index]
+                    for number in range(len(self.level.collectables)):
+                        if int(picked_up[index]) & 1 << number:
+                            pickups[instances[index]].append(
+                                (step, number, state, int(used),
+                                 bool(swapped_back[instances[index]])))
+
+            # A move ends once its buttons have been let go of and the
+            # player has stopped on the ground or a ladder, has got to
+            # the exit, or has run out of steps. It is no use once the
+            # level restarts.
+            released = step >= self.move_steps[running]
+            fell = released & self.falling_away(environment)
+            if stand_ins:
+                fell |= environment.claims == 0
+            restarted[instances] = fell
+            ended |= fell
+            stopped = ((environment.grounded | environment.on_ladder)
+                       & (environment.x == last_x)
+                       & (environment.y == last_y))
+            ended |= (released & stopped) | (step >= last_step[running])
+            if not ended.any():
+                continue
+            finished = instances[ended]
+            for name in self.FIELDS:
+                ends[name][finished] = getattr(environment, name)[ended]
+            steps[finished] = step
+            won[finished] = environment.done[ended]
+
+            # Carries on with only the moves that haven't ended.
+            kept = ~ended
+            environment.keep(kept)
+            running = running[kept]
+            instances = instances[kept]
+        self.moves_tried += count
+        return ends, steps, won, restarted, swapped_back, near_locks, \
+            pickups
+
+    def try_places(self, places, potions):
+        """Tries the moves worth trying from the stand-ins of places with
+        a number of potions, leaving out the moves tried before with
+        fewer. A place whose placeholders are the other way round has
+        been tried already reuses the moves of that place that never
+        went near a lock, and only tries the rest."""
+        starts = {name: np.concatenate([self.stand_ins[place][name]
+                                        for place in places])
+                  for name in self.FIELDS}
+        starts["potions"][:] = [potions[place] for place in places]
+        starts["claims"][:] = (1 << len(self.level.trigger_layers)) - 1
+        worth_trying = self.worth_trying(starts)
+        jobs = []
+        for source, place in enumerate(places):
+            tried = self.potions_tried.get(place, -1)
+            self.potions_tried[place] = potions[place]
+            self.outcomes.setdefault(place, [])
+            moves = {move for move in np.flatnonzero(worth_trying[source])
+                     if tried < self.teleports[move] <= potions[place]}
+            other = place[:-1] + (not place[-1],)
+            for outcome in self.outcomes.get(other, ()):
+                if outcome[0] in moves and not outcome[-1]:
+                    self.outcomes[place].append(outcome)
+                    moves.remove(outcome[0])
+            jobs.extend((source, move) for move in sorted(moves))
+
+        per_chunk = max(self.chunk, 1)
+        for first in range(0, len(jobs), per_chunk):
+            sources, moves = np.array(jobs[first:first + per_chunk]).T
+            ends, steps, won, restarted, swapped_back, near_locks, \
+                pickups = self.try_moves(starts, sources, moves, True)
+            for index, source in enumerate(sources):
+                end = None
+                if not restarted[index]:
+                    end = {name: ends[name][index:index + 1]
+                           for name in self.FIELDS}
+                self.outcomes[places[source]].append((
+                    int(moves[index]), int(steps[index]),
+                    bool(won[index]), end, bool(swapped_back[index]),
+                    pickups[index], bool(near_locks[index])))
+
+    def search(self):
+        """Searches the level from the start until there are no new
+        states left, then searches for the exit again with the real
+        states. Returns the way to the exit found, as the key of the
+        state it was got to from, the move that got there and the total
+        steps, or None if the exit can't be got to."""
+        start = BatchEnvironment(self.level, 1).state()
+        start = {name: start[name] for name in self.FIELDS}
+        place = self.place(start, 0)
+        start_key = place + (0, 0)
+        self.stand_ins[place] = start
+        self.states = {start_key: (None, None, 0)}
+        self.places = {place: [(0, 0)]}
+        frontier = [start_key]
+        while frontier:
+            # The moves that use potions are only tried from a place
+            # once a state with enough potions for them is found there.
+            potions = {}
+            for key in frontier:
+                potions[key[:-2]] = max(potions.get(key[:-2], 0),
+                                        min(key[-2], self.teleports.max()))
+            places = sorted(place for place in potions
+                            if self.potions_tried.get(place, -1)
+                            < potions[place])
+
+            # Both ways round of a place are tried one after the other,
+            # so the second can reuse the moves of the first.
+            first = [place for place in places
+                     if place[:-1] + (not place[-1],) not in places
+                     or not place[-1]]
+            for group in (first, sorted(set(places) - set(first))):
+                if group:
+                    self.try_places(group, potions)
+            found = []
+            for key in frontier:
+                found.extend(self.expand(key))
+            frontier = found
+        if not self.won:
+            return None
+        return self.search_exit(start)
+
+    def add_state(self, state, potions, claims, parent, move, total_steps):
+        """Adds a state found from another, unless one found before in the
+        same place can do anything it can. Returns its key, or the key
+        of the state that can do anything it can, and whether it's new."""
+        place = self.place(state, 0)
+        found_here = self.places.setdefault(place, [])
+        for other_potions, other_claims in found_here:
+            if other_potions >= potions and other_claims & ~claims == 0:
+                return place + (other_potions, other_claims), False
+        found_here.append((potions, claims))
+        self.stand_ins.setdefault(place, state)
+        key = place + (potions, claims)
+        self.states[key] = (parent, move, total_steps)
+        return key, True
+
+    def expand(self, key):
+        """Follows every move tried from the place of a state with its
+        own potions and claimed layers, adding the new states they end
+        in and returning their keys"""
+        place = key[:-2]
+        potions, claims = key[-2:]
+        total_steps = self.states[key][2]
+        layers = self.level.trigger_layers
+        found = []
+        for move, steps, won, end, swapped_back, pickups, _ \
+                in self.outcomes[place]:
+            if self.teleports[move] > potions:
+                continue
+
+            # The move stops at the first key or potion whose layer the
+            # state hasn't claimed, as the rest of it could go
+            # differently from there.
+            new = None
+            for step, number, state, used, back in pickups:
+                self.collected |= 1 << number
+                layer = self.level.collectables[number][0]
+                bit = 1 << layers.index(layer)
+                if claims & bit:
+                    continue
+                state = dict(state)
+                if TRIGGER_LAYERS[layer] == TRIGGER_KEY:
+                    state["placeholder"] = np.ones(1, dtype=bool)
+                    new = (state, potions - used, claims | bit, step)
+                else:
+                    state["placeholder"] = np.array([place[-1]
+                                                     and not back])
+                    new = (state, potions - used + 1, claims | bit, step)
+                break
+            if new is None:
+                if won:
+                    self.won.append((key, move, total_steps + steps))
+                    continue
+                if end is None:
+                    continue
+                state = dict(end)
+                state["placeholder"] = np.array([place[-1]
+                                                 and not swapped_back])
+                new = (state, potions - self.teleports[move], claims, steps)
+            state, new_potions, new_claims, steps = new
+            new_key, is_new = self.add_state(
+                state, int(new_potions), new_claims, key, move,
+                total_steps + steps)
+            self.leads_to.setdefault(key, set()).add(new_key)
+            if is_new:
+                found.append(new_key)
+        return found
+
+    def distances(self):
+        """Returns how many moves each state is from the exit, going by
+        the states found"""
+        led_from = {}
+        for key, others in self.leads_to.items():
+            for other in others:
+                led_from.setdefault(other, []).append(key)
+        distances = {key: 1 for key, _, _ in self.won}
+        frontier = list(distances)
+        while frontier:
+            found = []
+            for key in frontier:
+                for other in led_from.get(key, ()):
+                    if other not in distances:
+                        distances[other] = distances[key] + 1
+                        found.append(other)
+            frontier = found
+        return distances
+
+    def search_exit(self, start):
+        """Searches for the exit with the real states, trying the moves
+        of the state closest to the exit first. Returns the same as
+        search."""
+        distances = self.distances()
+        far = len(distances) + 1
+
+        def distance(state, index):
+            place = self.place(state, index)
+            potions = int(state["potions"][index])
+            claims = int(state["claims"][index])
+            return min((distances.get(place + inventory, far)
+                        for inventory in self.places.get(place, ())
+                        if inventory[0] <= potions
+                        and inventory[1] & ~claims == 0), default=far)
+
+        # The real states found, by their key, as the key of the state
+        # they were found from, the move that got there, how many steps
+        # the game took to get there and the state itself.
+        self.exact_states = {}
+        places = {}
+        place = self.place(start, 0)
+        start_key = place + (0, 0)
+        self.exact_states[start_key] = (None, None, 0, start)
+        places[place] = [(0, 0)]
+        queue = [(distance(start, 0), 0, start_key)]
+        while queue:
+            keys = [heapq.heappop(queue)[2]]
+            starts = {name: np.concatenate([self.exact_states[key][3][name]
+                                            for key in keys])
+                      for name in self.FIELDS}
+            sources, moves = np.nonzero(self.worth_trying(starts))
+            ends, steps, won, restarted, _, _, _ = self.try_moves(
+                starts, sources, moves)
+            total_steps = np.array([self.exact_states[key][2]
+                                    for key in keys])[sources] + steps
+            if won.any():
+                index = np.flatnonzero(won)[
+                    np.argmin(total_steps[won])]
+                return (keys[sources[index]], int(moves[index]),
+                        int(total_steps[index]))
+            for index, move in enumerate(moves):
+                if restarted[index]:
+                    continue
+                place = self.place(ends, index)
+                potions = int(ends["potions"][index])
+                claims = int(ends["claims"][index])
+                found_here = places.setdefault(place, [])
+                if any(other_potions >= potions
+                       and other_claims & ~claims == 0
+                       for other_potions, other_claims in found_here):
+                    continue
+                found_here.append((potions, claims))
+                new_key = place + (potions, claims)
+                self.exact_states[new_key] = (
+                    keys[sources[index]], int(move),
+                    int(total_steps[index]),
+                    {name: ends[name][index:index + 1]
+                     for name in self.FIELDS})
+                heapq.heappush(queue, (distance(ends, index),
+                                       int(total_steps[index]), new_key))
+        return None
+
+    def solution(self, exit_move):
+        """Returns the moves from the start to the exit returned by
+        search, as each move and how many steps it took"""
+        key, move, total_steps = exit_move
+        moves = []
+        while key is not None:
+            parent, parent_move, parent_steps, _ = self.exact_states[key]
+            moves.append((move, total_steps - parent_steps))
+            key, move, total_steps = parent, parent_move, parent_steps
+        moves.reverse()
+        return moves
+
+    def solution_inputs(self, moves):
+        """Returns the input byte of every step of moves returned by
+        solution"""
+        return b"".join(bytes(self.move_inputs[move, :steps])
+                        + bytes(max(steps - self.move_inputs.shape[1], 0))
+                        for move, steps in moves)
+
+    def uncollected(self):
+        """Returns the layer, timeline, column and row of every key and
+        potion the player never picked up"""
+        return [collectable for number, collectable
+                in enumerate(self.level.collectables)
+                if not self.collected & 1 << number]
+
+
+def describe_buttons(buttons):
+    """Returns the names of the buttons in an input byte joined by
+    plusses"""
+    names = [name for bit, name in ((INPUT_LEFT, "left"),
+                                    (INPUT_RIGHT, "right"),
+                                    (INPUT_UP, "up"), (INPUT_DOWN, "down"),
+                                    (INPUT_SWAP, "swap"),
+                                    (INPUT_RESET, "reset"),
+                                    (INPUT_TELEPORT, "teleport"))
+             if buttons & bit]
+    return "+".join(names) or "nothing"
+
+
+def analyze_level(level):
+    """Searches a level for every place the player can get to, and
+    checks the way to the exit found by playing it back in the
+    simulation. Returns what was found as a dict, so it can be sent
+    back from another process."""
+    start_time = time.perf_counter()
+    analyzer = LevelAnalyzer(BatchLevel.load(level))
+    exit_move = analyzer.search()
+    result = {
+        "level": level,
+        "places": len(analyzer.outcomes),
+        "states": len(analyzer.states),
+        "moves_tried": analyzer.moves_tried,
+        "steps_run": analyzer.steps_run,
+        "solution": None,
+        "steps": None,
+        "solved": False,
+        "uncollected": analyzer.uncollected(),
+    }
+    if exit_move is not None:
+        moves = analyzer.solution(exit_move)
+        result["solution"] = [
+            (", ".join(f"{describe_buttons(buttons)} for {steps}"
+                       for buttons, steps in analyzer.moves[move]), steps)
+            for move, steps in moves]
+        inputs = analyzer.solution_inputs(moves)
+        result["steps"] = len(inputs)
+
+        # The exit moves the simulation on to the next level.
+        simulation = Simulation(level, headless=True)
+        for bits in inputs:
+            simulation.step(InputState.from_bits(bits))
+        result["solved"] = simulation.level == level + 1
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+def analyze_levels(levels, processes=0):
+    """Analyzes levels, each in its own process of a pool if any are
+    asked for, and prints what was found. Returns whether every level
+    can be beaten."""
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(analyze_level, levels))
+    else:
+        results = [analyze_level(level) for level in levels]
+
+    for result in results:
+        print(f"Level {result['level']}: {result['places']} places and "
+              f"{result['states']} states found "
+              f"from {result['moves_tried']} moves "
+              f"({result['steps_run']} steps) in "
+              f"{result['seconds']:.1f}s")
+        if result["solution"] is None:
+            print("  The exit can't be got to")
+        else:
+            print(f"  Solution: {len(result['solution'])} moves, "
+                  f"{result['steps']} steps, "
+                  f"{'checked' if result['solved'] else 'NOT beaten'} "
+                  f"in the simulation")
+            for number, (move, steps) in enumerate(result["solution"], 1):
+                print(f"  {number:3d}. {move} ({steps} steps)")
+        for layer, timeline, column, row in result["uncollected"]:
+            print(f"  Can't collect {layer} in timeline {timeline} at "
+                  f"column {column}, row {row}")
+    return all(result["solved"] for result in results)
+
+
+def benchmark_startup(wait):
+    """Opens the game the way main does, presses start once the menu
+    has been shown for as long as a player might look at it, and
+    prints how long the menu and the first game frame took"""
+    window = open_game()
+    window.recording = None
+
+    # Draws frames like arcade.run does until the first game frame,
+    # waiting a frame between menu frames like the real loop would.
+    # Each frame is finished before the next, like a real swap, so a
+    # headless window doesn't queue the menu frames up for later.
+    menu_time = None
+    while "game" not in STARTUP_TIMES:
+        view = window.current_view
+        view.on_update(1 / 60)
+        view.on_draw()
+        window.flip()
+        window.ctx.finish()
+        window.dispatch_events()
+        if isinstance(view, MainMenu):
+            menu_time = menu_time or time.perf_counter()
+            if time.perf_counter() - menu_time >= wait:
+                view.on_click_start(None)
+            else:
+                time.sleep(1 / 60)
+    window.close()
+    print(f"Time to menu: {STARTUP_TIMES['menu'] * 1000:.0f}ms, "
+          f"time to first game frame after {wait:.1f}s on the menu: "
+          f"{STARTUP_TIMES['game'] * 1000:.0f}ms")
+
+
+def run_command_line():
+    """Runs the developer tool given on the command line"""
+    parser = argparse.ArgumentParser(
+        description="Puzzle Platformer developer tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "compile", help="compile the level maps into the level cache")
+    commands.add_parser(
+        "shared", help="count the tiles both timelines of each level could "
+                       "share and the memory it would save")
+    commands.add_parser(
+        "atlas", help="shrink and pack the tile images into the tile atlas")
+    startup = commands.add_parser(
+        "startup", help="time how long the menu and the first game frame "
+                        "take to show")
+    startup.add_argument("--wait", type=float, default=1.0,
+                         help="seconds to stay on the menu before "
+                              "pressing start")
+    commands.add_parser(
+        "collisions",
+        help="benchmark the collision grid against sprite list scans")
+    commands.add_parser(
+        "animation", help="time the player's animation and check it plays "
+                          "at the same speed at any update rate")
+    pacing = commands.add_parser(
+        "pacing", help="compare how fast the game runs with the default "
+                       "and fixed loops when frames are slow")
+    pacing.add_argument("--tick-rate", type=float, default=TICK_RATE,
+                        help="ticks a second for the fixed loop")
+    pacing.add_argument("--render-rate", type=float, default=RENDER_RATE,
+                        help="frames a second for the fixed loop")
+    stream = commands.add_parser(
+        "stream", help="check the levels play the same streamed and "
+                       "measure streaming a big map")
+    stream.add_argument("--steps", type=int, default=BENCHMARK_FRAMES,
+                        help="number of steps of each input to check "
+                             "each level with")
+    stream.add_argument("--across", type=int,
+                        default=STREAM_BENCHMARK_COPIES[0],
+                        help="copies of the level across the big map")
+    stream.add_argument("--up", type=int,
+                        default=STREAM_BENCHMARK_COPIES[1],
+                        help="copies of the level up the big map")
+    states = commands.add_parser(
+        "states", help="measure saving and loading the game state and "
+                       "the memory of the rewind buffer")
+    states.add_argument("--steps", type=int, default=REWIND_FRAMES,
+                        help="number of steps to play on each level")
+    respawn = commands.add_parser(
+        "respawn", help="measure the memory and garbage collection of "
+                        "collecting everything and dying")
+    respawn.add_argument("--cycles", type=int, default=100,
+                         help="number of times to collect everything "
+                              "and die on each level")
+    physics = commands.add_parser(
+        "physics", help="benchmark the physics engine against arcade's")
+    physics.add_argument("--steps", type=int, default=BENCHMARK_FRAMES,
+                         help="number of steps to run on each level")
+    simulate = commands.add_parser(
+        "simulate", help="run the game headless and time its steps")
+    simulate.add_argument("--steps", type=int, default=10000,
+                          help="number of steps to run")
+    simulate.add_argument("--level", type=int, default=1,
+                          help="level to start on")
+    simulate.add_argument("--record", metavar="FILE",
+                          help="save the input to a recording")
+    batch = commands.add_parser(
+        "batch", help="run many instances of a level at once with random "
+                      "input and time them")
+    batch.add_argument("--level", type=int, default=1,
+                       help="level to run")
+    batch.add_argument("--instances", type=int, default=1000,
+                       help="number of instances to run")
+    batch.add_argument("--steps", type=int, default=600,
+                       help="number of steps to run each instance")
+    batch.add_argument("--processes", type=int, default=0,
+                       help="number of processes to split the instances "
+                            "between")
+    batch.add_argument("--seed", type=int, default=0,
+                       help="seed for the random input")
+    analyze = commands.add_parser(
+        "analyze", help="check the levels can be beaten and find what "
+                        "can't be collected")
+    analyze.add_argument("levels", type=int, nargs="*",
+                         default=list(range(1, LEVEL_COUNT + 1)),
+                         help="levels to analyze (default all)")
+    analyze.add_argument("--processes", type=int,
+                         help="number of processes to analyze the levels "
+                              "in (default one for each level)")
+    replay = commands.add_parser(
+        "replay", help="play back a recording headless and time it")
+    replay.add_argument("file", help="the recording to play back")
+    replay.add_argument("--trace", metavar="FILE",
+                        help="profile every step into a Chrome trace file")
+    benchmark = commands.add_parser(
+        "benchmark", help="run the benchmarks and compare them against "
+                          "the baseline")
+    benchmark.add_argument("--output", metavar="FILE",
+                           help="write the results to a JSON file")
+    benchmark.add_argument("--baseline", metavar="FILE",
+                           help="the baseline to compare against "
+                                f"(default {BENCHMARK_BASELINE})")
+    benchmark.add_argument("--threshold", type=float,
+                           default=BENCHMARK_THRESHOLD,
+                           help="how much worse a result can be before it "
+                                "is a regression, as a fraction")
+    benchmark.add_argument("--save-baseline", action="store_true",
+                           help="save the results as the new baseline")
+    arguments = parser.parse_args()
+
+    # The maps and images are loaded relative to the game folder, so
+    # any files given are found from where the tools were run first.
+    for name in ("record", "trace", "file", "output", "baseline"):
+        if getattr(arguments, name, None):
+            setattr(arguments, name, os.path.abspath(getattr(arguments,
+                                                             name)))
+    os.chdir(GAME_FOLDER)
+
+    if arguments.command == "compile":
+        compile_levels()
+    elif arguments.command == "shared":
+        report_shared_tiles()
+    elif arguments.command == "atlas":
+        build_tile_atlas()
+    elif arguments.command == "startup":
+        benchmark_startup(arguments.wait)
+    elif arguments.command == "collisions":
+        benchmark_collisions()
+    elif arguments.command == "animation":
+        if not benchmark_animation():
+            raise SystemExit(1)
+    elif arguments.command == "pacing":
+        benchmark_pacing(arguments.tick_rate, arguments.render_rate)
+    elif arguments.command == "stream":
+        if not benchmark_streaming(arguments.steps,
+                                   (arguments.across, arguments.up)):
+            raise SystemExit(1)
+    elif arguments.command == "states":
+        if not benchmark_game_states(arguments.steps):
+            raise SystemExit(1)
+    elif arguments.command == "respawn":
+        benchmark_respawn(arguments.cycles)
+    elif arguments.command == "physics":
+        benchmark_physics(arguments.steps)
+    elif arguments.command == "simulate":
+        benchmark_simulation(arguments.steps, arguments.level,
+                             arguments.record)
+    elif arguments.command == "batch":
+        if not benchmark_batch(arguments.level, arguments.instances,
+                               arguments.steps, arguments.processes,
+                               arguments.seed):
+            raise SystemExit(1)
+    elif arguments.command == "analyze":
+        processes = arguments.processes
+        if processes is None:
+            processes = len(arguments.levels)
+        if not analyze_levels(arguments.levels, processes):
+            raise SystemExit(1)
+    elif arguments.command == "benchmark":
+        if not benchmark_game(arguments.output,
+                              arguments.baseline or BENCHMARK_BASELINE,
+                              arguments.threshold, arguments.save_baseline):
+            raise SystemExit(1)
+    elif arguments.command == "replay":
+        if not replay_recording(arguments.file, arguments.trace):
+            raise SystemExit(1)
+
+
+# Run the tool given on the command line.
+if __name__ == "__main__":
+    run_command_line()
@@ -0,0 +1,23 @@
+"""Loads the game for the tests"""
+
+import importlib.util
+import os
+
+import pytest
+
+GAME_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def game():
+    """Loads the game module from its file, which has a space in its
+    name, and runs from the game folder so the maps are found"""
+    folder = os.getcwd()
+    os.chdir(GAME_FOLDER)
+    spec = importlib.util.spec_from_file_location(
+        "puzzle_platformer", os.path.join(GAME_FOLDER,
+                                          "Puzzle platformer.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    os.chdir(folder)
@@ -0,0 +1,74 @@
+"""Checks that game states pack into bytes and back, and that damaged
+ones aren't loaded"""
+
+import struct
+
+import pytest
+
+
+@pytest.fixture
+def state(game):
+    """Returns the state of level 1 after running right and jumping,
+    with the first key, potion or lock of the timeline collected"""
+    simulation = game.Simulation(1, headless=True)
+    for _ in range(30):
+        simulation.step(game.InputState(right=True, up=True))
+    simulation.pool.collect(simulation.pool.sprites[:1])
+    return simulation.save_state()
+
+
+def test_bytes_round_trip(game, state):
+    """Packs a state into bytes and unpacks it the same"""
+    unpacked = game.GameState.from_bytes(state.to_bytes())
+    for name in game.GameState.__slots__:
+        assert getattr(unpacked, name) == getattr(state, name), name
+
+
+def test_wrong_magic(game, state):
+    """Doesn't unpack bytes that don't start with the magic"""
+    data = b"XXXX" + state.to_bytes()[4:]
+    with pytest.raises(ValueError):
+        game.GameState.from_bytes(data)
+
+
+def test_wrong_version(game, state):
+    """Doesn't unpack a state from another version"""
+    data = bytearray(state.to_bytes())
+    struct.pack_into("<H", data, 4, game.GAME_STATE_VERSION + 1)
+    with pytest.raises(ValueError):
+        game.GameState.from_bytes(bytes(data))
+
+
+@pytest.mark.parametrize("cut", [1, 20, -1])
+def test_truncated(game, state, cut):
+    """Doesn't unpack a state with bytes missing from the record or
+    the flags"""
+    with pytest.raises(ValueError):
+        game.GameState.from_bytes(state.to_bytes()[:cut])
+
+
+def test_pools_that_dont_fit(game, state):
+    """Doesn't load a state with the wrong number of flags, and leaves
+    the game as it was"""
+    simulation = game.Simulation(1, headless=True)
+    before = simulation.save_state()
+    state.pools = (b"\x03",) + state.pools[1:]
+    with pytest.raises(ValueError):
+        simulation.load_state(game.GameState.from_bytes(state.to_bytes()))
+    after = simulation.save_state()
+    for name in game.GameState.__slots__:
+        assert getattr(after, name) == getattr(before, name), name
+
+
+def test_rewind_buffer_clears_on_level_change(game, state):
+    """Starts the rewind buffer again when the level changes"""
+    buffer = game.RewindBuffer()
+    buffer.push(state)
+    buffer.push(state)
+    assert len(buffer) == 2
+
+    state.level = 2
+    buffer.push(state)
+    assert len(buffer) == 1
+    assert buffer.pop().level == 2
+    assert buffer.pop() is None
@@ -0,0 +1,44 @@
+"""Checks that input recordings save and load back the same, and that
+damaged ones aren't loaded"""
+
+import pytest
+
+
+@pytest.fixture
+def recording(game):
+    """Returns a recording of level 1 with the player running right,
+    jumping now and then and swapping timeline once"""
+    simulation = game.Simulation(1, headless=True)
+    recording = game.InputRecording(simulation.level)
+    for step in range(120):
+        input_state = game.InputState(right=True, up=step % 40 < 10,
+                                      swap=step == 60)
+        simulation.step(input_state)
+        recording.record(input_state, simulation)
+    return recording
+
+
+def test_save_load_round_trip(game, recording, tmp_path):
+    """Saves a recording and loads it back the same"""
+    file_name = tmp_path / "game.rec"
+    recording.save(file_name)
+    loaded = game.InputRecording.load(file_name)
+    assert loaded.level == recording.level
+    assert loaded.frames == recording.frames
+    assert loaded.final_state == recording.final_state
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:10],
+    lambda data: data[:-4],
+    lambda data: data[:60] + b"\xff" * 8 + data[68:],
+], ids=["magic", "header", "cut frames", "damaged frames"])
+def test_bad_file(game, recording, tmp_path, damage):
+    """Doesn't load a recording with the wrong magic, a cut off header
+    or damaged frames"""
+    file_name = tmp_path / "game.rec"
+    recording.save(file_name)
+    file_name.write_bytes(damage(file_name.read_bytes()))
+    with pytest.raises(ValueError):
+        game.InputRecording.load(file_name)
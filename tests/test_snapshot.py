@@ -0,0 +1,55 @@
+"""Checks that resetting a level puts it back the way loading it does"""
+
+import pytest
+
+
+def collectables(game, simulation):
+    """Returns the position of every key, potion and lock that can be
+    touched, and whether each one in the scenes is shown, by timeline
+    and layer"""
+    found = {}
+    for timeline in game.TIMELINES:
+        scene = simulation.level_session.scenes[timeline]
+        pool = simulation.level_session.pools[timeline]
+        for layer in game.COLLECTABLE_LAYERS:
+            if layer not in scene.name_mapping:
+                continue
+            found[timeline, layer] = (
+                sorted(sprite.position for sprite in pool.present(layer)),
+                [(sprite.position, sprite.visible)
+                 for sprite in scene[layer]])
+    return found
+
+
+@pytest.mark.parametrize("level", [1, 2, 3])
+def test_reset_matches_fresh_load(game, level):
+    """Collects every key, potion and lock in both timelines, moves the
+    player away and resets, then compares with a freshly loaded level"""
+    simulation = game.Simulation(level, headless=True)
+    fresh = game.Simulation(level, headless=True)
+    handlers = {game.TRIGGER_KEY: simulation.on_collect_key,
+                game.TRIGGER_LOCK: simulation.on_open_lock,
+                game.TRIGGER_POTION: simulation.on_collect_potion}
+
+    # Swapping timeline puts back what was collected in the timeline
+    # swapped to, so both are collected before swapping back.
+    for timeline in game.TIMELINES:
+        if timeline != simulation.timeline:
+            simulation.apply_input(game.InputState(swap=True))
+        for layer in simulation.pool.layers:
+            handlers[game.TRIGGER_LAYERS[layer]](
+                layer, simulation.pool.present(layer))
+        assert not any(simulation.pool.present(layer)
+                       for layer in simulation.pool.layers)
+    simulation.player_sprite.position = (500, 500)
+    assert collectables(game, simulation) != collectables(game, fresh)
+
+    simulation.apply_input(game.InputState(reset=True))
+
+    assert collectables(game, simulation) == collectables(game, fresh)
+    assert simulation.player_sprite.position == \
+        fresh.player_sprite.position == \
+        (game.PLAYER_START_X, game.PLAYER_START_Y)
+    assert simulation.keys_available == fresh.keys_available == 0
+    assert simulation.potions_available == fresh.potions_available == 0
+    assert simulation.lock_state == fresh.lock_state